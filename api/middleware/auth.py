@@ -22,20 +22,66 @@ SOFTWARE.
 """
 from __future__ import annotations
 
+import time
 from typing import TYPE_CHECKING
 
-from starlette.authentication import AuthCredentials, AuthenticationBackend, BaseUser
+from starlette.authentication import AuthCredentials, AuthenticationBackend, BaseUser, UnauthenticatedUser
 from starlette.requests import HTTPConnection
+from starlette.routing import Match
 
 import core
 
 if TYPE_CHECKING:
+    from starlette.types import ASGIApp, Receive, Scope, Send
+
     from api.server import Server
 
 
 class User(BaseUser):
-    def __init__(self, model: core.UserModel) -> None:
+    """An authenticated user or application.
+
+    Tokens looked up in the database have their ``model`` loaded already. Signed tokens are verified without the
+    database, so only their ``claims`` are known, and routes which need the full model load it with `resolve`.
+    """
+
+    def __init__(
+        self,
+        model: core.UserModel | core.ApplicationModel | None = None,
+        *,
+        claims: core.TokenClaims | None = None,
+        token: str = '',
+        backend: AuthBackend | None = None,
+    ) -> None:
         self.model = model
+        self.claims = claims
+        self.token: str = token
+
+        self._backend = backend
+
+    @property
+    def is_authenticated(self) -> bool:
+        return True
+
+    @property
+    def uid(self) -> int:
+        return self.model.uid if self.model else self.claims.uid  # type: ignore
+
+    @property
+    def tid(self) -> int | None:
+        if self.model is not None:
+            return self.model.tid if isinstance(self.model, core.ApplicationModel) else None
+
+        return self.claims.tid  # type: ignore
+
+    async def resolve(self) -> core.UserModel | core.ApplicationModel | None:
+        """Return the model of this user or application, loading it if it was authenticated with a signed token.
+
+        Returns ``None`` if it no longer exists.
+        """
+        if self.model is None and self._backend is not None:
+            self.model = await self._backend.load_model(self.token, self.claims)  # type: ignore
+
+        return self.model
 
 
 class AuthBackend(AuthenticationBackend):
@@ -47,23 +93,85 @@ class AuthBackend(AuthenticationBackend):
         if not auth:
             return
 
+        start: float = time.perf_counter()
+        try:
+            return await self._authenticate(auth)
+        finally:
+            # Recorded by the route as its auth phase...
+            conn.state.auth_seconds = time.perf_counter() - start
+
+    def _authenticate_signed(self, auth: str) -> tuple[AuthCredentials, User] | None:
+        claims: core.TokenClaims | None = self.app.database.signer.verify(auth)
+
+        if claims is None or self.app.database.revocations.check(claims):
+            return None
+
+        return AuthCredentials(claims.scopes()), User(claims=claims, token=auth, backend=self)
+
+    async def _authenticate(self, auth: str) -> tuple[AuthCredentials, User] | None:
+        # Signed tokens are verified in memory, only the legacy format is looked up...
+        if core.TokenSigner.is_signed(auth):
+            return self._authenticate_signed(auth)
+
+        cache: core.AuthCache = self.app.database.auth_cache
+        cached = cache.get(auth)
+
+        if cached:
+            model, cached_scopes = cached
+            return AuthCredentials(list(cached_scopes)), User(model, token=auth)
+
+        # Tokens which were never issued are rejected without querying for them...
+        token_filter = self.app.database.token_filter
+        if not token_filter.might_exist(auth):
+            return None
+
+        user: core.UserModel | core.ApplicationModel | None
+        user, scopes = await self._lookup(auth)
+
+        if user is None:
+            token_filter.false_positive()
+            return None
+
+        return AuthCredentials(scopes), User(user, token=auth)
+
+    async def load_model(
+        self, auth: str, claims: core.TokenClaims | None = None
+    ) -> core.UserModel | core.ApplicationModel | None:
+        """Load the model of a token from the auth cache, or the database."""
+        cached = self.app.database.auth_cache.get(auth)
+        if cached:
+            return cached[0]
+
+        user, _ = await self._lookup(auth, application=claims.application if claims else None)
+        return user
+
+    async def _lookup(
+        self, auth: str, *, application: bool | None = None
+    ) -> tuple[core.UserModel | core.ApplicationModel | None, list[str]]:
+        """Look a token up as a bearer token and then an application token, or only as one when ``application`` is set."""
+        cache: core.AuthCache = self.app.database.auth_cache
+        generation: int = cache.generation
         scopes: list[str] = []
 
         # Check if the user is using a bearer token...
-        user: core.UserModel | core.ApplicationModel | None
-        user = await self.app.database.fetch_user(bearer=auth)
+        user: core.UserModel | core.ApplicationModel | None = None
+        if not application:
+            user = await self.app.database.fetch_user(bearer=auth)
 
         if user:
             scopes.append('bearer')
 
+        elif application is False:
+            return None, scopes
+
         else:
             # Otherwise we check if the authentication token supplied is an Application Token...
             user = await self.app.database.fetch_application(token=auth)
             if not user:
-                return
+                return None, scopes
 
             if user.invalid:
-                return
+                return None, scopes
 
             scopes.append('application')
             if user.verified:
@@ -78,4 +186,41 @@ class AuthBackend(AuthenticationBackend):
         if user.admin:
             scopes.append('admin')
 
-        return AuthCredentials(scopes), User(user)
+        cache.add(auth, user, scopes, generation=generation)
+        return user, scopes
+
+
+class AuthMiddleware:
+    """Authenticates websockets, and HTTP requests for routes which declare scopes with `core.route`.
+
+    Requests for any other route, or for no route at all, are unauthenticated without looking at their token, so they
+    never cost a lookup. Replaces `starlette.middleware.authentication.AuthenticationMiddleware`, and sets the same
+    ``auth`` and ``user`` on the scope.
+    """
+
+    def __init__(self, app: ASGIApp, *, backend: AuthBackend) -> None:
+        self.app = app
+        self.backend = backend
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] not in ('http', 'websocket'):
+            await self.app(scope, receive, send)
+            return
+
+        result: tuple[AuthCredentials, User] | None = None
+        if scope['type'] == 'websocket' or self.scopes_for(scope):
+            result = await self.backend.authenticate(HTTPConnection(scope))
+
+        scope['auth'], scope['user'] = result or (AuthCredentials(), UnauthenticatedUser())
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def scopes_for(scope: Scope) -> tuple[str, ...]:
+        """The scopes declared by the route a request is for, found the same way the router will find it."""
+        for route in scope['app'].routes:
+            match, child = route.matches(scope)
+
+            if match is Match.FULL:
+                return getattr(child.get('endpoint'), 'scopes', ())
+
+        return ()
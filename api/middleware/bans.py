@@ -0,0 +1,98 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from starlette.requests import HTTPConnection
+from starlette.responses import JSONResponse
+from starlette.websockets import WebSocketClose
+
+import core
+
+from .auth import User
+
+if TYPE_CHECKING:
+    from starlette.types import ASGIApp, Receive, Scope, Send
+
+    from core.database.bans import BanIndex
+    from core.database.models import BanModel
+
+
+async def _reject(ban: BanModel, scope: Scope, receive: Receive, send: Send) -> None:
+    if scope['type'] == 'websocket':
+        await WebSocketClose(code=core.WebsocketCloseCodes.BANNED, reason=ban.reason or '')(scope, receive, send)
+        return
+
+    response = JSONResponse({'error': 'You are banned.', 'reason': ban.reason}, status_code=403)
+    await response(scope, receive, send)
+
+
+class BanMiddleware:
+    """Rejects requests and websockets from banned IPs and networks.
+
+    Must be placed before `AuthMiddleware`, so banned clients never cause an authentication lookup. The client's
+    address is resolved by ``proxies``, so ``X-Forwarded-For`` is only believed when sent by a trusted proxy.
+    Banned users are rejected by `UserBanMiddleware`, once their token has been verified.
+    """
+
+    def __init__(self, app: ASGIApp, *, bans: BanIndex, proxies: core.TrustedProxies) -> None:
+        self.app = app
+        self.bans = bans
+        self.proxies = proxies
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] not in ('http', 'websocket'):
+            await self.app(scope, receive, send)
+            return
+
+        ban = self.bans.check(ip=self.proxies.client_ip(HTTPConnection(scope)))
+        if ban is None:
+            await self.app(scope, receive, send)
+            return
+
+        await _reject(ban, scope, receive, send)
+
+
+class UserBanMiddleware:
+    """Rejects requests and websockets authenticated as a banned user.
+
+    Must be placed after `AuthMiddleware`, so the ban applies to the identity the token actually resolved to.
+    """
+
+    def __init__(self, app: ASGIApp, *, bans: BanIndex) -> None:
+        self.app = app
+        self.bans = bans
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        user = scope.get('user')
+        if scope['type'] not in ('http', 'websocket') or not isinstance(user, User):
+            await self.app(scope, receive, send)
+            return
+
+        ban = self.bans.check(uid=user.uid)
+        if ban is None:
+            await self.app(scope, receive, send)
+            return
+
+        await _reject(ban, scope, receive, send)
@@ -0,0 +1,74 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING
+
+import core
+
+if TYPE_CHECKING:
+    from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class MetricsMiddleware:
+    """Counts HTTP requests and records their latency, labelled by route name and response status.
+
+    Must be the first middleware, so requests rejected by other middleware are counted too. Requests which did not
+    reach a route are labelled with the route ``none``.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+        self.requests: core.Counter = core.metrics.counter(
+            'papi_requests_total', 'HTTP requests handled.', labels=('route', 'status')
+        )
+        self.latency: core.Histogram = core.metrics.histogram(
+            'papi_request_duration_seconds', 'Time taken to handle an HTTP request.', labels=('route', 'status')
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status: int = 500
+        start: float = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+
+            if message['type'] == 'http.response.start':
+                status = message['status']
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router adds the matched endpoint to the scope...
+            route: str = getattr(scope.get('endpoint'), 'name', 'none')
+
+            self.latency.observe(time.perf_counter() - start, route, str(status))
+            self.requests.inc(route, str(status))
@@ -0,0 +1,86 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.responses import JSONResponse
+
+from .auth import User
+
+if TYPE_CHECKING:
+    from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+    import core
+
+
+class RateLimitMiddleware:
+    """Rejects HTTP requests over their rate limit with ``429``, before they reach any route.
+
+    Must be placed after `AuthMiddleware`, so requests are limited by their application or user. Unauthenticated
+    requests, including every request to a route which declares no scopes, are limited by the client IP resolved by
+    ``proxies``, the same address bans are checked against.
+    """
+
+    def __init__(self, app: ASGIApp, *, limiter: core.RateLimiter, proxies: core.TrustedProxies) -> None:
+        self.app = app
+        self.limiter = limiter
+        self.proxies = proxies
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or not self.limiter.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        conn = HTTPConnection(scope)
+        user: User | None = conn.user if isinstance(conn.user, User) else None
+
+        key: str = self.key_for(conn, user)
+        result = self.limiter.hit(key, conn.auth.scopes, scope['path'], authenticated=user is not None)
+        if result is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not result.allowed:
+            response = JSONResponse({'error': 'Too many requests.'}, status_code=429, headers=result.headers())
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                headers = MutableHeaders(scope=message)
+                headers.update(result.headers())
+
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    def key_for(self, conn: HTTPConnection, user: User | None) -> str:
+        if user is not None and user.tid is not None:
+            return f'app:{user.tid}'
+        elif user is not None:
+            return f'user:{user.uid}'
+
+        return f'ip:{self.proxies.client_ip(conn)}'
@@ -0,0 +1,173 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import ipaddress
+import logging
+from typing import TYPE_CHECKING, Any
+
+import asyncpg
+from starlette.responses import JSONResponse, Response
+
+import core
+
+if TYPE_CHECKING:
+    from starlette.requests import Request
+
+    from api.server import Server
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+def parse_ban(data: Any) -> dict[str, Any]:
+    """Parse the ``ip``, ``network`` and ``userid`` of a ban from a JSON body. Raises `ValueError` with a client facing
+    message.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Expected a JSON object.')
+
+    ban: dict[str, Any] = {}
+
+    if data.get('ip') is not None:
+        ban['ip'] = str(ipaddress.ip_address(str(data['ip'])))
+
+    if data.get('network') is not None:
+        ban['network'] = ipaddress.ip_network(str(data['network']), strict=False)
+
+    if data.get('userid') is not None:
+        ban['userid'] = int(data['userid'])
+
+    if len(ban) != 1:
+        raise ValueError('Exactly one of ip, network or userid must be provided.')
+
+    return ban
+
+
+class Admin(core.View):
+    def __init__(self, app: Server) -> None:
+        self.app = app
+
+    @core.route('/cache', scopes=['admin'])
+    async def cache_stats(self, request: Request) -> Response:
+        data = {
+            'auth': self.app.database.auth_cache.stats(),
+            'loaders': {
+                'bearer': self.app.database.bearer_loader.stats(),
+                'application': self.app.database.application_loader.stats(),
+            },
+        }
+
+        return JSONResponse(data, status_code=200)
+
+    @core.route('/database', scopes=['admin'])
+    async def database_stats(self, request: Request) -> Response:
+        return JSONResponse(self.app.database.pool_stats(), status_code=200)
+
+    @core.route('/logs/writer', scopes=['admin'])
+    async def log_writer_stats(self, request: Request) -> Response:
+        return JSONResponse(self.app.database.logs.stats(), status_code=200)
+
+    @core.route('/logs/partitions', scopes=['admin'])
+    async def log_partition_stats(self, request: Request) -> Response:
+        return JSONResponse(self.app.database.partitions.stats(), status_code=200)
+
+    @core.route('/websockets', scopes=['admin'])
+    async def websocket_stats(self, request: Request) -> Response:
+        return JSONResponse(self.app.connections.stats(), status_code=200)
+
+    @core.route('/ratelimit', scopes=['admin'])
+    async def ratelimit_stats(self, request: Request) -> Response:
+        return JSONResponse(self.app.ratelimiter.stats(), status_code=200)
+
+    @core.route('/tokens', scopes=['admin'])
+    async def token_stats(self, request: Request) -> Response:
+        data: dict[str, Any] = {
+            'signer': self.app.database.signer.stats(),
+            'revocations': self.app.database.revocations.stats(),
+            'filter': self.app.database.token_filter.stats(),
+        }
+
+        return JSONResponse(data, status_code=200)
+
+    @core.route('/oauth', scopes=['admin'])
+    async def oauth_stats(self, request: Request) -> Response:
+        return JSONResponse(self.app.oauth.stats(), status_code=200)
+
+    @core.route('/events', scopes=['admin'])
+    async def event_bus_stats(self, request: Request) -> Response:
+        return JSONResponse(self.app.events.stats(), status_code=200)
+
+    @core.route('/queries', scopes=['admin'])
+    async def query_stats(self, request: Request) -> Response:
+        sort: str = request.query_params.get('sort', 'total')
+
+        try:
+            limit: int = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+            queries: list[dict[str, Any]] = self.app.database.profiler.top(limit=limit, by=sort)
+        except ValueError as e:
+            return JSONResponse({'error': f'Bad query parameters. {e}'}, status_code=400)
+
+        data = {'profiler': self.app.database.profiler.stats(), 'queries': queries}
+        return JSONResponse(data, status_code=200)
+
+    @core.route('/bans', scopes=['admin'])
+    async def list_bans(self, request: Request) -> Response:
+        bans: list[core.BanModel] = await self.app.database.fetch_bans()
+        data = {'bans': [ban.as_dict() for ban in bans], 'index': self.app.database.bans.stats()}
+
+        return JSONResponse(data, status_code=200)
+
+    @core.route('/bans', methods=['POST'], scopes=['admin'])
+    async def add_ban(self, request: Request) -> Response:
+        try:
+            data = await request.json()
+            ban: dict[str, Any] = parse_ban(data)
+        except Exception as e:
+            LOGGER.debug('Received bad JSON in "/admin/bans": %s', e)
+            return JSONResponse({'error': f'Bad POST JSON Body. {e}'}, status_code=400)
+
+        reason: str | None = data.get('reason')
+
+        try:
+            created: core.BanModel = await self.app.database.add_ban(**ban, reason=reason)
+        except asyncpg.UniqueViolationError:
+            return JSONResponse({'error': 'This ban already exists.'}, status_code=409)
+
+        await self.app.refresh_bans(userid=created.userid)
+        return JSONResponse(created.as_dict(), status_code=201)
+
+    @core.route('/bans', methods=['DELETE'], scopes=['admin'])
+    async def remove_ban(self, request: Request) -> Response:
+        try:
+            ban: dict[str, Any] = parse_ban(await request.json())
+        except Exception as e:
+            LOGGER.debug('Received bad JSON in "/admin/bans": %s', e)
+            return JSONResponse({'error': f'Bad DELETE JSON Body. {e}'}, status_code=400)
+
+        removed: int = await self.app.database.remove_ban(**ban)
+        if not removed:
+            return JSONResponse({'error': 'This ban does not exist.'}, status_code=404)
+
+        await self.app.refresh_bans()
+        return Response(status_code=204)
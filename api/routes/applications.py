@@ -26,13 +26,13 @@ import logging
 from typing import TYPE_CHECKING
 
 import asyncpg
-from starlette.authentication import requires
-from starlette.requests import Request
-from starlette.responses import JSONResponse, Response
+from starlette.responses import JSONResponse, Response, StreamingResponse
 
 import core
 
 if TYPE_CHECKING:
+    from starlette.requests import Request
+
     from api.server import Server
 
 
@@ -43,26 +43,19 @@ class Applications(core.View):
     def __init__(self, app: Server) -> None:
         self.app = app
 
-    @core.route('/regenerate')
-    @requires('application')
+    @core.route('/regenerate', scopes=['application'])
     async def regenerate_application_token(self, request: Request) -> Response:
-        app: core.ApplicationModel = request.user.model
-
-        new = await self.app.database.regenerate_application_token(user_id=app.uid, old=app.token)
+        new = await self.app.database.regenerate_application_token(user_id=request.user.uid, old=request.user.token)
         return JSONResponse(new.as_dict(), status_code=200)
 
-    @core.route('/delete', methods=['DELETE'])
-    @requires('application')
+    @core.route('/delete', methods=['DELETE'], scopes=['application'])
     async def delete_application(self, request: Request) -> Response:
-        app: core.ApplicationModel = request.user.model
-
-        await self.app.database.delete_application(token=app.token)
+        await self.app.database.delete_application(token=request.user.token)
         return Response(status_code=200)
 
-    @core.route('/create', methods=['POST'])
-    @requires('bearer')
+    @core.route('/create', methods=['POST'], scopes=['bearer'])
     async def create_application(self, request: Request) -> Response:
-        user: core.UserModel = request.user.model
+        uid: int = request.user.uid
 
         try:
             data = await request.json()
@@ -78,27 +71,34 @@ class Applications(core.View):
         if len(description) > 512:
             return JSONResponse({'error': 'description field must not be over 512 characters long.'}, status_code=400)
 
-        apps = await self.app.database.fetch_applications(user_id=user.uid)
-
-        if not apps:
-            pass
+        try:
+            # Counting and creating on the request's connection, in one transaction...
+            async with self.app.database.transaction():
+                apps = await self.app.database.fetch_applications(user_id=uid)
 
-        elif len(apps) >= 25:
-            return JSONResponse({'error': 'You have too many applications.'}, status_code=200)
+                if apps and len(apps) >= 25:
+                    return JSONResponse({'error': 'You have too many applications.'}, status_code=200)
 
-        try:
-            app = await self.app.database.create_application(user_id=user.uid, name=name, description=description)
+                app = await self.app.database.create_application(user_id=uid, name=name, description=description)
         except asyncpg.UniqueViolationError:
             return JSONResponse({'error': 'You already have an application with that name.'}, status_code=409)
 
         return JSONResponse(app.as_dict(), status_code=201)
 
-    @core.route('/logs')
-    @requires('application')
+    @core.route('/logs', scopes=['application'])
     async def fetch_application_logs(self, request: Request) -> Response:
-        app: core.ApplicationModel = request.user.model
+        tid: int = request.user.tid
 
-        logs = await self.app.database.fetch_application_logs(token_id=app.tid)
-
-        logs = [log.as_dict() for log in logs]
-        return JSONResponse(logs, status_code=200)
+        try:
+            options = core.LogQuery.from_params(
+                request.query_params, stream='application/x-ndjson' in request.headers.get('accept', '')
+            )
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status_code=400)
+
+        if options.stream:
+            logs = self.app.database.stream_application_logs(token_id=tid, options=options)
+            return StreamingResponse(core.ndjson(logs), status_code=200, media_type='application/x-ndjson')
+
+        logs = await self.app.database.fetch_application_logs(token_id=tid, options=options)
+        return JSONResponse(options.page(logs), status_code=200)
@@ -24,6 +24,7 @@ SOFTWARE.
 from __future__ import annotations
 
 import logging
+import math
 from typing import TYPE_CHECKING
 
 from starlette.responses import JSONResponse, Response
@@ -56,39 +57,16 @@ class Auth(core.View):
         if not code:
             return JSONResponse({"error": "Missing code query"}, status_code=400)
 
-        client_id: str = core.config["OAUTH"]["github_id"]
-        client_secret: str = core.config["OAUTH"]["github_secret"]
-        url: str = core.config["OAUTH"]["redirect"]
-
-        data = {
-            "client_id": client_id,
-            "client_secret": client_secret,
-            "redirect_uri": url,
-            "grant_type": "authorization_code",
-            "code": code,
-        }
-
-        headers = {
-            "Content-Type": "application/x-www-form-urlencoded",
-            "Accept": "application/json",
-        }
-
-        async with self.app.session.post("https://github.com/login/oauth/access_token", data=data, headers=headers) as resp:
-            resp.raise_for_status()
-
-            data = await resp.json()
-
-            try:
-                token = data["access_token"]
-            except KeyError:
-                return JSONResponse({"error": "Bad code query sent."}, status_code=400)
+        try:
+            userid, username = await self.app.oauth.authenticate(code)
+        except core.OAuthRejected as e:
+            LOGGER.debug('GitHub rejected a code in "/auth/github": %s', e)
 
-        async with self.app.session.get("https://api.github.com/user", headers={"Authorization": f"Bearer {token}"}) as resp:
-            resp.raise_for_status()
+            return JSONResponse({"error": "Bad code query sent."}, status_code=400)
+        except core.OAuthUnavailable as e:
+            headers = {"Retry-After": str(max(1, math.ceil(e.retry_after)))}
 
-            data = await resp.json()
-            userid = data["id"]
-            username = data["name"] or data["login"]
+            return JSONResponse({"error": "GitHub is currently unavailable."}, status_code=503, headers=headers)
 
         user = await self.app.database.refresh_or_create_user(github_id=userid, username=username)
         LOGGER.info("Refreshed Bearer: id=%s github_id=%s username=%s", user.uid, user.github_id, username)
@@ -0,0 +1,75 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Any
+
+from starlette.responses import JSONResponse, Response
+
+import core
+
+if TYPE_CHECKING:
+    from starlette.requests import Request
+
+    from api.server import Server
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+class Health(core.View):
+    def __init__(self, app: Server) -> None:
+        self.app = app
+
+    @core.route('/health', prefix=False)
+    async def health(self, request: Request) -> Response:
+        # Unauthenticated, so only counts are shared. The full pool stats are at /admin/database...
+        pool: dict[str, Any] = self.app.database.pool_stats()
+        replicas: list[dict[str, Any]] = pool.get('replicas', {}).get('replicas', [])
+
+        data: dict[str, Any] = {
+            'status': 'ok',
+            'database': {
+                'size': pool['size'],
+                'max_size': pool['max_size'],
+                'in_use': pool['in_use'],
+                'replicas': len(replicas),
+                'healthy_replicas': sum(replica['healthy'] for replica in replicas),
+            },
+        }
+
+        start: float = time.perf_counter()
+        try:
+            async with asyncio.timeout(self.app.health_timeout), self.app.database.acquire() as connection:
+                await connection.fetchval('SELECT 1')
+        except Exception as e:
+            LOGGER.warning('Health check failed to query the database: %s', e)
+
+            data['status'] = 'unavailable'
+            return JSONResponse(data, status_code=503)
+
+        data['database']['ping_ms'] = (time.perf_counter() - start) * 1000
+        return JSONResponse(data, status_code=200)
@@ -23,17 +23,16 @@ SOFTWARE.
 
 from __future__ import annotations
 
+import json
 import logging
 from typing import TYPE_CHECKING, Any
 
-from starlette.authentication import requires
 from starlette.responses import JSONResponse, Response
 
 import core
 
 if TYPE_CHECKING:
     from starlette.requests import Request
-    from starlette.websockets import WebSocket
 
     from api.server import Server
 
@@ -45,40 +44,28 @@ class Members(core.View):
     def __init__(self, app: Server) -> None:
         self.app = app
 
-    @core.route("/dpy/modlog", methods=["POST"])
-    @requires("member")
+    @core.route("/dpy/modlog", methods=["POST"], scopes=["member"])
     async def post_dpy_modlog(self, request: Request) -> Response:
-        application: core.ApplicationModel = request.user.model
+        application: core.ApplicationModel | None = await request.user.resolve()
+        if application is None:
+            return JSONResponse({"error": "This token is no longer valid."}, status_code=401)
 
         try:
-            data = await request.json()
+            # The body is only decoded to validate it, subscribers receive the JSON as it was sent...
+            data: str = (await request.body()).decode(encoding="UTF-8").strip()
+            json.loads(data)
         except Exception as e:
             logger.debug('Received bad JSON in "/members/dpy/modlog": %s', e)
             return JSONResponse({"error": "Bad POST JSON Body."}, status_code=400)
 
-        payload: dict[str, Any] = {
+        envelope: dict[str, Any] = {
             "op": core.WebsocketOPCodes.EVENT,
             "subscription": core.WebsocketSubscriptions.DPY_MOD_LOG,
             "application": application.uid,
             "application_name": application.name,
-            "payload": data,
         }
 
-        count = 0
-        total = 0
-        for subscriber in self.app.subscription_sockets[core.WebsocketSubscriptions.DPY_MOD_LOG]:
-            websockets: list[WebSocket] = list(self.app.sockets[subscriber].values())
+        result = await self.app.publish(core.WebsocketSubscriptions.DPY_MOD_LOG, envelope, payload=data)
+        await result.wait(timeout=self.app.publish_wait)
 
-            total += len(websockets)
-            payload["user_id"] = subscriber
-
-            for websocket in websockets:
-                try:
-                    await websocket.send_json(data=payload)
-                except Exception as e:
-                    logger.debug('Failed to send payload to a websocket for "%s": %s', subscriber, e)
-                else:
-                    count += 1
-
-        to_send: dict[str, int] = {"subscribers": total, "successful": count}
-        return JSONResponse(to_send, status_code=200)
+        return JSONResponse(result.as_dict(), status_code=200)
@@ -22,40 +22,56 @@ SOFTWARE.
 """
 from __future__ import annotations
 
+import datetime
 from typing import TYPE_CHECKING
 
-from starlette.authentication import requires
-from starlette.requests import Request
-from starlette.responses import JSONResponse, Response
+from starlette.responses import JSONResponse, Response, StreamingResponse
 
 import core
 
 if TYPE_CHECKING:
+    from starlette.requests import Request
+
     from api.server import Server
 
 
+GRANULARITIES: tuple[str, ...] = ('hour', 'day', 'week', 'month', 'year')
+
+
+def parse_timestamp(value: str | None) -> datetime.datetime | None:
+    if not value:
+        return None
+
+    timestamp = datetime.datetime.fromisoformat(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=datetime.timezone.utc)
+
+    return timestamp
+
+
 class Users(core.View):
     def __init__(self, app: Server) -> None:
         self.app = app
 
-    @core.route('/@me')
-    @requires('bearer')
+    @core.route('/@me', scopes=['bearer'])
     async def at_me(self, request: Request) -> Response:
-        user: core.UserModel = request.user.model
+        user: core.UserModel | None = await request.user.resolve()
+        if user is None:
+            return JSONResponse({'error': 'This token is no longer valid.'}, status_code=401)
 
         return JSONResponse(user.as_dict(), status_code=200)
 
-    @core.route('/@me/application')
-    @requires('application')
+    @core.route('/@me/application', scopes=['application'])
     async def at_me_app(self, request: Request) -> Response:
-        application: core.ApplicationModel = request.user.model
+        application: core.ApplicationModel | None = await request.user.resolve()
+        if application is None:
+            return JSONResponse({'error': 'This token is no longer valid.'}, status_code=401)
 
         return JSONResponse(application.as_dict(), status_code=200)
 
-    @core.route('/@me/applications')
-    @requires('bearer')
+    @core.route('/@me/applications', scopes=['bearer'])
     async def at_me_apps(self, request: Request) -> Response:
-        uid: int = request.user.model.uid
+        uid: int = request.user.uid
         applications = await self.app.database.fetch_applications(user_id=uid)
 
         if not applications:
@@ -64,20 +80,52 @@ class Users(core.View):
         apps = [app.as_dict() for app in applications if not app.invalid]
         return JSONResponse(apps, status_code=200)
 
-    @core.route('/@me/logs')
-    @requires('bearer')
+    @core.route('/@me/logs', scopes=['bearer'])
     async def fetch_application_logs(self, request: Request) -> Response:
-        user: core.UserModel = request.user.model
+        uid: int = request.user.uid
 
-        logs = await self.app.database.fetch_user_logs(user_id=user.uid)
+        try:
+            options = core.LogQuery.from_params(
+                request.query_params, stream='application/x-ndjson' in request.headers.get('accept', '')
+            )
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status_code=400)
 
-        logs = [log.as_dict() for log in logs]
-        return JSONResponse(logs, status_code=200)
+        if options.stream:
+            logs = self.app.database.stream_user_logs(user_id=uid, options=options)
+            return StreamingResponse(core.ndjson(logs), status_code=200, media_type='application/x-ndjson')
 
-    @core.route('/@me/logs/requests')
-    @requires('bearer')
-    async def fetch_user_requests(self, request: Request) -> Response:
-        user: core.UserModel = request.user.model
+        logs = await self.app.database.fetch_user_logs(user_id=uid, options=options)
+        return JSONResponse(options.page(logs), status_code=200)
 
-        data = await self.app.database.fetch_all_user_uses(user_id=user.uid)
+    @core.route('/@me/logs/requests', scopes=['bearer'])
+    async def fetch_user_requests(self, request: Request) -> Response:
+        uid: int = request.user.uid
+        params = request.query_params
+
+        try:
+            since = parse_timestamp(params.get('since'))
+            until = parse_timestamp(params.get('until'))
+        except ValueError:
+            return JSONResponse({'error': 'since and until must be ISO 8601 timestamps.'}, status_code=400)
+
+        granularity: str | None = params.get('granularity')
+        if granularity is None:
+            data = await self.app.database.fetch_all_user_uses(user_id=uid, since=since, until=until)
+            return JSONResponse(data, status_code=200)
+
+        if granularity not in GRANULARITIES:
+            return JSONResponse({'error': f'granularity must be one of: {", ".join(GRANULARITIES)}'}, status_code=400)
+
+        series = await self.app.database.fetch_user_usage_series(
+            user_id=uid, granularity=granularity, since=since, until=until
+        )
+
+        data = {
+            'granularity': granularity,
+            'since': since.isoformat() if since else None,
+            'until': until.isoformat() if until else None,
+            'total': sum(entry['total'] for entry in series),
+            'series': series,
+        }
         return JSONResponse(data, status_code=200)
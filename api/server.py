@@ -20,41 +20,100 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
-import secrets
+import time
 from typing import Any
 
-import aiohttp
 from starlette.authentication import requires
 from starlette.middleware import Middleware
-from starlette.middleware.authentication import AuthenticationMiddleware
 from starlette.middleware.cors import CORSMiddleware
 from starlette.routing import WebSocketRoute
 from starlette.websockets import WebSocket, WebSocketDisconnect
 
 import core
 
-from .middleware.auth import AuthBackend
+from .middleware.auth import AuthBackend, AuthMiddleware
+from .middleware.bans import BanMiddleware, UserBanMiddleware
+from .middleware.metrics import MetricsMiddleware
+from .middleware.ratelimit import RateLimitMiddleware
+from .middleware.scope import DatabaseScopeMiddleware
+from .routes.admin import Admin
 from .routes.applications import Applications
 from .routes.auth import Auth
+from .routes.health import Health
 from .routes.members import Members
+from .routes.metrics import Metrics
 from .routes.users import Users
 
 
 class Server(core.Application):
-    def __init__(self, *, session: aiohttp.ClientSession, database: core.Database) -> None:
-        self.session = session
+    def __init__(self, *, database: core.Database) -> None:
         self.database = database
 
-        views: list[core.View] = [Users(self), Auth(self), Applications(self), Members(self)]
+        self.health_timeout: float = core.config['DATABASE'].get('health_timeout', 2.0)
+
+        self.proxies: core.TrustedProxies = core.TrustedProxies.from_config(core.config['SERVER'])
+        self.ratelimiter: core.RateLimiter = core.RateLimiter.from_config(core.config.get('RATELIMIT', {}))
+        self.oauth: core.GitHubOAuth = core.GitHubOAuth.from_config(core.config.get('OAUTH', {}))
+
+        views: list[core.View] = [Users(self), Auth(self), Applications(self), Members(self), Admin(self), Health(self)]
         middleware: list[Middleware] = [
-            Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
-            Middleware(AuthenticationMiddleware, backend=AuthBackend(self)),
+            # Preflights are answered here, before any other middleware, and cached by browsers for cors_max_age seconds...
+            Middleware(
+                CORSMiddleware,
+                allow_origins=['*'],
+                allow_methods=['*'],
+                allow_headers=['*'],
+                max_age=core.config['SERVER'].get('cors_max_age', 7200),
+            ),
+            Middleware(BanMiddleware, bans=database.bans, proxies=self.proxies),
+            Middleware(DatabaseScopeMiddleware, database=database),
+            Middleware(AuthMiddleware, backend=AuthBackend(self)),
+            Middleware(UserBanMiddleware, bans=database.bans),
+            Middleware(RateLimitMiddleware, limiter=self.ratelimiter, proxies=self.proxies),
         ]
 
-        self.sockets: dict[int, dict[str, WebSocket]] = {}
-        self.subscription_sockets: dict[str, set[int]] = {
-            core.WebsocketSubscriptions.DPY_MOD_LOG: set()
-        }
+        if core.config.get('METRICS', {}).get('enabled', True):
+            views.append(Metrics(self))
+            middleware.insert(0, Middleware(MetricsMiddleware))
+
+        websocket_config: dict[str, Any] = core.config.get('WEBSOCKETS', {})
+        self.websocket_queue_size: int = websocket_config.get('queue_size', 256)
+        self.publish_wait: float = websocket_config.get('publish_wait', 0.0)
+
+        events_config: dict[str, Any] = core.config.get('EVENTS', {})
+        self.events: core.EventBus = core.EventBus()
+
+        if events_config.get('backend', 'memory') == 'postgres':
+            self.events = core.PostgresEventBus(
+                database,
+                channel=events_config.get('channel', 'papi_events'),
+                spill_threshold=events_config.get('spill_threshold', 7500),
+                spill_retention=events_config.get('spill_retention', 300),
+            )
+
+        self.events.subscribe('websockets.broadcast', self._remote_broadcast)
+        self.events.subscribe('bans.changed', self._bans_changed)
+        self.ratelimiter.attach(self.events)
+        database.revocations.attach(self.events)
+        database.token_filter.attach(self.events)
+        database.auth_cache.attach(self.events)
+
+        self.connections: core.ConnectionRegistry = core.ConnectionRegistry(
+            topics=(core.WebsocketSubscriptions.DPY_MOD_LOG,)
+        )
+
+        core.metrics.gauge(
+            'papi_websocket_connections', 'Open websocket connections.', callback=lambda: len(self.connections)
+        )
+        core.metrics.gauge(
+            'papi_websocket_subscriptions',
+            'Websocket connections subscribed to each topic.',
+            labels=('topic',),
+            callback=lambda: {(t,): len(self.connections.subscribers(t)) for t in self.connections.topics},
+        )
+        self.fanout_time: core.Histogram = core.metrics.histogram(
+            'papi_websocket_fanout_seconds', 'Time taken to queue a broadcast for every subscriber.', labels=('topic',)
+        )
 
         super().__init__(
             prefix=core.config['SERVER']['prefix'],
@@ -68,24 +127,16 @@ class Server(core.Application):
         await websocket.accept()
 
         subs: str = websocket.headers.get('subscriptions', '').replace(' ', '')
-        token: str = websocket.headers['authorization']
-        uid: int | None = core.id_from_token(token)
-
-        assert uid
+        # The identity resolved by AuthMiddleware for the handshake, rather than decoding the token again...
+        uid: int = websocket.user.uid
 
-        hash_ = secrets.token_urlsafe(8)
-        try:
-            self.sockets[uid][hash_] = websocket
-        except KeyError:
-            self.sockets[uid] = {hash_: websocket}
+        connection = core.WebsocketConnection(websocket, uid=uid, queue_size=self.websocket_queue_size)
+        connection.start()
 
-        # Filter out bad subscriptions...
-        valid: list[str] = list(self.subscription_sockets.keys())
-        subscriptions: list[str] = [sub for sub in subs.split(',') if sub in valid]
+        self.connections.add(connection)
 
-        # Add the initial websocket subscriptions...
-        for sub in subscriptions:
-            self.subscription_sockets[sub].add(uid)
+        # Add the initial websocket subscriptions, ignoring bad subscriptions...
+        subscriptions: list[str] = self.connections.subscribe(connection, subs.split(','))
 
         # Send the initial accepted response. Includes user_id and subscriptions... op: 0
         data: dict[str, Any] = {
@@ -93,85 +144,115 @@ class Server(core.Application):
             'user_id': uid,
             'subscriptions': subscriptions
         }
-        await websocket.send_json(data=data)
+        connection.send(data)
 
         # Listen for messages from our clients...
         # This keeps the connection alive on our end...
-        while True:
+        try:
+            while True:
+
+                try:
+                    message: dict[str, Any] = await websocket.receive_json()
+                except WebSocketDisconnect:
+                    break
+
+                op: str | None = message.get('op')
+
+                if op == core.WebsocketOPCodes.SUBSCRIBE:
+                    response = self.websocket_subscribe(connection, message=message)
+                    connection.send(response)
+
+                elif op == core.WebsocketOPCodes.UNSUBSCRIBE:
+                    response = self.websocket_unsubscribe(connection, message=message)
+                    connection.send(response)
+
+                else:
+                    response = {
+                        'op': core.WebsocketOPCodes.NOTIFICATION,
+                        'type': core.WebsocketNotificationTypes.UNKNOWN_OP,
+                        'received': op
+                    }
+                    connection.send(response)
+        finally:
+            # Remove the websocket and its subscriptions...
+            connection.stop()
+            self.connections.remove(connection)
+
+    def broadcast(self, subscription: str, event: core.EncodedEvent) -> core.BroadcastResult:
+        """Queue an event for every connection subscribed to ``subscription`` and return immediately.
+
+        The event is encoded once, and each subscriber receives it with their ``user_id`` added.
+        """
+        result = core.BroadcastResult()
+        start: float = time.perf_counter()
+
+        for connection in self.connections.subscribers(subscription):
+            result.subscribers += 1
+
+            if connection.send(event.frame(connection.uid), result):
+                result.queued += 1
+            else:
+                result.dropped += 1
 
-            try:
-                message: dict[str, Any] = await websocket.receive_json()
-            except WebSocketDisconnect:
-                break
+        self.fanout_time.observe(time.perf_counter() - start, subscription)
+        return result
 
-            op: str | None = message.get('op')
+    async def publish(self, subscription: str, envelope: dict[str, Any], *, payload: str) -> core.BroadcastResult:
+        """Broadcast an event to the connections on this process, and publish it to every other process.
 
-            if op == core.WebsocketOPCodes.SUBSCRIBE:
-                response = self.websocket_subscribe(uid=uid, message=message)
-                await websocket.send_json(data=response)
+        The returned result only counts the connections on this process.
+        """
+        result = self.broadcast(subscription, core.EncodedEvent(envelope, payload=payload))
 
-            elif op == core.WebsocketOPCodes.UNSUBSCRIBE:
-                response = self.websocket_unsubscribe(uid=uid, message=message)
-                await websocket.send_json(data=response)
+        data: dict[str, Any] = {'subscription': subscription, 'envelope': envelope, 'payload': payload}
+        await self.events.publish('websockets.broadcast', data)
 
-            else:
-                response = {
-                    'op': core.WebsocketOPCodes.NOTIFICATION,
-                    'type': core.WebsocketNotificationTypes.UNKNOWN_OP,
-                    'received': op
-                }
-                await websocket.send_json(data=response)
+        return result
 
-        # Remove the websocket...
-        del self.sockets[uid][hash_]
+    async def _remote_broadcast(self, data: dict[str, Any]) -> None:
+        event = core.EncodedEvent(data['envelope'], payload=data['payload'])
+        self.broadcast(data['subscription'], event)
 
-    def websocket_subscribe(self, *, uid: int, message: dict[str, Any]) -> dict[str, Any]:
-        subs: list[str] = message.get('subscriptions', [])
+    async def refresh_bans(self, *, userid: int | None = None) -> None:
+        """Apply a change to the bans table on this process, and every other process."""
+        data: dict[str, Any] = {'userid': userid}
+
+        await self._bans_changed(data)
+        await self.events.publish('bans.changed', data)
 
-        # Filter out bad subscriptions...
-        valid: list[str] = list(self.subscription_sockets.keys())
-        subscriptions: list[str] = [sub for sub in subs if sub in valid]
+    async def _bans_changed(self, data: dict[str, Any]) -> None:
+        await self.database.bans.refresh()
 
-        for sub in subscriptions:
-            self.subscription_sockets[sub].add(uid)
+        # Already connected websockets are closed when their user is banned...
+        userid: int | None = data.get('userid')
+        if userid is not None and self.database.bans.check(uid=userid):
+            for connection in self.connections.for_user(userid):
+                connection.evict(core.WebsocketCloseCodes.BANNED)
 
-        subscribed: list[str] = [sub for sub in self.subscription_sockets if uid in self.subscription_sockets[sub]]
+    def websocket_subscribe(self, connection: core.WebsocketConnection, *, message: dict[str, Any]) -> dict[str, Any]:
+        subs: list[str] = message.get('subscriptions', [])
+        subscriptions: list[str] = self.connections.subscribe(connection, subs)
 
         data: dict[str, Any] = {
             'op': core.WebsocketOPCodes.NOTIFICATION,
             'type': core.WebsocketNotificationTypes.SUBSCRIPTION_ADDED,
-            'user_id': uid,
+            'user_id': connection.uid,
             'added': subscriptions,
-            'subscriptions': subscribed
+            'subscriptions': sorted(connection.subscriptions)
         }
 
         return data
 
-    def websocket_unsubscribe(self, *, uid: int, message: dict[str, Any]) -> dict[str, Any]:
+    def websocket_unsubscribe(self, connection: core.WebsocketConnection, *, message: dict[str, Any]) -> dict[str, Any]:
         subs: list[str] = message.get('subscriptions', [])
-
-        # Filter out bad subscriptions...
-        valid: list[str] = list(self.subscription_sockets.keys())
-        subscriptions: list[str] = [sub for sub in subs if sub in valid]
-        removed: list[str] = []
-
-        for sub in subscriptions:
-
-            try:
-                self.subscription_sockets[sub].remove(uid)
-            except KeyError:
-                pass
-            else:
-                removed.append(sub)
-
-        subscribed: list[str] = [sub for sub in self.subscription_sockets if uid in self.subscription_sockets[sub]]
+        removed: list[str] = self.connections.unsubscribe(connection, subs)
 
         data: dict[str, Any] = {
             'op': core.WebsocketOPCodes.NOTIFICATION,
             'type': core.WebsocketNotificationTypes.SUBSCRIPTION_REMOVED,
-            'user_id': uid,
+            'user_id': connection.uid,
             'removed': removed,
-            'subscriptions': subscribed
+            'subscriptions': sorted(connection.subscriptions)
         }
 
         return data
@@ -0,0 +1,150 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from starlette.types import ASGIApp, Message
+
+__all__ = ('WebSocketClient', 'request')
+
+
+def _scope(kind: str, path: str, headers: dict[str, str] | None) -> dict[str, Any]:
+    path, _, query = path.partition('?')
+
+    return {
+        'type': kind,
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'scheme': 'http' if kind == 'http' else 'ws',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        'client': ('127.0.0.1', 50000),
+        'server': ('benchmark', 80),
+    }
+
+
+async def request(
+    app: ASGIApp, method: str, path: str, *, headers: dict[str, str] | None = None, body: bytes = b''
+) -> tuple[int, bytes]:
+    """Send a single HTTP request straight to an ASGI app, without any network or client library in between.
+
+    Returns the response status and body.
+    """
+    scope: dict[str, Any] = {**_scope('http', path, headers), 'method': method}
+
+    status: int = 0
+    chunks: list[bytes] = []
+    sent: bool = False
+    finished: asyncio.Event = asyncio.Event()
+
+    async def receive() -> Message:
+        nonlocal sent
+
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        # Streaming responses listen for a disconnect, which only happens once the response is complete...
+        await finished.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message: Message) -> None:
+        nonlocal status
+
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+
+            if not message.get('more_body', False):
+                finished.set()
+
+    try:
+        await app(scope, receive, send)  # type: ignore
+    finally:
+        finished.set()
+
+    return status, b''.join(chunks)
+
+
+class WebSocketClient:
+    """A websocket connected straight to an ASGI app, counting the text frames it receives.
+
+    ``on_frame`` is called with each text frame received after the connection was accepted.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        path: str,
+        *,
+        headers: dict[str, str] | None = None,
+        on_frame: Callable[[str], None] | None = None,
+    ) -> None:
+        self.app = app
+        self.scope: dict[str, Any] = _scope('websocket', path, headers)
+        self.on_frame: Callable[[str], None] | None = on_frame
+
+        self.frames: int = 0
+        self.close_code: int | None = None
+
+        self._inbound: asyncio.Queue[Message] = asyncio.Queue()
+        self._accepted: asyncio.Event = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+    async def _receive(self) -> Message:
+        return await self._inbound.get()
+
+    async def _send(self, message: Message) -> None:
+        if message['type'] == 'websocket.accept':
+            self._accepted.set()
+        elif message['type'] == 'websocket.send':
+            self.frames += 1
+
+            if self.on_frame is not None:
+                self.on_frame(message.get('text') or '')
+        elif message['type'] == 'websocket.close':
+            self.close_code = message.get('code', 1000)
+            self._accepted.set()
+
+    async def connect(self) -> None:
+        self._inbound.put_nowait({'type': 'websocket.connect'})
+        self._task = asyncio.create_task(self.app(self.scope, self._receive, self._send))  # type: ignore
+
+        await self._accepted.wait()
+        if self.close_code is not None:
+            raise ConnectionError(f'Websocket was closed with code {self.close_code}.')
+
+    async def close(self) -> None:
+        self._inbound.put_nowait({'type': 'websocket.disconnect', 'code': 1000})
+
+        if self._task is not None:
+            await self._task
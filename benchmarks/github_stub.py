@@ -0,0 +1,151 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import zlib
+
+from aiohttp import web
+
+__all__ = ('GitHubStub',)
+
+__doc__ = """A stand in for GitHub's OAuth code exchange and ``GET /user``, so logins can be load tested offline.
+
+Every code is exchanged for a token, except ``bad`` which is rejected like an expired code. The user for a token has
+an ID derived from the code, so the same code always logs in the same user.
+
+Run standalone and point ``token_url`` and ``api_url`` in the ``[OAUTH]`` config at it:
+
+    python -m benchmarks.github_stub --port 2800 --latency 50
+
+    token_url = "http://127.0.0.1:2800/login/oauth/access_token"
+    api_url = "http://127.0.0.1:2800"
+"""
+
+
+class GitHubStub:
+    """The stub server. Every response is delayed by ``latency`` seconds, and ``failure_rate`` of them are ``502``."""
+
+    def __init__(self, *, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, failure_rate: float = 0.0) -> None:
+        self.host: str = host
+        self.port: int = port
+        self.latency: float = latency
+        self.failure_rate: float = failure_rate
+
+        self.exchanges: int = 0
+        self.lookups: int = 0
+
+        self.app: web.Application = web.Application()
+        self.app.router.add_post('/login/oauth/access_token', self.access_token)
+        self.app.router.add_get('/user', self.user)
+
+        self._runner: web.AppRunner | None = None
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+
+        # Port 0 binds any free port, so read back the one the OS chose...
+        self.port = site._server.sockets[0].getsockname()[1]  # type: ignore
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _delay(self) -> web.Response | None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if self.failure_rate and random.random() < self.failure_rate:
+            return web.json_response({'message': 'Server Error'}, status=502)
+
+        return None
+
+    async def access_token(self, request: web.Request) -> web.Response:
+        self.exchanges += 1
+
+        failed: web.Response | None = await self._delay()
+        if failed:
+            return failed
+
+        data = await request.post()
+        code = str(data.get('code', ''))
+
+        if not code or code == 'bad':
+            return web.json_response({'error': 'bad_verification_code', 'error_description': 'The code is invalid.'})
+
+        return web.json_response({'access_token': f'gho_{code}', 'token_type': 'bearer', 'scope': ''})
+
+    async def user(self, request: web.Request) -> web.Response:
+        self.lookups += 1
+
+        failed: web.Response | None = await self._delay()
+        if failed:
+            return failed
+
+        token: str = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not token.startswith('gho_'):
+            return web.json_response({'message': 'Bad credentials'}, status=401)
+
+        code: str = token.removeprefix('gho_')
+        return web.json_response({'id': zlib.crc32(code.encode()), 'login': f'stub-{code}', 'name': None})
+
+
+async def serve(args: argparse.Namespace) -> None:
+    stub = GitHubStub(host=args.host, port=args.port, latency=args.latency / 1000, failure_rate=args.failure_rate)
+    await stub.start()
+
+    print(f'GitHub stub listening on {stub.url}')
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await stub.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Serve a stub of the GitHub OAuth and user endpoints.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2800)
+    parser.add_argument('--latency', type=float, default=0.0, help='Milliseconds each response is delayed.')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of responses which are 502.')
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
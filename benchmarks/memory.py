@@ -0,0 +1,331 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextlib
+import datetime
+import itertools
+from typing import TYPE_CHECKING, Any
+
+import core
+from core.database.logs import LogWriter
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+__all__ = ('MemoryDatabase',)
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class MemoryLogWriter(LogWriter):
+    """A `LogWriter` which keeps flushed batches in memory, so logs written by requests can be listed again."""
+
+    database: MemoryDatabase
+
+    async def _flush(self, batch: list[tuple[Any, ...]]) -> None:
+        for record in batch:
+            row: dict[str, Any] = dict(zip(self.COLUMNS, record))
+            row['id'] = next(self.database._log_ids)  # pyright: ignore [reportPrivateUsage]
+
+            self.database.log_rows.append(row)
+
+        self.flushes += 1
+        self.written += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+
+class MemoryDatabase(core.Database):
+    """An in-memory stand-in for `core.Database`, for driving `api.Server` without PostgreSQL.
+
+    The user, application and log methods used by the API keep their signatures and return the same models, and token
+    lookups go through the same batch loaders. Each of them sleeps for ``latency`` seconds first, to stand in for a round
+    trip to the database. Any other method needs a connection, and raises `RuntimeError`.
+
+    Parameters
+    ----------
+    latency: float
+        The amount of seconds each method waits before answering.
+    max_logs: int
+        The maximum amount of log rows kept. The oldest are discarded first.
+    """
+
+    def __init__(self, *, latency: float = 0.0, max_logs: int = 100_000) -> None:
+        super().__init__()
+
+        self.latency: float = latency
+
+        self.users: dict[int, dict[str, Any]] = {}
+        self.tokens: dict[int, dict[str, Any]] = {}
+        self.log_rows: collections.deque[dict[str, Any]] = collections.deque(maxlen=max_logs)
+
+        # Keyed by token digest, as tokens are stored in the database...
+        self._bearers: dict[bytes, int] = {}
+        self._github_ids: dict[int, int] = {}
+        self._token_ids: dict[bytes, int] = {}
+        self._user_tokens: dict[int, list[int]] = {}
+
+        self._uids: itertools.count[int] = itertools.count(1)
+        self._tids: itertools.count[int] = itertools.count(1)
+        self._log_ids: itertools.count[int] = itertools.count(1)
+
+        self.logs = MemoryLogWriter(self)
+
+        # Every token is issued by this one process, so the filter can not miss any without a shared event bus.
+        self.token_filter.enabled = core.config.get('TOKENS', {}).get('filter', True)
+
+    async def setup(self) -> MemoryDatabase:
+        await self.token_filter.start()
+        self.logs.start()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.token_filter.close()
+        await self.logs.close()
+
+    def acquire(self) -> Any:
+        raise RuntimeError('MemoryDatabase has no connections, this method is not available in memory.')
+
+    @contextlib.asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        # Each method is applied at once, so there is nothing to commit or roll back...
+        yield
+
+    async def _wait(self) -> None:
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+
+    async def fetch_token_digests(self) -> list[bytes]:
+        return [u['bearer_digest'] for u in self.users.values()] + [
+            t['token_digest'] for t in self.tokens.values() if not t['invalid']
+        ]
+
+    def _user(self, uid: int, bearer: str | None = None) -> core.UserModel:
+        return core.UserModel({**self.users[uid], 'bearer': bearer})
+
+    def _application(self, tid: int, token: str | None = None) -> core.ApplicationModel:
+        row: dict[str, Any] = self.tokens[tid]
+        return core.ApplicationModel({**self.users[row['user_id']], **row, 'token': token})
+
+    async def _fetch_user_by_uid(self, *, uid: int) -> core.UserModel | None:
+        await self._wait()
+        return self._user(uid) if uid in self.users else None
+
+    async def _fetch_user_by_github_id(self, *, github_id: int) -> core.UserModel | None:
+        await self._wait()
+
+        uid: int | None = self._github_ids.get(github_id)
+        return self._user(uid) if uid is not None else None
+
+    async def _fetch_users_by_bearer(self, bearers: list[str]) -> dict[str, core.UserModel]:
+        await self._wait()
+
+        uids = {bearer: self._bearers.get(core.token_digest(bearer)) for bearer in bearers}
+        return {bearer: self._user(uid, bearer) for bearer, uid in uids.items() if uid is not None}
+
+    async def _fetch_applications_by_token(self, tokens: list[str]) -> dict[str, core.ApplicationModel]:
+        await self._wait()
+
+        tids = {token: self._token_ids.get(core.token_digest(token)) for token in tokens}
+        return {token: self._application(tid, token) for token, tid in tids.items() if tid is not None}
+
+    async def fetch_applications(self, *, user_id: int) -> list[core.ApplicationModel] | None:
+        await self._wait()
+
+        apps = [self._application(tid) for tid in self._user_tokens.get(user_id, [])]
+        return apps or None
+
+    async def create_user(self, *, github_id: int, username: str) -> core.UserModel:
+        await self._wait()
+
+        uid: int = next(self._uids)
+        user: dict[str, Any] = {
+            'uid': uid,
+            'github_id': github_id,
+            'username': username,
+            'admin': False,
+            'created': _now(),
+        }
+        bearer: str = self.issue_token(uid, flags=self.token_flags(user))
+        user['bearer_digest'] = core.token_digest(bearer)
+
+        self.users[uid] = user
+        self._bearers[user['bearer_digest']] = uid
+        self._github_ids[github_id] = uid
+
+        await self.token_filter.issue(bearer)
+        return self._user(uid, bearer)
+
+    async def refresh_or_create_user(self, *, github_id: int, username: str) -> core.UserModel:
+        uid: int | None = self._github_ids.get(github_id)
+        if uid is None:
+            return await self.create_user(github_id=github_id, username=username)
+
+        await self._wait()
+        user: dict[str, Any] = self.users[uid]
+
+        issued: int = int(_now().timestamp() * 1000) - core.EPOCH
+
+        bearer: str = self.issue_token(uid, flags=self.token_flags(user), issued=issued)
+
+        del self._bearers[user['bearer_digest']]
+        user.update(username=username, bearer_digest=core.token_digest(bearer))
+        self._bearers[user['bearer_digest']] = uid
+
+        await self.auth_cache.purge(uid=uid)
+        self.revocations.add('user', uid, issued)
+        await self.token_filter.issue(bearer)
+        return self._user(uid, bearer)
+
+    async def create_application(self, *, user_id: int, name: str, description: str) -> core.ApplicationModel:
+        await self._wait()
+
+        tid: int = next(self._tids)
+        self.tokens[tid] = {
+            'tid': tid,
+            'user_id': user_id,
+            'token_name': name,
+            'token_description': description,
+            'verified': False,
+            'websockets': False,
+            'member': False,
+            'invalid': False,
+        }
+        token: str = self.issue_token(user_id, tid=tid, flags=self.token_flags({**self.users[user_id], **self.tokens[tid]}))
+        self.tokens[tid]['token_digest'] = core.token_digest(token)
+
+        self._token_ids[self.tokens[tid]['token_digest']] = tid
+        self._user_tokens.setdefault(user_id, []).append(tid)
+
+        await self.token_filter.issue(token)
+        return self._application(tid, token)
+
+    async def regenerate_application_token(self, *, user_id: int, old: str) -> core.ApplicationModel:
+        await self._wait()
+
+        issued: int = int(_now().timestamp() * 1000) - core.EPOCH
+
+        tid: int = self._token_ids.pop(core.token_digest(old))
+        token: str = self.issue_token(
+            user_id, tid=tid, flags=self.token_flags({**self.users[user_id], **self.tokens[tid]}), issued=issued
+        )
+        self.tokens[tid]['token_digest'] = core.token_digest(token)
+        self._token_ids[self.tokens[tid]['token_digest']] = tid
+
+        await self.auth_cache.purge(old)
+        self.revocations.add('application', tid, issued)
+        await self.token_filter.issue(token)
+        return self._application(tid, token)
+
+    async def delete_application(self, *, token: str) -> None:
+        await self._wait()
+
+        tid: int | None = self._token_ids.get(core.token_digest(token))
+        if tid is not None:
+            self.tokens[tid]['invalid'] = True
+            self.revocations.add('application', tid, self.revocations.FOREVER)
+
+        await self.auth_cache.purge(token)
+
+    async def grant_application(self, *, token: str, **permissions: bool) -> core.ApplicationModel:
+        """Set permissions such as ``websockets`` or ``member`` on an application, which the API itself never does.
+
+        Tokens embed their permissions, so the application is given a new token.
+        """
+        tid: int = self._token_ids[core.token_digest(token)]
+        self.tokens[tid].update(permissions)
+
+        return await self.regenerate_application_token(user_id=self.tokens[tid]['user_id'], old=token)
+
+    def add_log_row(self, **row: Any) -> None:
+        """Add a log row directly, without going through the log writer."""
+        self.log_rows.append({'id': next(self._log_ids), **row})
+
+    def _matching_logs(self, column: str, value: int, options: core.LogQuery) -> list[core.LogModel]:
+        before, after = options.before, options.after
+        rows = reversed(self.log_rows) if not after else iter(self.log_rows)
+        logs: list[core.LogModel] = []
+
+        for row in rows:
+            if row[column] != value:
+                continue
+
+            key = (row['accessed'], row['id'])
+            if before and key >= (before.accessed, before.id):
+                continue
+            if after and key <= (after.accessed, after.id):
+                continue
+
+            if options.method and row['method'] != options.method:
+                continue
+            if options.status is not None and row['response_code'] != options.status:
+                continue
+            if options.route and options.route not in row['route']:
+                continue
+
+            logs.append(core.LogModel(row))
+            if options.limit is not None and len(logs) >= options.limit:
+                break
+
+        # Pages after a cursor are found oldest first, but always returned newest first...
+        if after:
+            logs.reverse()
+
+        return logs
+
+    async def _fetch_logs(self, column: str, value: int, options: core.LogQuery) -> list[core.LogModel]:
+        await self._wait()
+        return self._matching_logs(column, value, options)
+
+    async def _stream_logs(self, column: str, value: int, options: core.LogQuery) -> AsyncIterator[core.LogModel]:
+        await self._wait()
+
+        for log in self._matching_logs(column, value, options):
+            yield log
+
+    async def fetch_all_user_uses(
+        self,
+        *,
+        user_id: int,
+        since: datetime.datetime | None = None,
+        until: datetime.datetime | None = None,
+    ) -> dict[Any, int]:
+        await self._wait()
+
+        counts: dict[Any, int] = {'total': 0}
+        for row in self.log_rows:
+            if row['userid'] != user_id or (since and row['accessed'] < since) or (until and row['accessed'] >= until):
+                continue
+
+            counts['total'] += 1
+            counts[row['appid']] = counts.get(row['appid'], 0) + 1
+
+        return counts
+
+    async def fetch_bans(self) -> list[core.BanModel]:
+        await self._wait()
+        return []
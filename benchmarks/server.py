@@ -0,0 +1,428 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime
+import gc
+import itertools
+import json
+import logging
+import math
+import pathlib
+import platform
+import subprocess
+import time
+import tracemalloc
+from typing import Any
+
+import api
+import core
+
+from .asgi import WebSocketClient, request
+from .github_stub import GitHubStub
+from .memory import MemoryDatabase
+
+__doc__ = """Load test `api.Server` in process, over ASGI, with a `MemoryDatabase` in place of PostgreSQL.
+
+Each scenario reports throughput, p50/p99 latency, garbage collections, and the memory allocated while serving a
+further ``--alloc-requests`` requests under tracemalloc. Results can be written to JSON and compared with a previous run.
+
+Run from the repository root, with a config.toml present:
+
+    python -m benchmarks.server --latency 1 --output before.json
+    python -m benchmarks.server --latency 1 --compare before.json
+"""
+
+
+class Bench:
+    """An `api.Server` backed by a `MemoryDatabase`, with a user and applications to make requests as."""
+
+    def __init__(self, *, latency: float) -> None:
+        self.database: MemoryDatabase = MemoryDatabase(latency=latency)
+        self.server: api.Server = api.Server(database=self.database)
+
+        # Only the request path is measured, so nothing is limited and publishing never waits for delivery...
+        self.server.ratelimiter.enabled = False
+        self.server.publish_wait = 0.0
+
+        self.prefix: str = core.config['SERVER']['prefix']
+
+        self.user: core.UserModel
+        self.application: core.ApplicationModel
+
+    async def setup(self) -> None:
+        await self.database.setup()
+
+        self.user = await self.database.create_user(github_id=1, username='benchmark')
+        application = await self.database.create_application(user_id=self.user.uid, name='benchmark', description='')
+        self.application = await self.database.grant_application(token=application.token, websockets=True, member=True)
+
+    async def close(self) -> None:
+        await self.database.__aexit__()
+
+    async def call(
+        self, method: str, path: str, *, token: str, body: bytes = b'', expect: int = 200
+    ) -> bytes:
+        status, data = await request(
+            self.server, method, f'{self.prefix}{path}', headers={'authorization': token}, body=body
+        )
+
+        if status != expect:
+            raise RuntimeError(f'{method} {path} responded {status}, expected {expect}: {data[:200]!r}')
+
+        return data
+
+
+class Scenario:
+    """A request made repeatedly against a `Bench`. ``concurrency`` overrides the concurrency given on the CLI."""
+
+    name: str
+    concurrency: int | None = None
+
+    async def prepare(self, bench: Bench, *, total: int) -> None:
+        pass
+
+    async def call(self, bench: Bench, index: int) -> None:
+        raise NotImplementedError
+
+    async def cleanup(self, bench: Bench) -> None:
+        pass
+
+
+class AuthenticatedGet(Scenario):
+    """GET /users/@me with a bearer token, resolved from the auth cache after the first request."""
+
+    name = 'auth_get'
+
+    async def call(self, bench: Bench, index: int) -> None:
+        await bench.call('GET', '/users/@me', token=bench.user.bearer)
+
+
+class AuthenticatedGetUncached(Scenario):
+    """GET /users/@me with the auth cache cleared first, so every request looks the bearer token up."""
+
+    name = 'auth_get_uncached'
+
+    async def call(self, bench: Bench, index: int) -> None:
+        bench.database.auth_cache.invalidate(bench.user.bearer)
+        await bench.call('GET', '/users/@me', token=bench.user.bearer)
+
+
+class UnknownToken(Scenario):
+    """GET /users/@me with a token which was never issued, as scanning traffic would send."""
+
+    name = 'unknown_token'
+
+    async def call(self, bench: Bench, index: int) -> None:
+        await bench.call('GET', '/users/@me', token=core.generate_token(index), expect=403)
+
+
+class CreateApplication(Scenario):
+    """POST /applications/create, spread over enough users to stay under the per user application limit."""
+
+    name = 'create_application'
+
+    def __init__(self) -> None:
+        self.users: list[core.UserModel] = []
+
+    async def prepare(self, bench: Bench, *, total: int) -> None:
+        for index in range(math.ceil(total / 20)):
+            self.users.append(await bench.database.create_user(github_id=10_000 + index, username=f'creator{index}'))
+
+    async def call(self, bench: Bench, index: int) -> None:
+        body: bytes = json.dumps({'name': f'app{index}', 'description': 'Created by a benchmark.'}).encode()
+        await bench.call('POST', '/applications/create', token=self.users[index // 20].bearer, body=body, expect=201)
+
+
+class ListLogs(Scenario):
+    """GET /applications/logs, returning a page of 100 from ``rows`` logs of the application."""
+
+    name = 'list_logs'
+
+    def __init__(self, rows: int = 10_000) -> None:
+        self.rows: int = rows
+
+    async def prepare(self, bench: Bench, *, total: int) -> None:
+        now: datetime.datetime = datetime.datetime.now(datetime.timezone.utc)
+
+        for index in range(self.rows):
+            bench.database.add_log_row(
+                ip='127.0.0.1',
+                userid=bench.user.uid,
+                appid=bench.application.tid,
+                accessed=now - datetime.timedelta(seconds=self.rows - index),
+                cf_ray=None,
+                cf_country=None,
+                method='GET',
+                route=f'http://benchmark/api/users/@me/application?page={index}',
+                body=None,
+                response_code=200,
+            )
+
+    async def call(self, bench: Bench, index: int) -> None:
+        await bench.call('GET', '/applications/logs?limit=100', token=bench.application.token)
+
+
+class GitHubLogin(Scenario):
+    """POST /auth/github, against a `GitHubStub` answering after ``latency`` seconds, over real HTTP connections."""
+
+    name = 'github_login'
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.stub: GitHubStub = GitHubStub(latency=latency)
+
+    async def prepare(self, bench: Bench, *, total: int) -> None:
+        await self.stub.start()
+
+        bench.server.oauth = core.GitHubOAuth(
+            'benchmark',
+            'benchmark',
+            'http://benchmark/callback',
+            token_url=f'{self.stub.url}/login/oauth/access_token',
+            api_url=self.stub.url,
+        )
+
+    async def call(self, bench: Bench, index: int) -> None:
+        # A handful of codes, so logins mostly refresh existing users like they do in production...
+        status, data = await request(
+            bench.server, 'POST', f'{bench.prefix}/auth/github', body=json.dumps({'code': f'code{index % 64}'}).encode()
+        )
+
+        if status != 200:
+            raise RuntimeError(f'POST /auth/github responded {status}, expected 200: {data[:200]!r}')
+
+    async def cleanup(self, bench: Bench) -> None:
+        await bench.server.oauth.close()
+        await self.stub.close()
+
+
+class ModlogFanout(Scenario):
+    """POST /members/dpy/modlog, timed until every one of ``sockets`` subscribed websockets has received the event."""
+
+    name = 'modlog_fanout'
+    concurrency = 1
+
+    def __init__(self, sockets: int = 1000) -> None:
+        self.sockets: int = sockets
+        self.clients: list[WebSocketClient] = []
+
+        self._pending: int = 0
+        self._delivered: asyncio.Event = asyncio.Event()
+
+    def _on_frame(self, frame: str) -> None:
+        if self._pending <= 0:
+            return
+
+        self._pending -= 1
+        if self._pending == 0:
+            self._delivered.set()
+
+    async def prepare(self, bench: Bench, *, total: int) -> None:
+        headers: dict[str, str] = {'authorization': bench.application.token, 'subscriptions': 'dpy_modlog'}
+
+        for _ in range(self.sockets):
+            client = WebSocketClient(bench.server, f'{bench.prefix}/websocket', headers=headers, on_frame=self._on_frame)
+            await client.connect()
+
+            self.clients.append(client)
+
+    async def call(self, bench: Bench, index: int) -> None:
+        self._pending = self.sockets
+        self._delivered.clear()
+
+        body: bytes = json.dumps({'action': 'ban', 'index': index, 'reason': 'x' * 256}).encode()
+        await bench.call('POST', '/members/dpy/modlog', token=bench.application.token, body=body)
+
+        await asyncio.wait_for(self._delivered.wait(), timeout=30)
+
+    async def cleanup(self, bench: Bench) -> None:
+        await asyncio.gather(*(c.close() for c in self.clients))
+        self.clients.clear()
+
+
+def percentile(ordered: list[float], p: float) -> float:
+    return ordered[round((len(ordered) - 1) * p / 100)] if ordered else 0.0
+
+
+async def measure(
+    bench: Bench, scenario: Scenario, *, requests: int, concurrency: int, warmup: int, alloc_requests: int
+) -> dict[str, Any]:
+    concurrency = scenario.concurrency or concurrency
+    await scenario.prepare(bench, total=warmup + requests + alloc_requests)
+
+    for index in range(warmup):
+        await scenario.call(bench, index)
+
+    indexes = itertools.count(warmup)
+    end: int = warmup + requests
+    latencies: list[float] = []
+
+    async def worker() -> None:
+        while (index := next(indexes)) < end:
+            start: float = time.perf_counter()
+            await scenario.call(bench, index)
+            latencies.append(time.perf_counter() - start)
+
+    collections: int = sum(s['collections'] for s in gc.get_stats())
+    start: float = time.perf_counter()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    elapsed: float = time.perf_counter() - start
+    collections = sum(s['collections'] for s in gc.get_stats()) - collections
+
+    # Allocations are measured separately, as tracing slows every allocation down...
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+
+    for index in range(end, end + alloc_requests):
+        await scenario.call(bench, index)
+
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    await scenario.cleanup(bench)
+    latencies.sort()
+
+    return {
+        'scenario': scenario.name,
+        'requests': requests,
+        'concurrency': concurrency,
+        'throughput_rps': requests / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': latencies[-1] * 1000 if latencies else 0.0,
+        'gc_collections': collections,
+        'alloc_peak_kib': (peak - baseline) / 1024,
+        'alloc_retained_bytes_per_request': (current - baseline) / alloc_requests if alloc_requests else 0.0,
+    }
+
+
+def make_scenarios(*, sockets: int, log_rows: int, github_latency: float = 0.0) -> dict[str, Scenario]:
+    scenarios: list[Scenario] = [
+        AuthenticatedGet(),
+        AuthenticatedGetUncached(),
+        UnknownToken(),
+        CreateApplication(),
+        ListLogs(rows=log_rows),
+        GitHubLogin(latency=github_latency),
+        ModlogFanout(sockets=sockets),
+    ]
+
+    return {s.name: s for s in scenarios}
+
+
+async def run(args: argparse.Namespace) -> list[dict[str, Any]]:
+    scenarios: dict[str, Scenario] = make_scenarios(
+        sockets=args.sockets, log_rows=args.log_rows, github_latency=args.github_latency / 1000
+    )
+    results: list[dict[str, Any]] = []
+
+    for name in args.scenarios or scenarios:
+        # Every scenario gets a fresh server, so one can not warm caches or fill queues for another...
+        bench = Bench(latency=args.latency / 1000)
+        await bench.setup()
+
+        try:
+            result = await measure(
+                bench,
+                scenarios[name],
+                requests=args.requests,
+                concurrency=args.concurrency,
+                warmup=args.warmup,
+                alloc_requests=args.alloc_requests,
+            )
+        finally:
+            await bench.close()
+
+        results.append(result)
+        print_row(result)
+
+    return results
+
+
+def commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def print_row(row: dict[str, Any], previous: dict[str, Any] | None = None) -> None:
+    line: str = (
+        f'{row["scenario"]:<20} {row["throughput_rps"]:>10.0f} {row["p50_ms"]:>8.2f} {row["p99_ms"]:>8.2f} '
+        f'{row["gc_collections"]:>5} {row["alloc_peak_kib"]:>10.1f}'
+    )
+
+    if previous:
+        throughput: float = (row['throughput_rps'] / previous['throughput_rps'] - 1) * 100
+        p99: float = (row['p99_ms'] / previous['p99_ms'] - 1) * 100 if previous['p99_ms'] else 0.0
+        line += f'   throughput {throughput:+.1f}%  p99 {p99:+.1f}%'
+
+    print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Load test the API in process against an in-memory database.')
+    parser.add_argument('--scenarios', nargs='+', choices=list(make_scenarios(sockets=0, log_rows=0)))
+    parser.add_argument('--requests', type=int, default=2000, help='Requests measured per scenario.')
+    parser.add_argument('--concurrency', type=int, default=16, help='Requests in flight at once.')
+    parser.add_argument('--warmup', type=int, default=50, help='Requests made before measuring.')
+    parser.add_argument('--alloc-requests', type=int, default=200, help='Requests made under tracemalloc.')
+    parser.add_argument('--latency', type=float, default=0.0, help='Milliseconds each database call takes.')
+    parser.add_argument('--sockets', type=int, default=1000, help='Websockets receiving each modlog event.')
+    parser.add_argument('--log-rows', type=int, default=10_000, help='Logs stored for the listed application.')
+    parser.add_argument('--github-latency', type=float, default=0.0, help='Milliseconds the GitHub stub takes.')
+    parser.add_argument('--output', type=pathlib.Path, help='Write the results to this JSON file.')
+    parser.add_argument('--compare', type=pathlib.Path, help='Compare the results with a previous JSON file.')
+    args = parser.parse_args()
+
+    # Only the results are printed, not every websocket connecting...
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f'{"scenario":<20} {"req/s":>10} {"p50 ms":>8} {"p99 ms":>8} {"gc":>5} {"alloc KiB":>10}')
+    results: list[dict[str, Any]] = asyncio.run(run(args))
+
+    if args.compare:
+        previous: dict[str, dict[str, Any]] = {r['scenario']: r for r in json.loads(args.compare.read_text())['results']}
+
+        print(f'\nCompared with {args.compare}:')
+        for row in results:
+            print_row(row, previous.get(row['scenario']))
+
+    if args.output:
+        data: dict[str, Any] = {
+            'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'commit': commit(),
+            'python': platform.python_version(),
+            'options': {k: str(v) if isinstance(v, pathlib.Path) else v for k, v in vars(args).items()},
+            'results': results,
+        }
+
+        args.output.write_text(json.dumps(data, indent=2))
+
+
+if __name__ == '__main__':
+    main()
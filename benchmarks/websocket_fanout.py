@@ -0,0 +1,188 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Any
+
+import api
+import core
+
+__doc__ = """Benchmark the cost of fanning a websocket event out to many connections.
+
+Compares the original sequential `send_json` loop, queueing a dict per connection, and queueing an `EncodedEvent`
+frame per subscriber through `api.Server.broadcast`.
+
+Run from the repository root, with a config.toml present:
+
+    python -m benchmarks.websocket_fanout --sockets 1000 10000
+"""
+
+
+class FakeWebSocket:
+    """Stands in for `starlette.websockets.WebSocket`, doing the same encoding work without any network I/O."""
+
+    def __init__(self) -> None:
+        self.received: int = 0
+
+    async def send_text(self, data: str) -> None:
+        self.received += len(data)
+
+    async def send_json(self, data: Any) -> None:
+        await self.send_text(json.dumps(data, separators=(',', ':'), ensure_ascii=False))
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+def make_payload() -> dict[str, Any]:
+    return {
+        'action': 'ban',
+        'guild_id': 336642139381301249,
+        'moderator': {'id': 80088516616269824, 'name': 'Moderator', 'roles': list(range(10))},
+        'target': {'id': 123456789012345678, 'name': 'Someone', 'discriminator': '0'},
+        'reason': 'x' * 512,
+    }
+
+
+def make_envelope() -> dict[str, Any]:
+    return {
+        'op': core.WebsocketOPCodes.EVENT,
+        'subscription': core.WebsocketSubscriptions.DPY_MOD_LOG,
+        'application': 1,
+        'application_name': 'benchmark',
+    }
+
+
+def make_server(sockets: int) -> api.Server:
+    server = api.Server(database=core.Database())
+
+    for uid in range(sockets):
+        connection = core.WebsocketConnection(FakeWebSocket(), uid=uid)  # type: ignore
+        connection.start()
+
+        server.connections.add(connection)
+        server.connections.subscribe(connection, (core.WebsocketSubscriptions.DPY_MOD_LOG,))
+
+    return server
+
+
+async def sequential(server: api.Server, payload: dict[str, Any]) -> tuple[float, float]:
+    """The original fan-out: re-encode the shared payload and await every socket in turn."""
+    start: float = time.perf_counter()
+
+    message: dict[str, Any] = {**make_envelope(), 'payload': payload}
+    for connection in server.connections.subscribers(core.WebsocketSubscriptions.DPY_MOD_LOG):
+        message['user_id'] = connection.uid
+        await connection.websocket.send_json(data=message)
+
+    elapsed: float = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+async def queued_dicts(server: api.Server, payload: dict[str, Any]) -> tuple[float, float]:
+    """Queue a dict per connection, which each writer encodes separately."""
+    start: float = time.perf_counter()
+    result = core.BroadcastResult()
+
+    for connection in server.connections.subscribers(core.WebsocketSubscriptions.DPY_MOD_LOG):
+        message: dict[str, Any] = {**make_envelope(), 'payload': payload, 'user_id': connection.uid}
+
+        if connection.send(message, result):
+            result.queued += 1
+
+    published: float = time.perf_counter() - start
+    await result.wait(timeout=60)
+
+    return published, time.perf_counter() - start
+
+
+async def encoded_once(server: api.Server, payload: dict[str, Any]) -> tuple[float, float]:
+    """Encode the event once and queue a spliced text frame per subscriber."""
+    raw: str = json.dumps(payload)
+
+    start: float = time.perf_counter()
+    event = core.EncodedEvent(make_envelope(), payload=raw)
+    result = server.broadcast(core.WebsocketSubscriptions.DPY_MOD_LOG, event)
+
+    published: float = time.perf_counter() - start
+    await result.wait(timeout=60)
+
+    return published, time.perf_counter() - start
+
+
+SCENARIOS = {'sequential': sequential, 'queued_dicts': queued_dicts, 'encoded_once': encoded_once}
+
+
+async def run(sockets: int, repeat: int) -> list[dict[str, Any]]:
+    server = make_server(sockets)
+    payload = make_payload()
+    results: list[dict[str, Any]] = []
+
+    for name, scenario in SCENARIOS.items():
+        publish: list[float] = []
+        total: list[float] = []
+
+        for _ in range(repeat):
+            published, delivered = await scenario(server, payload)
+            publish.append(published)
+            total.append(delivered)
+
+        results.append(
+            {
+                'scenario': name,
+                'sockets': sockets,
+                'publish_ms': statistics.median(publish) * 1000,
+                'delivered_ms': statistics.median(total) * 1000,
+                'per_socket_us': statistics.median(total) / sockets * 1_000_000,
+            }
+        )
+
+    for connection in list(server.connections):
+        connection.stop()
+        server.connections.remove(connection)
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark websocket event fan-out.')
+    parser.add_argument('--sockets', type=int, nargs='+', default=[1_000, 10_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{"scenario":<14} {"sockets":>8} {"publish ms":>11} {"delivered ms":>13} {"per socket us":>14}')
+    for sockets in args.sockets:
+        for row in asyncio.run(run(sockets, args.repeat)):
+            print(
+                f'{row["scenario"]:<14} {row["sockets"]:>8} {row["publish_ms"]:>11.2f} '
+                f'{row["delivered_ms"]:>13.2f} {row["per_socket_us"]:>14.2f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -23,11 +23,20 @@ SOFTWARE.
 import logging
 from typing import TextIO
 
+from .bloom import *
+from .cache import *
 from .config import config
 from .database import *
+from .events import *
 from .logger import ColourFormatter
+from .metrics import *
+from .oauth import *
+from .pagination import *
+from .proxies import *
+from .ratelimit import *
 from .tokens import *
 from .utils import *
+from .websockets import *
 
 # Setup root logging formatter...
 handler: logging.StreamHandler[TextIO] = logging.StreamHandler()
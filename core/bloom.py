@@ -0,0 +1,96 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import math
+from typing import Any
+
+__all__ = ('BloomFilter',)
+
+
+class BloomFilter:
+    """A Bloom filter over uniformly distributed digests, E.g. SHA-256 digests.
+
+    `__contains__` never answers ``False`` for a digest which was added, and answers ``True`` for a digest which was
+    not added with a probability of roughly ``error_rate``, while at most ``capacity`` digests have been added.
+
+    Bit positions are taken from the digest itself with double hashing, so keys must be at least 16 bytes of well
+    mixed data. Hash anything else first.
+
+    Parameters
+    ----------
+    capacity: int
+        The amount of digests the filter is sized for.
+    error_rate: float
+        The false positive rate at ``capacity``.
+    """
+
+    __slots__ = ('_bits', 'capacity', 'count', 'error_rate', 'hashes', 'size')
+
+    def __init__(self, capacity: int, *, error_rate: float = 0.001) -> None:
+        if not 0 < error_rate < 1:
+            raise ValueError('error_rate must be between 0 and 1.')
+
+        self.capacity: int = max(capacity, 1)
+        self.error_rate: float = error_rate
+
+        # The optimal amount of bits and hash functions for the capacity and error rate...
+        self.size: int = math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes: int = max(1, round(self.size / self.capacity * math.log(2)))
+
+        self.count: int = 0
+        self._bits: bytearray = bytearray((self.size + 7) // 8)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _positions(self, digest: bytes) -> list[int]:
+        h1: int = int.from_bytes(digest[:8], 'big')
+        h2: int = int.from_bytes(digest[8:16], 'big') | 1
+
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, digest: bytes) -> None:
+        for position in self._positions(digest):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+        self.count += 1
+
+    def __contains__(self, digest: bytes) -> bool:
+        bits: bytearray = self._bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(digest))
+
+    @property
+    def saturated(self) -> bool:
+        """Whether more digests were added than the filter was sized for, raising its false positive rate."""
+        return self.count > self.capacity
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'count': self.count,
+            'capacity': self.capacity,
+            'error_rate': self.error_rate,
+            'bits': self.size,
+            'hashes': self.hashes,
+            'bytes': len(self._bits),
+        }
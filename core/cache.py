@@ -0,0 +1,245 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Generic, TypeVar
+
+from .tokens import token_digest
+
+if TYPE_CHECKING:
+    from .database.models import ApplicationModel, UserModel
+    from .events import EventBus
+
+__all__ = ('AuthCache', 'TTLCache')
+
+
+KT = TypeVar('KT')
+VT = TypeVar('VT')
+
+
+class TTLCache(Generic[KT, VT]):
+    """A bounded in-memory mapping with least recently used eviction and a per entry time to live.
+
+    Parameters
+    ----------
+    max_size: int
+        The maximum amount of entries to hold. The least recently used entry is evicted when this is exceeded.
+    ttl: float
+        The amount of seconds an entry is considered valid for after being set.
+    """
+
+    def __init__(self, *, max_size: int, ttl: float) -> None:
+        self.max_size: int = max_size
+        self.ttl: float = ttl
+
+        self._data: OrderedDict[KT, tuple[float, VT]] = OrderedDict()
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.expirations: int = 0
+        self.invalidations: int = 0
+
+        # Bumped on every invalidation, so lookups which started before one can avoid caching a stale result...
+        self.generation: int = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: KT) -> bool:
+        return key in self._data
+
+    def _removed(self, key: KT, value: VT) -> None:
+        """Called whenever an entry leaves the cache for any reason. Subclasses may override this."""
+
+    def get(self, key: KT) -> VT | None:
+        try:
+            expires, value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+
+        if expires <= time.monotonic():
+            del self._data[key]
+            self._removed(key, value)
+
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+
+        return value
+
+    def set(self, key: KT, value: VT) -> None:
+        try:
+            _, old = self._data.pop(key)
+        except KeyError:
+            pass
+        else:
+            self._removed(key, old)
+
+        self._data[key] = (time.monotonic() + self.ttl, value)
+
+        while len(self._data) > self.max_size:
+            evicted, (_, evicted_value) = self._data.popitem(last=False)
+            self._removed(evicted, evicted_value)
+
+            self.evictions += 1
+
+    def invalidate(self, key: KT) -> bool:
+        self.generation += 1
+
+        try:
+            _, value = self._data.pop(key)
+        except KeyError:
+            return False
+
+        self._removed(key, value)
+        self.invalidations += 1
+
+        return True
+
+    def clear(self) -> None:
+        for key, (_, value) in self._data.items():
+            self._removed(key, value)
+
+        self._data.clear()
+        self.generation += 1
+
+    def stats(self) -> dict[str, Any]:
+        lookups: int = self.hits + self.misses
+
+        return {
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
+
+
+class AuthCache(TTLCache[str, 'tuple[UserModel | ApplicationModel, tuple[str, ...]]']):
+    """A `TTLCache` mapping an Authorization token to its resolved model and scopes.
+
+    Entries are additionally indexed by user ID, so every token belonging to a user can be invalidated at once.
+
+    Every process keeps its own cache. `purge` invalidates tokens on this process, and on every other process over
+    the event bus passed to `attach`. Tokens are only ever published as their digest. A ``max_size`` of ``0`` disables
+    the cache.
+    """
+
+    def __init__(self, *, max_size: int, ttl: float) -> None:
+        super().__init__(max_size=max_size, ttl=ttl)
+
+        self._owners: dict[int, set[str]] = {}
+        # Hex digest -> token, so invalidations published by other processes can be applied...
+        self._digests: dict[str, str] = {}
+
+        self._events: EventBus | None = None
+
+    def _removed(self, key: str, value: tuple[UserModel | ApplicationModel, tuple[str, ...]]) -> None:
+        self._digests.pop(token_digest(key).hex(), None)
+
+        uid: int = value[0].uid
+        tokens: set[str] | None = self._owners.get(uid)
+
+        if tokens is None:
+            return
+
+        tokens.discard(key)
+        if not tokens:
+            del self._owners[uid]
+
+    def add(
+        self, token: str, model: UserModel | ApplicationModel, scopes: list[str], *, generation: int | None = None
+    ) -> None:
+        """Cache a resolved token.
+
+        If ``generation`` is passed and an invalidation has happened since it was read, the entry is not cached.
+        """
+        if not self.max_size or (generation is not None and generation != self.generation):
+            return
+
+        self.set(token, (model, tuple(scopes)))
+        if token not in self._data:
+            return
+
+        self._digests[token_digest(token).hex()] = token
+
+        try:
+            self._owners[model.uid].add(token)
+        except KeyError:
+            self._owners[model.uid] = {token}
+
+    def invalidate_user(self, uid: int) -> int:
+        """Invalidate every cached token, bearer or application, which belongs to the provided user ID."""
+        tokens: set[str] = self._owners.pop(uid, set())
+        self.generation += 1
+
+        for token in tokens:
+            self.invalidate(token)
+
+        return len(tokens)
+
+    def attach(self, events: EventBus) -> None:
+        """Share invalidations made on this process with other processes over ``events``."""
+        self._events = events
+        events.subscribe('auth.invalidate', self._remote_invalidate)
+
+    async def purge(self, *tokens: str, uid: int | None = None) -> None:
+        """Invalidate ``tokens``, and every token of the user ``uid``, on this process and every other process."""
+        for token in tokens:
+            self.invalidate(token)
+
+        if uid is not None:
+            self.invalidate_user(uid)
+
+        if self._events is not None:
+            digests: list[str] = [token_digest(token).hex() for token in tokens]
+            await self._events.publish('auth.invalidate', {'digests': digests, 'uid': uid})
+
+    async def _remote_invalidate(self, data: dict[str, Any]) -> None:
+        # Lookups in flight on this process may have read the stale rows, even if nothing was cached yet...
+        self.generation += 1
+
+        for digest in data['digests']:
+            token: str | None = self._digests.get(digest)
+            if token is not None:
+                self.invalidate(token)
+
+        if data['uid'] is not None:
+            self.invalidate_user(data['uid'])
+
+    def stats(self) -> dict[str, Any]:
+        stats = super().stats()
+        stats['users'] = len(self._owners)
+
+        return stats
@@ -0,0 +1,184 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import asyncio
+import datetime
+import ipaddress
+import logging
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .database import Database
+    from .models import BanModel
+
+__all__ = ('BanIndex',)
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+# IP version -> prefix length -> network address as an int -> ban...
+_Networks = dict[int, dict[int, dict[int, 'BanModel']]]
+
+
+class BanIndex:
+    """An in-memory index of the ``bans`` table, so bans can be checked without touching the database.
+
+    IP and network bans are indexed by prefix length. Checking an address masks it once for each distinct prefix length
+    banned, instead of comparing it to every banned network.
+
+    The index is loaded on `start`, and then reloaded every ``interval`` seconds. Call `refresh` after changing bans to
+    apply them immediately.
+
+    Parameters
+    ----------
+    database: core.Database
+        The database to load bans from.
+    interval: float
+        The amount of seconds between reloads.
+    """
+
+    def __init__(self, database: Database, *, interval: float = 60) -> None:
+        self.database = database
+        self.interval: float = interval
+
+        self._users: dict[int, BanModel] = {}
+        self._networks: _Networks = {4: {}, 6: {}}
+        # Banned IPs which could not be parsed as an address are only matched exactly...
+        self._raw: dict[str, BanModel] = {}
+
+        self._task: asyncio.Task[None] | None = None
+
+        self.bans: int = 0
+        self.rejected: int = 0
+        self.last_refresh: datetime.datetime | None = None
+
+    async def start(self) -> None:
+        await self.refresh()
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name='BanIndex')
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+
+            try:
+                await self.refresh()
+            except Exception as e:
+                LOGGER.error('Failed to refresh bans: %s', e)
+
+    async def refresh(self) -> None:
+        """Reload every ban from the database, replacing the index at once."""
+        bans: list[BanModel] = await self.database.fetch_bans()
+
+        users: dict[int, BanModel] = {}
+        networks: _Networks = {4: {}, 6: {}}
+        raw: dict[str, BanModel] = {}
+
+        for ban in bans:
+            if ban.userid is not None:
+                users[ban.userid] = ban
+
+            if ban.network is not None:
+                self._add_network(networks, ban.network, ban)
+
+            if ban.ip is not None:
+                try:
+                    network = ipaddress.ip_network(ban.ip.strip())
+                except ValueError:
+                    raw[ban.ip] = ban
+                else:
+                    self._add_network(networks, network, ban)
+
+        self._users, self._networks, self._raw = users, networks, raw
+
+        self.bans = len(bans)
+        self.last_refresh = datetime.datetime.now(datetime.timezone.utc)
+
+        LOGGER.debug('Loaded %s bans.', self.bans)
+
+    @staticmethod
+    def _add_network(
+        networks: _Networks, network: ipaddress.IPv4Network | ipaddress.IPv6Network, ban: BanModel
+    ) -> None:
+        prefixes = networks[network.version].setdefault(network.prefixlen, {})
+        prefixes[int(network.network_address)] = ban
+
+    def check(self, *, ip: str | None = None, uid: int | None = None) -> BanModel | None:
+        """Return the ban matching ``ip`` or ``uid``, if either is banned."""
+        ban: BanModel | None = None
+
+        if uid is not None:
+            ban = self._users.get(uid)
+
+        if ban is None and ip:
+            ban = self._check_ip(ip)
+
+        if ban is not None:
+            self.rejected += 1
+
+        return ban
+
+    def _check_ip(self, ip: str) -> BanModel | None:
+        ban: BanModel | None = self._raw.get(ip)
+        if ban is not None:
+            return ban
+
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+
+        bits: int = address.max_prefixlen
+        value: int = int(address)
+
+        for prefixlen, prefixes in self._networks[address.version].items():
+            shift: int = bits - prefixlen
+            ban = prefixes.get(value >> shift << shift)
+
+            if ban is not None:
+                return ban
+
+        return None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'bans': self.bans,
+            'users': len(self._users),
+            'prefix_lengths': {f'ipv{v}': sorted(prefixes) for v, prefixes in self._networks.items()},
+            'rejected': self.rejected,
+            'last_refresh': self.last_refresh.isoformat() if self.last_refresh else None,
+        }
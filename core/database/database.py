@@ -23,10 +23,11 @@ SOFTWARE.
 
 from __future__ import annotations
 
+import contextlib
 import datetime
 import itertools
 import logging
-import pathlib
+import time
 from typing import TYPE_CHECKING, Any, Self
 
 import asyncpg
@@ -34,70 +35,482 @@ import asyncpg
 import core
 from core.config import config
 
+from .bans import BanIndex
+from .loader import BatchLoader
+from .logs import LogWriter
+from .migrator import Migrator
 from .models import *
+from .partitions import LogPartitions
+from .pool import WaitTimings
+from .profiler import ProfiledConnection, QueryProfiler
+from .replicas import REPLICA_ERRORS, Replica, ReplicaSet, current_route, read, write
+from .revocations import TokenRevocations
+from .scope import ConnectionScope
+from .tokenfilter import TokenFilter
 
 if TYPE_CHECKING:
+    import ipaddress
+    from collections.abc import AsyncIterator
+
+    from asyncpg.pool import PoolConnectionProxy
     from starlette.requests import Request
     from starlette.responses import Response
 
 LOGGER: logging.Logger = logging.getLogger(__name__)
 
 
+def _token_owner(token: str | None) -> int | None:
+    """The ID of the user a token was generated for, used to route reads after that user writes."""
+    if not token:
+        return None
+
+    try:
+        return core.id_from_token(token)
+    except ValueError:
+        return None
+
+
 class Database:
     _pool: asyncpg.Pool[asyncpg.Record]
 
-    def __init__(self) -> None:
-        self.schema_file = pathlib.Path("core/database/SCHEMA.sql")
+    def __init__(self, *, workers: int = 1) -> None:
+        self.migrator: Migrator = Migrator()
+
+        # Caches shared between processes are only kept consistent over a shared event bus...
+        shared_events: bool = config.get("EVENTS", {}).get("backend", "memory") == "postgres"
+
+        # max_connections is shared by every worker process, so by default each pool gets an equal part of it, less the
+        # connection each worker's event bus listens on outside the pool...
+        database_config: dict[str, Any] = config["DATABASE"]
+        share: int = database_config.get("max_connections", 10) // workers - (1 if shared_events else 0)
+        self.pool_max_size: int = database_config.get("max_size", max(2, share))
+        self.pool_min_size: int = min(database_config.get("min_size", 10), self.pool_max_size)
+
+        profiler_config: dict[str, Any] = config.get("PROFILER", {})
+        self.profiler: QueryProfiler = QueryProfiler(
+            self,
+            enabled=profiler_config.get("enabled", True),
+            threshold=profiler_config.get("slow_query_threshold", 0.5),
+            explain_rate=profiler_config.get("explain_rate", 0.01),
+            max_queries=profiler_config.get("max_queries", 1000),
+        )
+
+        self.pool_options: dict[str, Any] = {
+            "max_inactive_connection_lifetime": database_config.get("max_inactive_connection_lifetime", 300.0),
+            "statement_cache_size": database_config.get("statement_cache_size", 100),
+            "command_timeout": database_config.get("command_timeout"),
+            "connection_class": ProfiledConnection,
+            "init": self._init_connection,
+        }
+        self.acquire_timeout: float | None = database_config.get("acquire_timeout")
+
+        # Concurrent auth lookups are coalesced, and lookups arriving within loader_window seconds are batched...
+        loader_options: dict[str, Any] = {
+            "window": database_config.get("loader_window", 0.001),
+            "max_batch": database_config.get("loader_max_batch", 100),
+        }
+        self.bearer_loader: BatchLoader[str, UserModel] = BatchLoader("bearer", self._fetch_users_by_bearer, **loader_options)
+        self.application_loader: BatchLoader[str, ApplicationModel] = BatchLoader(
+            "application", self._fetch_applications_by_token, **loader_options
+        )
+
+        # Sent when each connection starts, so they are kept when the pool resets a released connection...
+        self.session_settings: dict[str, str] = {k: str(v) for k, v in database_config.get("session", {}).items()}
+        self.acquire_waits: WaitTimings = WaitTimings()
+
+        self.scopes: int = 0
+        self.scope_reuses: int = 0
+
+        self.acquire_time: core.Histogram = core.metrics.histogram(
+            "papi_database_acquire_wait_seconds", "Time spent waiting for a pool connection."
+        )
+        self.query_time: core.Histogram = core.metrics.histogram(
+            "papi_database_query_seconds",
+            "Time each Database method held a pool connection.",
+            labels=("method", "pool"),
+        )
+        core.metrics.gauge(
+            "papi_database_pool_connections",
+            "Connections in the primary pool.",
+            labels=("state",),
+            callback=self._pool_gauge,
+        )
+
+        self.replicas: ReplicaSet = ReplicaSet(
+            database_config.get("replicas", []),
+            pool_options={
+                "min_size": min(self.pool_min_size, 2),
+                "max_size": self.pool_max_size,
+                "server_settings": self.session_settings,
+                **self.pool_options,
+            },
+            max_lag=database_config.get("replica_max_lag", 10.0),
+            sticky=database_config.get("replica_sticky", 10.0),
+            interval=database_config.get("replica_check_interval", 5.0),
+        )
+
+        # Other workers would keep serving tokens this one replaced or deleted until they expire, so without a shared
+        # event bus to publish invalidations over, several workers can not cache authentication.
+        cache_config: dict[str, Any] = config.get("CACHE", {})
+        auth_max_size: int = cache_config.get("auth_max_size", 10_000)
+        if workers > 1 and not shared_events:
+            LOGGER.info("The authentication cache is disabled, as several workers need the postgres event bus.")
+            auth_max_size = 0
+
+        self.auth_cache: core.AuthCache = core.AuthCache(max_size=auth_max_size, ttl=cache_config.get("auth_ttl", 60.0))
+
+        logs_config: dict[str, Any] = config.get("LOGS", {})
+        self.logs: LogWriter = LogWriter(
+            self,
+            queue_size=logs_config.get("queue_size", 10_000),
+            batch_size=logs_config.get("batch_size", 500),
+            flush_interval=logs_config.get("flush_interval", 1.0),
+            backpressure=logs_config.get("backpressure", "drop"),
+            sample_rate=logs_config.get("sample_rate", 0.1),
+            sample_threshold=logs_config.get("sample_threshold", 0.5),
+        )
+        self.partitions: LogPartitions = LogPartitions(
+            self,
+            premake=logs_config.get("premake_days", 7),
+            retention=logs_config.get("retention_days", 90),
+            interval=logs_config.get("maintenance_interval", 3600),
+        )
+
+        bans_config: dict[str, Any] = config.get("BANS", {})
+        self.bans: BanIndex = BanIndex(self, interval=bans_config.get("refresh_interval", 60))
+
+        tokens_config: dict[str, Any] = config.get("TOKENS", {})
+        self.signer: core.TokenSigner = core.TokenSigner.from_config(tokens_config)
+        self.revocations: TokenRevocations = TokenRevocations(
+            self, interval=tokens_config.get("revocation_refresh_interval", 60)
+        )
+        # Tokens issued by another process only reach this filter over a shared event bus. Without one, the filter would
+        # reject them until its next rebuild, so it is only used with the postgres event bus.
+        if tokens_config.get("filter", True) and not shared_events:
+            LOGGER.info("The token filter is disabled, as it needs the postgres event bus.")
+
+        self.token_filter: TokenFilter = TokenFilter(
+            self,
+            enabled=tokens_config.get("filter", True) and shared_events,
+            error_rate=tokens_config.get("filter_error_rate", 0.001),
+            interval=tokens_config.get("filter_rebuild_interval", 3600),
+        )
 
     async def __aenter__(self) -> Self:
         await self.setup()
         return self
 
     async def __aexit__(self, *args: Any) -> None:
+        await self.logs.close()
+        await self.partitions.close()
+        await self.bans.close()
+        await self.revocations.close()
+        await self.token_filter.close()
+        await self.replicas.close()
         await self._pool.close()
 
+    async def _init_connection(self, connection: ProfiledConnection) -> None:
+        connection.profiler = self.profiler
+
     async def setup(self) -> Self:
         LOGGER.info("Setting up Database.")
 
-        self._pool = await asyncpg.create_pool(dsn=config["DATABASE"]["dsn"])  # type: ignore
+        self._pool = await asyncpg.create_pool(
+            dsn=config["DATABASE"]["dsn"],
+            min_size=self.pool_min_size,
+            max_size=self.pool_max_size,
+            server_settings=self.session_settings,
+            **self.pool_options,
+        )  # type: ignore
         assert self._pool
 
-        async with self._pool.acquire() as connection:
-            with self.schema_file.open() as schema:
-                await connection.execute(schema.read())
+        async with self.acquire() as connection:
+            # Every worker checks, but only when migrations are pending is the lock taken and the schema changed...
+            if await self.migrator.pending(connection):
+                async with self.migrator.lock(connection):
+                    await self.migrator.apply(connection)
+
+                    # Moving legacy logs depends on the migrated schema, so run it in the lock...
+                    await self.partitions.maintain()
+
+        await self.partitions.start()
+        await self.bans.start()
+        await self.revocations.start()
+        await self.token_filter.start()
+        await self.replicas.start()
+        self.logs.start()
 
         LOGGER.info("Completed Database Setup.")
 
         return self
 
+    async def connect(self) -> asyncpg.Connection[asyncpg.Record]:
+        """Open a connection outside the pool, for work which holds one for as long as the process runs.
+
+        The caller is responsible for closing it.
+        """
+        return await asyncpg.connect(
+            dsn=config["DATABASE"]["dsn"],
+            server_settings=self.session_settings,
+            command_timeout=self.pool_options["command_timeout"],
+        )
+
+    @contextlib.asynccontextmanager
+    async def acquire(self) -> AsyncIterator[PoolConnectionProxy[asyncpg.Record]]:
+        """Acquire a connection, recording how long was spent waiting for it and how long it was held.
+
+        Inside a method marked with `read`, the connection comes from a healthy replica when one is available.
+
+        Inside a `scope`, a connection from the primary is kept until the scope ends, and every later call in the scope
+        uses it, reads included.
+        """
+        route = current_route.get()
+        scope: ConnectionScope | None = ConnectionScope.current()
+
+        # Reads only go to a replica while the scope has not needed the primary yet...
+        shared: PoolConnectionProxy[asyncpg.Record] | None = scope.connection if scope else None
+        replica: Replica | None = None
+
+        if shared is None and route and route[0] == "read":
+            replica = self.replicas.choose(route[1])
+
+        pool: asyncpg.Pool[asyncpg.Record] = self._pool
+        start: float = time.perf_counter()
+
+        if replica is not None:
+            assert replica.pool
+
+            try:
+                connection = await replica.pool.acquire(timeout=self.acquire_timeout)
+            except REPLICA_ERRORS as e:
+                replica.fail(e)
+                replica = None
+            else:
+                pool = replica.pool
+
+        if shared is not None:
+            connection = shared
+            self.scope_reuses += 1
+
+        elif replica is None:
+            try:
+                connection = await self._pool.acquire(timeout=self.acquire_timeout)
+            except TimeoutError:
+                self.acquire_waits.timeouts += 1
+                raise
+
+        acquired: float = time.perf_counter()
+
+        if shared is None:
+            self.acquire_waits.record(acquired - start)
+            self.acquire_time.observe(acquired - start)
+
+        # A primary connection acquired inside a scope is kept, and released when the scope ends...
+        kept: bool = scope is not None and replica is None
+        if scope is not None and replica is None:
+            scope.connection = connection
+
+        try:
+            yield connection
+        finally:
+            if not kept:
+                await pool.release(connection)
+
+            # Untagged methods, and background tasks like the log writer, are grouped together as "other"...
+            self.query_time.observe(
+                time.perf_counter() - acquired, route[2] if route else "other", "primary" if replica is None else "replica"
+            )
+
+    @contextlib.asynccontextmanager
+    async def scope(self) -> AsyncIterator[ConnectionScope]:
+        """Share one primary connection between every call the running task makes inside this block.
+
+        The connection is acquired lazily, by the first call which needs the primary, and released when the block ends.
+        Opening a scope inside another scope of the same task uses the outer scope. Other tasks, such as the token
+        lookup batch loaders, acquire their own connection even while the scope holds one, see `ConnectionScope`.
+        """
+        current: ConnectionScope | None = ConnectionScope.current()
+        if current is not None:
+            yield current
+            return
+
+        scope = ConnectionScope()
+        token = scope.enter()
+        self.scopes += 1
+
+        try:
+            yield scope
+        finally:
+            ConnectionScope.exit(token)
+
+            if scope.connection is not None:
+                await self._pool.release(scope.connection)
+
+    @contextlib.asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        """Make every call the running task makes inside this block in one transaction, on the scope's connection.
+
+        A scope is opened for the block if there is none. Token lookups are batched between tasks, and do not see the
+        transaction's writes.
+        """
+        async with self.scope(), self.acquire() as connection, connection.transaction():
+            yield
+
+    def _pool_gauge(self) -> dict[tuple[str, ...], float]:
+        if not hasattr(self, "_pool"):
+            return {}
+
+        size: int = self._pool.get_size()
+        idle: int = self._pool.get_idle_size()
+
+        return {("in_use",): size - idle, ("idle",): idle}
+
+    def pool_stats(self) -> dict[str, Any]:
+        size: int = self._pool.get_size()
+        idle: int = self._pool.get_idle_size()
+
+        return {
+            "min_size": self._pool.get_min_size(),
+            "max_size": self._pool.get_max_size(),
+            "size": size,
+            "idle": idle,
+            "in_use": size - idle,
+            "acquire_wait": self.acquire_waits.stats(),
+            "scopes": self.scopes,
+            "scope_reuses": self.scope_reuses,
+            **({"replicas": self.replicas.stats()} if self.replicas else {}),
+        }
+
+    def issue_token(self, uid: int, *, tid: int | None = None, flags: int = 0, issued: int | None = None) -> str:
+        """Issue a new token, signed when a signing key is configured, and in the legacy format otherwise."""
+        if not self.signer.enabled:
+            return core.generate_token(uid)
+
+        return self.signer.sign(uid=uid, tid=tid, flags=flags, issued=issued)
+
+    @staticmethod
+    def token_flags(record: Any) -> int:
+        """The `core.TokenFlags` of a user, or of an application joined with its user."""
+        flags: int = core.TokenFlags.ADMIN if record["admin"] else 0
+
+        if record.get("verified"):
+            flags |= core.TokenFlags.VERIFIED
+        if record.get("websockets"):
+            flags |= core.TokenFlags.WEBSOCKETS
+        if record.get("member"):
+            flags |= core.TokenFlags.MEMBER
+
+        return flags
+
+    async def _revoke_tokens(self, connection: Any, kind: str, subject: int, not_before: int) -> None:
+        """Store a revocation of signed tokens, in the caller's transaction. Apply it with `TokenRevocations.revoke`."""
+        query: str = """
+        INSERT INTO token_revocations (kind, subject, not_before) VALUES ($1, $2, $3)
+        ON CONFLICT (kind, subject) DO UPDATE SET
+            not_before = GREATEST(token_revocations.not_before, EXCLUDED.not_before), revoked = now()
+        """
+
+        await connection.execute(query, kind, subject, not_before)
+
+    async def fetch_token_revocations(self) -> list[tuple[str, int, int]]:
+        query: str = """SELECT kind, subject, not_before FROM token_revocations"""
+
+        async with self.acquire() as connection:
+            rows = await connection.fetch(query)
+
+        return [(r["kind"], r["subject"], r["not_before"]) for r in rows]
+
+    async def fetch_token_digests(self) -> list[bytes]:
+        """The digest of every bearer token and valid application token, to build the `TokenFilter` from."""
+        query: str = """SELECT bearer_digest AS digest FROM users UNION ALL SELECT token_digest FROM tokens WHERE NOT invalid"""
+
+        async with self.acquire() as connection:
+            rows = await connection.fetch(query)
+
+        return [r["digest"] for r in rows]
+
     async def fetch_user(
         self, *, uid: int | None = None, bearer: str | None = None, github_id: int | None = None
     ) -> UserModel | None:
-        query: str = """SELECT * FROM users WHERE uid = $1 OR bearer = $2 OR github_id = $3"""
+        """Fetch a user by exactly one of ``uid``, ``bearer`` or ``github_id``, each with its own indexed query."""
+        if sum(key is not None for key in (uid, bearer, github_id)) != 1:
+            raise TypeError("fetch_user takes exactly one of uid, bearer or github_id.")
 
-        async with self._pool.acquire() as connection:
-            row = await connection.fetchrow(query, uid, bearer, github_id)
+        if bearer is not None:
+            return await self.bearer_loader.load(bearer, generation=self.auth_cache.generation)
 
-        if not row:
-            return None
+        if uid is not None:
+            return await self._fetch_user_by_uid(uid=uid)
+
+        assert github_id is not None
+        return await self._fetch_user_by_github_id(github_id=github_id)
+
+    @read(lambda kw: kw["uid"])
+    async def _fetch_user_by_uid(self, *, uid: int) -> UserModel | None:
+        query: str = """SELECT * FROM users WHERE uid = $1"""
+
+        async with self.acquire() as connection:
+            row = await connection.fetchrow(query, uid)
 
-        return UserModel(record=row)
+        return UserModel(record=row) if row else None
+
+    @read()
+    async def _fetch_user_by_github_id(self, *, github_id: int) -> UserModel | None:
+        query: str = """SELECT * FROM users WHERE github_id = $1"""
+
+        async with self.acquire() as connection:
+            row = await connection.fetchrow(query, github_id)
+
+        return UserModel(record=row) if row else None
 
     async def fetch_application(self, *, token: str) -> ApplicationModel | None:
+        return await self.application_loader.load(token, generation=self.auth_cache.generation)
+
+    async def _fetch_batch(self, method: str, query: str, tokens: list[str]) -> dict[str, asyncpg.Record]:
+        """Fetch the rows of ``tokens`` by their digests, which ``query`` selects as its ``digest`` column."""
+        digests: dict[bytes, str] = {core.token_digest(token): token for token in tokens}
+
+        # A replica may still hold a token which was deleted or replaced, and the auth cache would keep it for auth_ttl
+        # seconds, so tokens are always looked up on the primary...
+        route = current_route.set(("primary", None, method))
+
+        try:
+            async with self.acquire() as connection:
+                rows = await connection.fetch(query, list(digests))
+        finally:
+            current_route.reset(route)
+
+        return {digests[r["digest"]]: r for r in rows}
+
+    async def _fetch_users_by_bearer(self, bearers: list[str]) -> dict[str, UserModel]:
+        query: str = """SELECT *, bearer_digest AS digest FROM users WHERE bearer_digest = ANY($1::BYTEA[])"""
+
+        rows = await self._fetch_batch("fetch_user", query, bearers)
+        users: dict[str, UserModel] = {}
+
+        for bearer, row in rows.items():
+            users[bearer] = UserModel(record=row)
+            users[bearer].bearer = bearer
+
+        return users
+
+    async def _fetch_applications_by_token(self, tokens: list[str]) -> dict[str, ApplicationModel]:
         query: str = """
-        SELECT * FROM tokens
+        SELECT *, tokens.token_digest AS digest FROM tokens
         LEFT OUTER JOIN users u on u.uid = tokens.user_id
-        WHERE token = $1
+        WHERE tokens.token_digest = ANY($1::BYTEA[])
         """
 
-        async with self._pool.acquire() as connection:
-            row = await connection.fetchrow(query, token)
+        rows = await self._fetch_batch("fetch_application", query, tokens)
+        applications: dict[str, ApplicationModel] = {}
 
-        if not row:
-            return None
+        for token, row in rows.items():
+            applications[token] = ApplicationModel(record=row)
+            applications[token].token = token
 
-        return ApplicationModel(record=row)
+        return applications
 
+    @read(lambda kw: kw["user_id"])
     async def fetch_applications(self, *, user_id: int) -> list[ApplicationModel] | None:
         query: str = """
         SELECT * FROM tokens
@@ -105,7 +518,7 @@ class Database:
         WHERE user_id = $1
         """
 
-        async with self._pool.acquire() as connection:
+        async with self.acquire() as connection:
             rows = await connection.fetch(query, user_id)
 
         if not rows:
@@ -114,99 +527,170 @@ class Database:
         apps = [ApplicationModel(r) for r in rows]
         return apps
 
+    @write()
     async def create_user(self, *, github_id: int, username: str) -> UserModel:
         uid: int = int((datetime.datetime.now(datetime.timezone.utc).timestamp() * 1000) - core.EPOCH)
-        bearer: str = core.generate_token(uid)
+        bearer: str = self.issue_token(uid)
 
-        query: str = """INSERT INTO users(uid, github_id, username, bearer) VALUES ($1, $2, $3, $4) RETURNING *"""
+        query: str = """INSERT INTO users(uid, github_id, username, bearer_digest) VALUES ($1, $2, $3, $4) RETURNING *"""
 
-        async with self._pool.acquire() as connection:
-            row = await connection.fetchrow(query, uid, github_id, username, bearer)
+        async with self.acquire() as connection:
+            row = await connection.fetchrow(query, uid, github_id, username, core.token_digest(bearer))
 
         assert row
-        return UserModel(record=row)
+        await self.token_filter.issue(bearer)
+
+        user = UserModel(record=row)
+        user.bearer = bearer
+
+        return user
 
+    @write()
     async def refresh_or_create_user(self, *, github_id: int, username: str) -> UserModel:
-        uid: int = int((datetime.datetime.now(datetime.timezone.utc).timestamp() * 1000) - core.EPOCH)
-        bearer: str = core.generate_token(uid)
+        issued: int = int((datetime.datetime.now(datetime.timezone.utc).timestamp() * 1000) - core.EPOCH)
 
         query: str = """
-        INSERT INTO users(uid, github_id, username, bearer) VALUES ($1, $2, $3, $4)
-        ON CONFLICT (github_id) DO UPDATE SET username = $3, bearer = $4 RETURNING *
+        INSERT INTO users(uid, github_id, username, bearer_digest) VALUES ($1, $2, $3, $4)
+        ON CONFLICT (github_id) DO UPDATE SET username = $3, bearer_digest = $4 RETURNING *
         """
 
-        async with self._pool.acquire() as connection:
-            row = await connection.fetchrow(query, uid, github_id, username, bearer)
+        async with self.acquire() as connection, connection.transaction():
+            # The bearer embeds the uid and admin flag, so an existing user's are needed before it is issued...
+            existing = await connection.fetchrow("SELECT uid, admin FROM users WHERE github_id = $1 FOR UPDATE", github_id)
+
+            uid: int = existing["uid"] if existing else issued
+            bearer: str = self.issue_token(uid, flags=self.token_flags(existing) if existing else 0, issued=issued)
+
+            row = await connection.fetchrow(query, uid, github_id, username, core.token_digest(bearer))
+
+            if existing and self.signer.keys:
+                await self._revoke_tokens(connection, "user", uid, issued)
 
         assert row
-        return UserModel(record=row)
+        user = UserModel(record=row)
+        user.bearer = bearer
+
+        # The old bearer, and any applications embedding this user, are now stale...
+        await self.auth_cache.purge(uid=user.uid)
+        await self.token_filter.issue(bearer)
 
+        if existing and self.signer.keys:
+            await self.revocations.revoke("user", uid, issued)
+
+        return user
+
+    @write(lambda kw: kw["user_id"])
     async def regenerate_application_token(self, *, user_id: int, old: str) -> ApplicationModel:
-        new: str = core.generate_token(user_id)
+        issued: int = int((datetime.datetime.now(datetime.timezone.utc).timestamp() * 1000) - core.EPOCH)
 
         query: str = """
         WITH updated_tokens AS (
-          UPDATE tokens SET token = $1 WHERE token = $2 RETURNING *
+          UPDATE tokens SET token_digest = $1 WHERE token_digest = $2 RETURNING *
         )
         SELECT * FROM updated_tokens
         JOIN users u ON u.uid = updated_tokens.user_id
         """
 
-        async with self._pool.acquire() as connection:
-            row = await connection.fetchrow(query, new, old)
+        async with self.acquire() as connection, connection.transaction():
+            current = await connection.fetchrow(
+                """
+                SELECT tid, verified, websockets, member, u.admin FROM tokens
+                JOIN users u ON u.uid = tokens.user_id
+                WHERE token_digest = $1 FOR UPDATE OF tokens
+                """,
+                core.token_digest(old),
+            )
+            assert current
+
+            new: str = self.issue_token(user_id, tid=current["tid"], flags=self.token_flags(current), issued=issued)
+            row = await connection.fetchrow(query, core.token_digest(new), core.token_digest(old))
+
+            if self.signer.keys:
+                await self._revoke_tokens(connection, "application", current["tid"], issued)
+
+        await self.auth_cache.purge(old)
+        await self.token_filter.issue(new)
+
+        if self.signer.keys:
+            await self.revocations.revoke("application", current["tid"], issued)
 
         assert row
-        return ApplicationModel(record=row)
+        application = ApplicationModel(record=row)
+        application.token = new
+
+        return application
 
+    @write(lambda kw: _token_owner(kw["token"]))
     async def delete_application(self, *, token: str) -> None:
-        query: str = """UPDATE tokens SET invalid = true WHERE token = $1"""
+        query: str = """UPDATE tokens SET invalid = true WHERE token_digest = $1 RETURNING tid"""
 
-        async with self._pool.acquire() as connection:
-            await connection.execute(query, token)
+        async with self.acquire() as connection, connection.transaction():
+            tid: int | None = await connection.fetchval(query, core.token_digest(token))
 
-    async def create_application(self, *, user_id: int, name: str, description: str) -> ApplicationModel:
-        token: str = core.generate_token(user_id)
+            if tid is not None and self.signer.keys:
+                await self._revoke_tokens(connection, "application", tid, TokenRevocations.FOREVER)
+
+        await self.auth_cache.purge(token)
 
+        if tid is not None and self.signer.keys:
+            await self.revocations.revoke("application", tid, TokenRevocations.FOREVER)
+
+    @write(lambda kw: kw["user_id"])
+    async def create_application(self, *, user_id: int, name: str, description: str) -> ApplicationModel:
         query: str = """
         WITH create_application AS (
-         INSERT INTO tokens(user_id, token_name, token_description, token) VALUES ($1, $2, $3, $4) RETURNING *
+         INSERT INTO tokens(tid, user_id, token_name, token_description, token_digest)
+         VALUES (COALESCE($5, nextval(pg_get_serial_sequence('tokens', 'tid'))), $1, $2, $3, $4) RETURNING *
         )
         SELECT * FROM create_application
         JOIN users u ON u.uid = create_application.user_id
         """
 
-        async with self._pool.acquire() as connection:
-            row = await connection.fetchrow(query, user_id, name, description, token)
+        async with self.acquire() as connection:
+            tid: int | None = None
+            flags: int = 0
+
+            # A signed token embeds the application's ID, so it is taken from the sequence before inserting...
+            if self.signer.enabled:
+                reserved = await connection.fetchrow(
+                    """
+                    SELECT nextval(pg_get_serial_sequence('tokens', 'tid')) AS tid,
+                    (SELECT admin FROM users WHERE uid = $1) AS admin
+                    """,
+                    user_id,
+                )
+                assert reserved
+
+                tid = reserved["tid"]
+                flags = self.token_flags(reserved)
+
+            token: str = self.issue_token(user_id, tid=tid, flags=flags)
+            row = await connection.fetchrow(query, user_id, name, description, core.token_digest(token), tid)
 
         assert row
-        return ApplicationModel(record=row)
+        await self.token_filter.issue(token)
 
-    async def add_log(self, *, request: Request, response: Response) -> None:
-        query: str = """INSERT INTO logs VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)"""
+        application = ApplicationModel(record=row)
+        application.token = token
+
+        return application
 
+    async def add_log(self, *, request: Request, response: Response) -> None:
+        """Queue a log row for this request. The row is written in the background by `LogWriter`."""
         try:
             body: str | None = str(request._body.decode(encoding="UTF-8"))  # pyright: ignore [reportPrivateUsage]
         except AttributeError:
             body = None
 
-        uid: int | None = None
-        tid: int | None = None
-
-        try:
-            model: ApplicationModel | UserModel = request.user.model
-        except AttributeError:
-            pass
-        else:
-            if isinstance(model, ApplicationModel):
-                tid = model.tid
-            uid = model.uid
+        # Unauthenticated requests have neither, and signed tokens carry both without loading a model...
+        uid: int | None = getattr(request.user, "uid", None)
+        tid: int | None = getattr(request.user, "tid", None)
 
         host: str | None = getattr(request.client, "host", None)
         ip: str | None = request.headers.get("X-Forwarded-For", host)
 
-        async with self._pool.acquire() as connection:
-            await connection.execute(
-                query,
+        await self.logs.put(
+            (
                 ip,
                 uid,
                 tid,
@@ -218,31 +702,145 @@ class Database:
                 body,
                 response.status_code,
             )
+        )
 
-    async def fetch_application_logs(self, *, token_id: int) -> list[LogModel]:
-        query: str = """SELECT * FROM logs WHERE appid = $1"""
+    async def _fetch_logs(self, column: str, value: int, options: core.LogQuery) -> list[LogModel]:
+        query, args = options.build(column, value)
 
-        async with self._pool.acquire() as connection:
-            rows = await connection.fetch(query, token_id)
+        async with self.acquire() as connection:
+            rows = await connection.fetch(query, *args)
 
         logs = [LogModel(record=r) for r in rows]
-        return logs
 
-    async def fetch_user_logs(self, *, user_id: int) -> list[LogModel]:
-        query: str = """SELECT * FROM logs WHERE userid = $1"""
-
-        async with self._pool.acquire() as connection:
-            rows = await connection.fetch(query, user_id)
+        # Pages after a cursor are fetched oldest first, but always returned newest first...
+        if options.after:
+            logs.reverse()
 
-        logs = [LogModel(record=r) for r in rows]
         return logs
 
-    async def fetch_all_user_uses(self, *, user_id: int) -> dict[Any, int]:
-        logs = await self.fetch_user_logs(user_id=user_id)
-        logs.sort(key=lambda l: (l.tid is None, l.tid))
+    async def _stream_logs(self, column: str, value: int, options: core.LogQuery) -> AsyncIterator[LogModel]:
+        query, args = options.build(column, value)
+
+        # Server-side cursors must be used inside a transaction...
+        async with self.acquire() as connection, connection.transaction():
+            async for row in connection.cursor(query, *args, prefetch=500):
+                yield LogModel(record=row)
+
+    @read()
+    async def fetch_application_logs(self, *, token_id: int, options: core.LogQuery | None = None) -> list[LogModel]:
+        return await self._fetch_logs("appid", token_id, options or core.LogQuery(limit=None))
+
+    @read(lambda kw: kw["user_id"])
+    async def fetch_user_logs(self, *, user_id: int, options: core.LogQuery | None = None) -> list[LogModel]:
+        return await self._fetch_logs("userid", user_id, options or core.LogQuery(limit=None))
+
+    @read()
+    def stream_application_logs(self, *, token_id: int, options: core.LogQuery) -> AsyncIterator[LogModel]:
+        return self._stream_logs("appid", token_id, options)
+
+    @read(lambda kw: kw["user_id"])
+    def stream_user_logs(self, *, user_id: int, options: core.LogQuery) -> AsyncIterator[LogModel]:
+        return self._stream_logs("userid", user_id, options)
+
+    @read(lambda kw: kw["user_id"])
+    async def fetch_all_user_uses(
+        self,
+        *,
+        user_id: int,
+        since: datetime.datetime | None = None,
+        until: datetime.datetime | None = None,
+    ) -> dict[Any, int]:
+        query: str = """
+        SELECT appid, sum(requests)::BIGINT AS requests FROM usage_rollups
+        WHERE userid = $1 AND ($2::TIMESTAMPTZ IS NULL OR bucket >= $2) AND ($3::TIMESTAMPTZ IS NULL OR bucket < $3)
+        GROUP BY appid
+        """
+
+        async with self.acquire() as connection:
+            rows = await connection.fetch(query, user_id, since, until)
 
-        grouped = [(k, len(list(group))) for k, group in itertools.groupby(logs, lambda l: l.tid)]
-        base = {"total": len(logs)}
-        base.update(grouped)  # type: ignore
+        base: dict[Any, int] = {"total": sum(r["requests"] for r in rows)}
+        base.update({r["appid"]: r["requests"] for r in rows})
 
         return base
+
+    @read(lambda kw: kw["user_id"])
+    async def fetch_user_usage_series(
+        self,
+        *,
+        user_id: int,
+        granularity: str,
+        since: datetime.datetime | None = None,
+        until: datetime.datetime | None = None,
+    ) -> list[dict[str, Any]]:
+        """Return request counts for a user in ``granularity`` sized buckets, oldest first.
+
+        ``granularity`` must be a ``date_trunc`` field of at least an hour, E.g. ``"hour"``, ``"day"`` or ``"month"``.
+        """
+        query: str = """
+        SELECT date_trunc($2, bucket, 'UTC') AS period, appid, status_class, sum(requests)::BIGINT AS requests
+        FROM usage_rollups
+        WHERE userid = $1 AND ($3::TIMESTAMPTZ IS NULL OR bucket >= $3) AND ($4::TIMESTAMPTZ IS NULL OR bucket < $4)
+        GROUP BY 1, 2, 3
+        ORDER BY 1
+        """
+
+        async with self.acquire() as connection:
+            rows = await connection.fetch(query, user_id, granularity, since, until)
+
+        series: list[dict[str, Any]] = []
+        for period, group in itertools.groupby(rows, key=lambda r: r["period"]):
+            entry: dict[str, Any] = {"bucket": period.isoformat(), "total": 0, "applications": {}, "statuses": {}}
+
+            for row in group:
+                requests: int = row["requests"]
+                status: str = f'{row["status_class"]}xx'
+
+                entry["total"] += requests
+                entry["applications"][row["appid"]] = entry["applications"].get(row["appid"], 0) + requests
+                entry["statuses"][status] = entry["statuses"].get(status, 0) + requests
+
+            series.append(entry)
+
+        return series
+
+    async def fetch_bans(self) -> list[BanModel]:
+        query: str = """SELECT * FROM bans"""
+
+        async with self.acquire() as connection:
+            rows = await connection.fetch(query)
+
+        return [BanModel(record=row) for row in rows]
+
+    @write()
+    async def add_ban(
+        self,
+        *,
+        ip: str | None = None,
+        network: ipaddress.IPv4Network | ipaddress.IPv6Network | None = None,
+        userid: int | None = None,
+        reason: str | None = None,
+    ) -> BanModel:
+        query: str = """INSERT INTO bans (ip, network, userid, reason) VALUES ($1, $2, $3, $4) RETURNING *"""
+
+        async with self.acquire() as connection:
+            row = await connection.fetchrow(query, ip, network, userid, reason)
+
+        assert row
+        return BanModel(record=row)
+
+    @write()
+    async def remove_ban(
+        self,
+        *,
+        ip: str | None = None,
+        network: ipaddress.IPv4Network | ipaddress.IPv6Network | None = None,
+        userid: int | None = None,
+    ) -> int:
+        """Remove bans matching any of the given fields. Returns the amount of bans removed."""
+        query: str = """DELETE FROM bans WHERE ip = $1 OR network = $2::CIDR OR userid = $3"""
+
+        async with self.acquire() as connection:
+            status: str = await connection.execute(query, ip, network, userid)
+
+        return int(status.split()[-1])
@@ -0,0 +1,183 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any, Generic, TypeVar
+
+from core.metrics import Counter, Histogram, metrics
+
+__all__ = ('BatchLoader',)
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+_BATCH_SIZE: Histogram = metrics.histogram(
+    'papi_database_batch_size',
+    'Keys looked up by each batched query.',
+    labels=('loader',),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512),
+)
+_LOADS: Counter = metrics.counter(
+    'papi_database_loads_total',
+    'Lookups made through a batch loader, by whether they joined one already in flight.',
+    labels=('loader', 'result'),
+)
+
+
+class BatchLoader(Generic[K, V]):
+    """Coalesces concurrent lookups by key into as few queries as possible.
+
+    A lookup for a key which is already being looked up waits for that lookup, instead of querying again. Lookups for
+    other keys arriving within ``window`` seconds of each other are fetched together, with a single call to ``fetch``,
+    once the window closes or ``max_batch`` keys are waiting.
+
+    A lookup only waits for one in flight which was started with the same ``generation``. Callers pass a counter which
+    changes whenever the loaded values may have, like `core.AuthCache.generation`, so a lookup starting after a
+    change never returns a value fetched before it.
+
+    Parameters
+    ----------
+    name: str
+        The name of this loader, used as the ``loader`` metrics label.
+    fetch: Callable[[list[K]], Awaitable[dict[K, V]]]
+        Fetches a batch of keys, returning the value of each key found. Keys which are missing load ``None``.
+    window: float
+        The amount of seconds to wait for more keys after the first key of a batch. ``0`` batches the keys looked up
+        in the same iteration of the event loop.
+    max_batch: int
+        The maximum amount of keys fetched at once.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fetch: Callable[[list[K]], Awaitable[dict[K, V]]],
+        *,
+        window: float = 0.001,
+        max_batch: int = 100,
+    ) -> None:
+        self.name: str = name
+        self.fetch = fetch
+
+        self.window: float = window
+        self.max_batch: int = max(1, max_batch)
+
+        self._inflight: dict[tuple[K, int], asyncio.Future[V | None]] = {}
+        self._batch: list[tuple[K, int]] = []
+        self._handle: asyncio.Handle | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+
+        self.loads: int = 0
+        self.coalesced: int = 0
+        self.batches: int = 0
+        self.failed: int = 0
+        self.largest_batch: int = 0
+
+    async def load(self, key: K, *, generation: int = 0) -> V | None:
+        self.loads += 1
+
+        entry: tuple[K, int] = (key, generation)
+        future: asyncio.Future[V | None] | None = self._inflight.get(entry)
+        if future is not None:
+            self.coalesced += 1
+            _LOADS.inc(self.name, 'coalesced')
+
+            # Shielded, so one caller being cancelled does not cancel the lookup for every other caller...
+            return await asyncio.shield(future)
+
+        loop = asyncio.get_running_loop()
+
+        future = self._inflight[entry] = loop.create_future()
+        self._batch.append(entry)
+        _LOADS.inc(self.name, 'batched')
+
+        if len(self._batch) >= self.max_batch:
+            self._dispatch()
+        elif self._handle is None:
+            self._handle = loop.call_later(self.window, self._dispatch) if self.window > 0 else loop.call_soon(self._dispatch)
+
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        entries, self._batch = self._batch, []
+        if not entries:
+            return
+
+        task = asyncio.create_task(self._run(entries), name=f'BatchLoader:{self.name}')
+
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, entries: list[tuple[K, int]]) -> None:
+        # The same key may be waiting under several generations, it is only fetched once...
+        keys: list[K] = list(dict.fromkeys(key for key, _ in entries))
+
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(keys))
+        _BATCH_SIZE.observe(len(keys), self.name)
+
+        try:
+            results: dict[K, V] = await self.fetch(keys)
+        except BaseException as e:
+            self.failed += 1
+
+            for entry in entries:
+                future = self._inflight.pop(entry)
+
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                    continue
+
+                future.set_exception(e)
+                # Every caller may have been cancelled, which is not a reason to log the error again...
+                future.exception()
+
+            if not isinstance(e, Exception):
+                raise
+
+            return
+
+        for key, generation in entries:
+            self._inflight.pop((key, generation)).set_result(results.get(key))
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'loads': self.loads,
+            'coalesced': self.coalesced,
+            'batches': self.batches,
+            'failed': self.failed,
+            'average_batch': (self.loads - self.coalesced) / self.batches if self.batches else 0.0,
+            'largest_batch': self.largest_batch,
+            'window': self.window,
+            'max_batch': self.max_batch,
+        }
@@ -0,0 +1,293 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from typing import TYPE_CHECKING, Any, Literal, TypeAlias
+
+if TYPE_CHECKING:
+    import datetime
+
+    from .database import Database
+
+__all__ = ('LogWriter',)
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+LogRecord: TypeAlias = tuple[Any, ...]
+Backpressure: TypeAlias = Literal['drop', 'block', 'sample']
+
+
+class LogWriter:
+    """Background writer which batches request logs and flushes them to the ``logs`` table with ``COPY``.
+
+    Records are placed on a bounded in-memory queue and written when either ``batch_size`` records have been
+    collected or ``flush_interval`` seconds have passed since the first record in the batch.
+
+    Every record passed to `put` is counted for the ``usage_rollups`` table, including records which are then dropped
+    or sampled out, so usage totals stay exact when logs are not. The counts are written with the next batch, in the
+    same transaction, and are kept for the batch after that if it fails.
+
+    Parameters
+    ----------
+    database: core.Database
+        The database whose pool is used to flush batches.
+    queue_size: int
+        The maximum amount of records waiting to be written.
+    batch_size: int
+        The maximum amount of records written in a single ``COPY``.
+    flush_interval: float
+        The maximum amount of seconds a record waits in a partial batch before being written.
+    backpressure: Literal['drop', 'block', 'sample']
+        What to do with new records when the queue is under pressure.
+        ``drop`` discards records while the queue is full.
+        ``block`` waits for space in the queue, holding the request task.
+        ``sample`` keeps only ``sample_rate`` of records once the queue is over ``sample_threshold`` full,
+        and drops records while the queue is full.
+    sample_rate: float
+        The fraction of records kept while sampling.
+    sample_threshold: float
+        The fraction of ``queue_size`` at which sampling begins.
+    """
+
+    COLUMNS: tuple[str, ...] = (
+        'ip',
+        'userid',
+        'appid',
+        'accessed',
+        'cf_ray',
+        'cf_country',
+        'method',
+        'route',
+        'body',
+        'response_code',
+    )
+
+    ROLLUP_QUERY: str = """
+    INSERT INTO usage_rollups (userid, appid, bucket, status_class, requests)
+    SELECT * FROM unnest($1::BIGINT[], $2::BIGINT[], $3::TIMESTAMPTZ[], $4::SMALLINT[], $5::BIGINT[])
+    ON CONFLICT (userid, (COALESCE(appid, 0)), bucket, status_class)
+    DO UPDATE SET requests = usage_rollups.requests + EXCLUDED.requests
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        *,
+        queue_size: int = 10_000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        backpressure: Backpressure = 'drop',
+        sample_rate: float = 0.1,
+        sample_threshold: float = 0.5,
+    ) -> None:
+        if backpressure not in ('drop', 'block', 'sample'):
+            raise ValueError(f'Unknown log backpressure mode: "{backpressure}".')
+
+        self.database = database
+
+        self.batch_size: int = batch_size
+        self.flush_interval: float = flush_interval
+        self.backpressure: Backpressure = backpressure
+        self.sample_rate: float = sample_rate
+        self.sample_threshold: int = int(queue_size * sample_threshold)
+
+        self._queue: asyncio.Queue[LogRecord | None] = asyncio.Queue(maxsize=queue_size)
+        self._task: asyncio.Task[None] | None = None
+        self._closed: bool = False
+
+        # (user, application, hour, status class) -> requests not yet written to usage_rollups...
+        self._counts: dict[tuple[int, int | None, datetime.datetime, int], int] = {}
+
+        self.flushes: int = 0
+        self.written: int = 0
+        self.dropped: int = 0
+        self.sampled_out: int = 0
+        self.failed: int = 0
+        self.largest_batch: int = 0
+        self.flush_time: float = 0.0
+
+        # Power of two upper bounds -> amount of flushes with a batch size in that bucket...
+        self.batch_sizes: dict[int, int] = {}
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name='LogWriter')
+
+    async def close(self) -> None:
+        """Stop accepting new records and wait for every queued record to be written.
+
+        This is safe to call more than once.
+        """
+        if self._closed:
+            return
+
+        self._closed = True
+        if self._task is None:
+            return
+
+        await self._queue.put(None)
+        await self._task
+
+        # Counts of records which were never queued, or of a batch which failed, are still written...
+        if self._counts:
+            await self._flush([])
+
+        LOGGER.info('Log writer drained: flushes=%s written=%s dropped=%s', self.flushes, self.written, self.dropped)
+
+    async def put(self, record: LogRecord) -> bool:
+        """Queue a log record to be written. Returns whether the record was accepted."""
+        if self._closed:
+            self.dropped += 1
+            return False
+
+        self._count(record)
+
+        if self.backpressure == 'block':
+            await self._queue.put(record)
+            return True
+
+        if (
+            self.backpressure == 'sample'
+            and self._queue.qsize() >= self.sample_threshold
+            and random.random() >= self.sample_rate
+        ):
+            self.sampled_out += 1
+            return False
+
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+        return True
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        running: bool = True
+
+        while running:
+            record = await self._queue.get()
+            if record is None:
+                break
+
+            batch: list[LogRecord] = [record]
+            deadline: float = loop.time() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                try:
+                    record = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining: float = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+
+                    try:
+                        record = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                    except TimeoutError:
+                        break
+
+                if record is None:
+                    running = False
+                    break
+
+                batch.append(record)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[LogRecord]) -> None:
+        start: float = time.perf_counter()
+
+        counts, self._counts = self._counts, {}
+        rollups: list[list[Any]] = self._rollup(counts)
+
+        try:
+            async with self.database.acquire() as connection, connection.transaction():
+                if batch:
+                    await connection.copy_records_to_table('logs', records=batch, columns=self.COLUMNS)
+
+                if rollups[0]:
+                    await connection.execute(self.ROLLUP_QUERY, *rollups)
+        except Exception as e:
+            for key, requests in counts.items():
+                self._counts[key] = self._counts.get(key, 0) + requests
+
+            self.failed += len(batch)
+            LOGGER.error('Failed to write a batch of %s request logs: %s', len(batch), e)
+            return
+
+        if not batch:
+            return
+
+        size: int = len(batch)
+        bucket: int = 1 << (size - 1).bit_length()
+
+        self.flushes += 1
+        self.written += size
+        self.largest_batch = max(self.largest_batch, size)
+        self.flush_time += time.perf_counter() - start
+        self.batch_sizes[bucket] = self.batch_sizes.get(bucket, 0) + 1
+
+    def _count(self, record: LogRecord) -> None:
+        """Count a record by (user, application, hour, status class) for the next rollup."""
+        uid: int | None = record[1]
+        if uid is None:
+            return
+
+        accessed: datetime.datetime = record[3]
+        key = (uid, record[2], accessed.replace(minute=0, second=0, microsecond=0), record[9] // 100)
+        self._counts[key] = self._counts.get(key, 0) + 1
+
+    @staticmethod
+    def _rollup(counts: dict[tuple[int, int | None, datetime.datetime, int], int]) -> list[list[Any]]:
+        """Arrange counts as column arrays for ``ROLLUP_QUERY``."""
+        columns: list[list[Any]] = [[], [], [], [], []]
+
+        # Rows are upserted in a consistent order, so concurrent writers can not deadlock on each other...
+        for key in sorted(counts, key=lambda k: (k[0], k[1] or 0, k[2], k[3])):
+            for column, value in zip(columns, (*key, counts[key])):
+                column.append(value)
+
+        return columns
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'backpressure': self.backpressure,
+            'queued': self._queue.qsize(),
+            'queue_size': self._queue.maxsize,
+            'flushes': self.flushes,
+            'written': self.written,
+            'dropped': self.dropped,
+            'sampled_out': self.sampled_out,
+            'pending_rollups': len(self._counts),
+            'failed': self.failed,
+            'average_batch': self.written / self.flushes if self.flushes else 0.0,
+            'largest_batch': self.largest_batch,
+            'average_flush_seconds': self.flush_time / self.flushes if self.flushes else 0.0,
+            'batch_sizes': {f'<={k}': v for k, v in sorted(self.batch_sizes.items())},
+        }
@@ -0,0 +1,90 @@
+CREATE EXTENSION IF NOT EXISTS pgcrypto;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+
+CREATE TABLE IF NOT EXISTS users (
+    uid BIGINT PRIMARY KEY,
+    github_id BIGINT UNIQUE NOT NULL,
+    username TEXT NOT NULL,
+    admin BOOLEAN NOT NULL DEFAULT false,
+    bearer TEXT NOT NULL,
+    created TIMESTAMP DEFAULT (now() at time zone 'utc')
+);
+
+
+CREATE TABLE IF NOT EXISTS tokens (
+    tid SERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL REFERENCES users(uid),
+    token_name VARCHAR(32) NOT NULL CHECK (LENGTH(token_name) > 2),
+    token_description VARCHAR(512),
+    token TEXT NOT NULL,
+    verified BOOLEAN NOT NULL DEFAULT false,
+    websockets BOOLEAN NOT NULL DEFAULT false,
+    member BOOLEAN NOT NULL DEFAULT false,
+    invalid BOOLEAN NOT NULL DEFAULT false,
+    UNIQUE (user_id, token_name)
+);
+
+
+CREATE TABLE IF NOT EXISTS bans (
+    ip TEXT UNIQUE,
+    userid BIGINT UNIQUE,
+    reason TEXT
+);
+
+-- Bans are enforced by core.database.bans. network bans every address in a CIDR range...
+ALTER TABLE bans ADD COLUMN IF NOT EXISTS network CIDR UNIQUE;
+ALTER TABLE bans ADD COLUMN IF NOT EXISTS created TIMESTAMP WITH TIME ZONE DEFAULT now();
+
+-- logs used to be a single unpartitioned table...
+-- Rename it out of the way, core.database.partitions moves its rows into the partitioned table below.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE oid = to_regclass('logs') AND relkind = 'r') THEN
+        ALTER TABLE logs RENAME TO logs_legacy;
+    END IF;
+END
+$$;
+
+-- Partitions are created daily, ahead of time, by core.database.partitions...
+CREATE TABLE IF NOT EXISTS logs (
+    ip TEXT,
+    userid BIGINT REFERENCES users(uid),
+    appid BIGINT REFERENCES tokens(tid),
+    accessed TIMESTAMP WITH TIME ZONE NOT NULL,
+    cf_ray TEXT,
+    cf_country TEXT,
+    method TEXT NOT NULL,
+    route TEXT NOT NULL,
+    body TEXT,
+    response_code INTEGER NOT NULL,
+    id BIGSERIAL NOT NULL
+) PARTITION BY RANGE (accessed);
+
+-- Logs are paginated by (accessed, id)...
+ALTER TABLE logs ADD COLUMN IF NOT EXISTS id BIGSERIAL NOT NULL;
+
+DROP INDEX IF EXISTS logs_appid_accessed_idx;
+DROP INDEX IF EXISTS logs_userid_accessed_idx;
+CREATE INDEX IF NOT EXISTS logs_appid_accessed_id_idx ON logs (appid, accessed, id);
+CREATE INDEX IF NOT EXISTS logs_userid_accessed_id_idx ON logs (userid, accessed, id);
+CREATE INDEX IF NOT EXISTS logs_accessed_brin_idx ON logs USING BRIN (accessed);
+
+-- Request counts per user, application, hour and status class (2 = 2xx, 4 = 4xx...)...
+-- Maintained by core.database.logs as logs are written. appid is NULL for requests made with a bearer token.
+CREATE TABLE IF NOT EXISTS usage_rollups (
+    userid BIGINT NOT NULL REFERENCES users(uid),
+    appid BIGINT REFERENCES tokens(tid),
+    bucket TIMESTAMP WITH TIME ZONE NOT NULL,
+    status_class SMALLINT NOT NULL,
+    requests BIGINT NOT NULL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS usage_rollups_key_idx ON usage_rollups (userid, COALESCE(appid, 0), bucket, status_class);
+
+-- Event bus payloads too large for a NOTIFY, see core.events.PostgresEventBus...
+CREATE TABLE IF NOT EXISTS event_payloads (
+    id BIGSERIAL PRIMARY KEY,
+    created TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    data TEXT NOT NULL
+);
@@ -0,0 +1,10 @@
+-- Signed tokens are checked without the database, so revoking one is recorded here and kept in memory...
+-- Tokens of a subject issued before not_before (milliseconds since core.EPOCH) are revoked.
+-- kind is "user" for bearer tokens, and subject the uid. kind is "application" for application tokens, and subject the tid.
+CREATE TABLE IF NOT EXISTS token_revocations (
+    kind TEXT NOT NULL,
+    subject BIGINT NOT NULL,
+    not_before BIGINT NOT NULL,
+    revoked TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    PRIMARY KEY (kind, subject)
+);
@@ -0,0 +1,15 @@
+-- Tokens are stored as their SHA-256 digest (core.token_digest), in uniquely indexed columns, and never kept raw.
+-- Looking a token up is a single index probe on a fixed width key. Existing tokens are digested in place.
+ALTER TABLE users ADD COLUMN IF NOT EXISTS bearer_digest BYTEA;
+UPDATE users SET bearer_digest = sha256(convert_to(bearer, 'UTF8')) WHERE bearer_digest IS NULL;
+ALTER TABLE users ALTER COLUMN bearer_digest SET NOT NULL;
+ALTER TABLE users ADD CONSTRAINT users_bearer_digest_length CHECK (octet_length(bearer_digest) = 32);
+CREATE UNIQUE INDEX IF NOT EXISTS users_bearer_digest_idx ON users (bearer_digest);
+ALTER TABLE users DROP COLUMN bearer;
+
+ALTER TABLE tokens ADD COLUMN IF NOT EXISTS token_digest BYTEA;
+UPDATE tokens SET token_digest = sha256(convert_to(token, 'UTF8')) WHERE token_digest IS NULL;
+ALTER TABLE tokens ALTER COLUMN token_digest SET NOT NULL;
+ALTER TABLE tokens ADD CONSTRAINT tokens_token_digest_length CHECK (octet_length(token_digest) = 32);
+CREATE UNIQUE INDEX IF NOT EXISTS tokens_token_digest_idx ON tokens (token_digest);
+ALTER TABLE tokens DROP COLUMN token;
@@ -0,0 +1,20 @@
+-- usage_rollups is only maintained for logs written after it was created, so count the logs which came before...
+-- Logs still waiting in logs_legacy, which core.database.partitions moves after migrating, are counted too.
+-- Rollups which already exist were counted as their logs were written, so they are left alone.
+CREATE TEMPORARY TABLE backfill_logs ON COMMIT DROP AS
+SELECT userid, appid, accessed, response_code FROM logs WHERE userid IS NOT NULL;
+
+DO $$
+BEGIN
+    IF to_regclass('logs_legacy') IS NOT NULL THEN
+        INSERT INTO backfill_logs
+        SELECT userid, appid, accessed, response_code FROM logs_legacy
+        WHERE userid IS NOT NULL AND accessed IS NOT NULL;
+    END IF;
+END
+$$;
+
+INSERT INTO usage_rollups (userid, appid, bucket, status_class, requests)
+SELECT userid, appid, date_trunc('hour', accessed, 'UTC'), response_code / 100, count(*) FROM backfill_logs
+GROUP BY 1, 2, 3, 4
+ON CONFLICT (userid, COALESCE(appid, 0), bucket, status_class) DO NOTHING;
@@ -0,0 +1,202 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import itertools
+import logging
+import pathlib
+import re
+import time
+from typing import TYPE_CHECKING
+
+import asyncpg
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    from asyncpg.pool import PoolConnectionProxy
+
+    Connection = asyncpg.Connection[asyncpg.Record] | PoolConnectionProxy[asyncpg.Record]
+
+__all__ = ('Migration', 'MigrationError', 'Migrator')
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+# Arbitrary key used with pg_advisory_lock, so only one process migrates the database at a time...
+_LOCK_KEY: int = 0x50415049_53455455
+
+_FILENAME: re.Pattern[str] = re.compile(r'^(?P<version>\d{4})_(?P<name>\w+)\.sql$')
+
+
+class MigrationError(Exception):
+    """Raised when the migrations on disk do not agree with the migrations applied to the database."""
+
+
+class Migration:
+    """A single numbered SQL migration file, named like ``0001_initial.sql``."""
+
+    __slots__ = ('checksum', 'name', 'path', 'sql', 'version')
+
+    def __init__(self, path: pathlib.Path) -> None:
+        match = _FILENAME.match(path.name)
+        if not match:
+            raise MigrationError(f'Migration file "{path.name}" must be named like "0001_description.sql".')
+
+        self.path: pathlib.Path = path
+        self.version: int = int(match['version'])
+        self.name: str = match['name']
+
+        # Line endings are normalised, so a checkout on another platform does not change the checksum...
+        self.sql: str = path.read_text(encoding='utf-8').replace('\r\n', '\n')
+        self.checksum: str = hashlib.sha256(self.sql.encode()).hexdigest()
+
+    def __repr__(self) -> str:
+        return f'Migration(version={self.version}, name={self.name})'
+
+
+class Migrator:
+    """Applies the numbered SQL files in ``directory`` to the database, in order, each exactly once.
+
+    Applied migrations are recorded in the ``schema_migrations`` table along with a checksum of the file. A migration
+    which was changed after being applied is an error, add a new migration instead.
+
+    Every migration runs in its own transaction, and migrating holds an advisory lock so concurrent processes apply
+    them one at a time. Use `pending` first to avoid taking the lock when the schema is already current.
+
+    Parameters
+    ----------
+    directory: pathlib.Path
+        The directory containing the migration files. Defaults to ``core/database/migrations``.
+    """
+
+    TABLE: str = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        checksum TEXT NOT NULL,
+        applied TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+        duration REAL NOT NULL
+    )
+    """
+
+    def __init__(self, directory: pathlib.Path | None = None) -> None:
+        self.directory: pathlib.Path = directory or pathlib.Path(__file__).parent / 'migrations'
+        self.migrations: list[Migration] = self.load()
+
+    def load(self) -> list[Migration]:
+        migrations: list[Migration] = sorted(
+            (Migration(path) for path in self.directory.glob('*.sql')), key=lambda m: m.version
+        )
+
+        for previous, migration in itertools.pairwise(migrations):
+            if previous.version == migration.version:
+                raise MigrationError(f'Migrations "{previous.path.name}" and "{migration.path.name}" share a version.')
+
+        return migrations
+
+    @property
+    def latest(self) -> int:
+        return self.migrations[-1].version if self.migrations else 0
+
+    async def applied(self, connection: Connection) -> dict[int, str]:
+        """Return the checksum of every applied migration by version."""
+        try:
+            rows = await connection.fetch('SELECT version, checksum FROM schema_migrations')
+        except asyncpg.UndefinedTableError:
+            return {}
+
+        return {r['version']: r['checksum'] for r in rows}
+
+    async def pending(self, connection: Connection) -> list[Migration]:
+        """Return the migrations which have not been applied yet.
+
+        Raises `MigrationError` if an applied migration has since been changed.
+        """
+        applied: dict[int, str] = await self.applied(connection)
+
+        for migration in self.migrations:
+            checksum: str | None = applied.get(migration.version)
+
+            if checksum is not None and checksum != migration.checksum:
+                raise MigrationError(
+                    f'Migration "{migration.path.name}" was changed after it was applied. '
+                    'Revert the change and add a new migration instead.'
+                )
+
+        unknown: list[int] = sorted(v for v in applied if v > self.latest)
+        if unknown:
+            # Most likely a newer release has already migrated the database during a rolling deploy...
+            LOGGER.warning('Database has migrations applied which are newer than this release: %s', unknown)
+
+        return [m for m in self.migrations if m.version not in applied]
+
+    @contextlib.asynccontextmanager
+    async def lock(self, connection: Connection) -> AsyncIterator[None]:
+        """Hold the migration advisory lock on ``connection``, waiting for any other process to release it first."""
+        await connection.execute('SELECT pg_advisory_lock($1)', _LOCK_KEY)
+
+        try:
+            yield
+        finally:
+            await connection.execute('SELECT pg_advisory_unlock($1)', _LOCK_KEY)
+
+    async def apply(self, connection: Connection) -> list[Migration]:
+        """Apply every pending migration. Returns the migrations which were applied.
+
+        The caller must hold `lock`. Pending migrations are checked again, so migrations applied by another process
+        while waiting for the lock are skipped.
+        """
+        await connection.execute(self.TABLE)
+
+        pending: list[Migration] = await self.pending(connection)
+        for migration in pending:
+            start: float = time.perf_counter()
+
+            try:
+                async with connection.transaction():
+                    await connection.execute(migration.sql)
+                    await connection.execute(
+                        'INSERT INTO schema_migrations (version, name, checksum, duration) VALUES ($1, $2, $3, $4)',
+                        migration.version,
+                        migration.name,
+                        migration.checksum,
+                        time.perf_counter() - start,
+                    )
+            except asyncpg.PostgresError as e:
+                raise MigrationError(f'Migration "{migration.path.name}" failed: {e}') from e
+
+            LOGGER.info('Applied migration "%s" in %.2f seconds.', migration.path.name, time.perf_counter() - start)
+
+        return pending
+
+    async def migrate(self, connection: Connection) -> list[Migration]:
+        """Apply any pending migrations, without taking the lock if the database is already current."""
+        if not await self.pending(connection):
+            LOGGER.debug('Database schema is current at migration %s.', self.latest)
+            return []
+
+        async with self.lock(connection):
+            return await self.apply(connection)
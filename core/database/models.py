@@ -20,12 +20,17 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
-import datetime
-from typing import Any
+from __future__ import annotations
 
-import asyncpg
+from typing import TYPE_CHECKING, Any
 
-__all__ = ('UserModel', 'ApplicationModel', 'LogModel')
+if TYPE_CHECKING:
+    import datetime
+    import ipaddress
+
+    import asyncpg
+
+__all__ = ('ApplicationModel', 'BanModel', 'LogModel', 'UserModel')
 
 
 class UserModel:
@@ -34,7 +39,8 @@ class UserModel:
         self.github_id: int = record['github_id']
         self.username: str = record['username']
         self.admin: bool = record['admin']
-        self.bearer: str = record['bearer']
+        # Only a digest of the token is stored, so it is known when it was just issued or presented, and None otherwise...
+        self.bearer: str | None = record.get('bearer')
         self.created: datetime.datetime = record['created']
 
     def as_dict(self) -> dict[str, Any]:
@@ -55,7 +61,8 @@ class ApplicationModel(UserModel):
         self.tid: int = record['tid']
         self.name: str = record['token_name']
         self.description: str = record['token_description']
-        self.token: str = record['token']
+        # Only known when just issued or presented, like bearer...
+        self.token: str | None = record.get('token')
         self.verified: bool = record['verified']
         self.websockets: bool = record['websockets']
         self.member: bool = record['member']
@@ -82,6 +89,7 @@ class ApplicationModel(UserModel):
 class LogModel:
     def __init__(self, record: asyncpg.Record) -> None:
 
+        self.id: int = record['id']
         self.ip: str = record['ip']
         self.uid: int | None = record['userid']
         self.tid: int | None = record['appid']
@@ -95,6 +103,7 @@ class LogModel:
 
     def as_dict(self) -> dict[str, Any]:
         return {
+            'id': self.id,
             'ip': self.ip,
             'uid': self.uid,
             'tid': self.tid,
@@ -106,3 +115,21 @@ class LogModel:
             'body': self.body,
             'response_code': self.response_code,
         }
+
+
+class BanModel:
+    def __init__(self, record: asyncpg.Record) -> None:
+        self.ip: str | None = record['ip']
+        self.userid: int | None = record['userid']
+        self.network: ipaddress.IPv4Network | ipaddress.IPv6Network | None = record['network']
+        self.reason: str | None = record['reason']
+        self.created: datetime.datetime | None = record['created']
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            'ip': self.ip,
+            'userid': self.userid,
+            'network': str(self.network) if self.network else None,
+            'reason': self.reason,
+            'created': self.created.isoformat() if self.created else None,
+        }
@@ -0,0 +1,243 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import asyncio
+import datetime
+import logging
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    import asyncpg
+
+    from .database import Database
+
+__all__ = ('LogPartitions',)
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+# Arbitrary key used with pg_try_advisory_xact_lock, so only one process maintains partitions at a time...
+_LOCK_KEY: int = 0x50415049_4C4F4753
+
+
+class LogPartitions:
+    """Maintains the daily range partitions of the ``logs`` table.
+
+    Partitions are created ``premake`` days ahead of time, and whole partitions older than ``retention`` days are
+    dropped. Maintenance runs once on `start` and then every ``interval`` seconds.
+
+    Parameters
+    ----------
+    database: core.Database
+        The database whose pool is used for maintenance.
+    premake: int
+        The amount of days, after today, to create partitions for.
+    retention: int
+        The amount of days of logs to keep. ``0`` keeps logs forever.
+    interval: float
+        The amount of seconds between maintenance runs.
+    """
+
+    PREFIX: str = 'logs_p'
+
+    def __init__(self, database: Database, *, premake: int = 7, retention: int = 90, interval: float = 3600) -> None:
+        self.database = database
+
+        self.premake: int = premake
+        self.retention: int = retention
+        self.interval: float = interval
+
+        self._task: asyncio.Task[None] | None = None
+
+        self.created: int = 0
+        self.dropped: int = 0
+        self.last_run: datetime.datetime | None = None
+
+    @classmethod
+    def name_for(cls, day: datetime.date) -> str:
+        return f'{cls.PREFIX}{day:%Y%m%d}'
+
+    @classmethod
+    def day_for(cls, name: str) -> datetime.date | None:
+        try:
+            return datetime.datetime.strptime(name.removeprefix(cls.PREFIX), '%Y%m%d').date()
+        except ValueError:
+            return None
+
+    async def start(self) -> None:
+        # The first run is awaited, so there is always a partition for the log writer to insert into...
+        await self.maintain()
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name='LogPartitions')
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+
+            try:
+                await self.maintain()
+            except Exception as e:
+                LOGGER.error('Failed to maintain log partitions: %s', e)
+
+    async def maintain(self) -> None:
+        today: datetime.date = datetime.datetime.now(datetime.timezone.utc).date()
+        created, dropped = self.created, self.dropped
+
+        async with self.database.acquire() as connection, connection.transaction():
+            locked: bool = await connection.fetchval('SELECT pg_try_advisory_xact_lock($1)', _LOCK_KEY)
+            if not locked:
+                LOGGER.debug('Log partition maintenance is already running elsewhere.')
+                return
+
+            await self._migrate_legacy(connection, today=today)
+
+            # Yesterday is included for logs which were queued just before midnight...
+            for offset in range(-1, self.premake + 1):
+                await self._create(connection, today + datetime.timedelta(days=offset))
+
+            if self.retention > 0:
+                await self._drop_expired(connection, before=today - datetime.timedelta(days=self.retention))
+
+        self.last_run = datetime.datetime.now(datetime.timezone.utc)
+        LOGGER.info('Maintained log partitions: created=%s dropped=%s', self.created - created, self.dropped - dropped)
+
+    async def partitions(self, connection: asyncpg.Connection[asyncpg.Record]) -> list[str]:
+        query: str = """
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'logs'::regclass
+        ORDER BY c.relname
+        """
+
+        rows = await connection.fetch(query)
+        return [r['relname'] for r in rows]
+
+    async def _create(self, connection: asyncpg.Connection[asyncpg.Record], day: datetime.date) -> bool:
+        name: str = self.name_for(day)
+        exists: bool = await connection.fetchval('SELECT to_regclass($1) IS NOT NULL', name)
+
+        if exists:
+            return False
+
+        upper: datetime.date = day + datetime.timedelta(days=1)
+        query: str = f"""
+        CREATE TABLE IF NOT EXISTS {name} PARTITION OF logs
+        FOR VALUES FROM ('{day.isoformat()} 00:00:00+00') TO ('{upper.isoformat()} 00:00:00+00')
+        """
+
+        await connection.execute(query)
+        self.created += 1
+
+        LOGGER.debug('Created log partition "%s".', name)
+        return True
+
+    async def _drop_expired(self, connection: asyncpg.Connection[asyncpg.Record], *, before: datetime.date) -> None:
+        for name in await self.partitions(connection):
+            day: datetime.date | None = self.day_for(name)
+
+            # Only drop partitions we manage and whose entire range is older than the retention period...
+            if day is None or day >= before:
+                continue
+
+            await connection.execute(f'DROP TABLE IF EXISTS {name}')
+            self.dropped += 1
+
+            LOGGER.debug('Dropped expired log partition "%s".', name)
+
+    async def _migrate_legacy(self, connection: asyncpg.Connection[asyncpg.Record], *, today: datetime.date) -> None:
+        """Move rows from the unpartitioned ``logs_legacy`` table, renamed by the initial migration, into partitions.
+
+        Rows older than the retention period are dropped, as their partitions would be. Rows which fit no partition,
+        because they have no ``accessed`` time or are dated past the premade partitions, are kept in
+        ``logs_legacy_unplaced`` instead of being dropped.
+        """
+        exists: bool = await connection.fetchval("SELECT to_regclass('logs_legacy') IS NOT NULL")
+        if not exists:
+            return
+
+        oldest: datetime.datetime | None = await connection.fetchval('SELECT min(accessed) FROM logs_legacy')
+        start: datetime.date = oldest.astimezone(datetime.timezone.utc).date() if oldest else today
+        end: datetime.date = today + datetime.timedelta(days=self.premake)
+
+        if self.retention > 0:
+            start = max(start, today - datetime.timedelta(days=self.retention))
+
+        day: datetime.date = start
+        while day <= end:
+            await self._create(connection, day)
+            day += datetime.timedelta(days=1)
+
+        query: str = """
+        INSERT INTO logs (ip, userid, appid, accessed, cf_ray, cf_country, method, route, body, response_code)
+        SELECT ip, userid, appid, accessed, cf_ray, cf_country, method, route, body, response_code FROM logs_legacy
+        WHERE accessed >= $1 AND accessed < $2
+        """
+
+        lower = datetime.datetime.combine(start, datetime.time(), tzinfo=datetime.timezone.utc)
+        upper = datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time(), tzinfo=datetime.timezone.utc)
+
+        moved: int = int((await connection.execute(query, lower, upper)).split()[-1])
+        deleted: int = int(
+            (await connection.execute('DELETE FROM logs_legacy WHERE accessed >= $1 AND accessed < $2', lower, upper))
+            .split()[-1]
+        )
+
+        # Both statements select the same rows in one transaction, anything else means rows would be lost...
+        if moved != deleted:
+            raise RuntimeError(f'Moved {moved} legacy logs into partitions, but {deleted} matched, keeping logs_legacy.')
+
+        expired: int = int((await connection.execute('DELETE FROM logs_legacy WHERE accessed < $1', lower)).split()[-1])
+        unplaced: int = await connection.fetchval('SELECT count(*) FROM logs_legacy')
+
+        if unplaced:
+            await connection.execute('ALTER TABLE logs_legacy RENAME TO logs_legacy_unplaced')
+            LOGGER.warning(
+                'Kept %s legacy logs without an accessed time, or dated past %s, in "logs_legacy_unplaced".', unplaced, end
+            )
+        else:
+            await connection.execute('DROP TABLE logs_legacy')
+
+        LOGGER.info('Migrated %s legacy logs into partitions, dropping %s past retention.', moved, expired)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'premake': self.premake,
+            'retention': self.retention,
+            'created': self.created,
+            'dropped': self.dropped,
+            'last_run': self.last_run.isoformat() if self.last_run else None,
+        }
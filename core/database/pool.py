@@ -0,0 +1,69 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import collections
+from typing import Any
+
+__all__ = ('WaitTimings',)
+
+
+class WaitTimings:
+    """Records how long each ``Pool.acquire`` waited for a connection.
+
+    Only the most recent ``size`` waits are kept for percentiles, while the count, total and maximum cover every wait.
+    """
+
+    PERCENTILES: tuple[int, ...] = (50, 90, 99)
+
+    def __init__(self, *, size: int = 4096) -> None:
+        self._recent: collections.deque[float] = collections.deque(maxlen=size)
+
+        self.count: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+        self.timeouts: int = 0
+
+    def record(self, seconds: float) -> None:
+        self._recent.append(seconds)
+
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentiles(self) -> dict[str, float]:
+        ordered: list[float] = sorted(self._recent)
+        if not ordered:
+            return {f'p{p}': 0.0 for p in self.PERCENTILES}
+
+        last: int = len(ordered) - 1
+        return {f'p{p}': ordered[round(last * p / 100)] for p in self.PERCENTILES}
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'count': self.count,
+            'timeouts': self.timeouts,
+            'average_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'max_ms': self.max * 1000,
+            **{f'{k}_ms': v * 1000 for k, v in self.percentiles().items()},
+        }
@@ -0,0 +1,324 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import datetime
+import logging
+import random
+import re
+import time
+from typing import TYPE_CHECKING, Any
+
+import asyncpg
+
+from .pool import WaitTimings
+from .replicas import current_route
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    from .database import Database
+
+__all__ = ('ProfiledConnection', 'QueryProfiler')
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+_WHITESPACE: re.Pattern[str] = re.compile(r'\s+')
+# Statements asyncpg runs to manage transactions, which would otherwise crowd out the application's own...
+_TRANSACTION: re.Pattern[str] = re.compile(r'\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE|START\s+TRANSACTION)\b', re.I)
+
+# Set while statements which are not the application's own run, such as capturing a plan or a pool resetting a
+# released connection, so they are not profiled...
+_unprofiled: contextvars.ContextVar[bool] = contextvars.ContextVar('_unprofiled', default=False)
+
+
+def _rows(result: Any) -> int | None:
+    if isinstance(result, list):
+        return len(result)  # pyright: ignore [reportUnknownArgumentType]
+
+    if isinstance(result, str):
+        # A command status, such as "INSERT 0 5" or "DELETE 2"...
+        last: str = result.rpartition(' ')[2]
+        return int(last) if last.isdigit() else None
+
+    return None if result is None else 1
+
+
+class QueryStats:
+    """Timings for a single SQL statement, across every call."""
+
+    __slots__ = ('callers', 'plan', 'plan_captured', 'rows', 'slow', 'timings')
+
+    def __init__(self) -> None:
+        self.timings: WaitTimings = WaitTimings(size=512)
+        self.rows: int = 0
+        self.slow: int = 0
+        self.callers: dict[str, int] = {}
+
+        self.plan: str | None = None
+        self.plan_captured: datetime.datetime | None = None
+
+    def as_dict(self, query: str) -> dict[str, Any]:
+        return {
+            'query': query,
+            **self.timings.stats(),
+            'total_ms': self.timings.total * 1000,
+            'rows': self.rows,
+            'slow': self.slow,
+            'callers': dict(sorted(self.callers.items(), key=lambda c: c[1], reverse=True)),
+            'plan': self.plan,
+            'plan_captured': self.plan_captured.isoformat() if self.plan_captured else None,
+        }
+
+
+class QueryProfiler:
+    """Records the duration, row count and calling `core.Database` method of every query.
+
+    Statements slower than ``threshold`` seconds are logged. For ``explain_rate`` of slow ``SELECT`` statements, the
+    statement is run again in the background with ``EXPLAIN (ANALYZE, BUFFERS)`` and the plan is kept with its stats.
+    Other statements are never explained, as ``ANALYZE`` would run them again.
+
+    Transaction statements and the reset a pool runs on every released connection are not recorded. ``COPY`` is
+    recorded as ``COPY table (columns)``.
+
+    Parameters
+    ----------
+    database: core.Database
+        The database whose pool is used to capture plans.
+    enabled: bool
+        Whether queries are recorded.
+    threshold: float
+        The amount of seconds after which a query is logged as slow.
+    explain_rate: float
+        The fraction of slow queries whose plan is captured.
+    max_queries: int
+        The maximum amount of distinct statements tracked. Statements seen after this are only counted as untracked.
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        *,
+        enabled: bool = True,
+        threshold: float = 0.5,
+        explain_rate: float = 0.01,
+        max_queries: int = 1000,
+    ) -> None:
+        self.database = database
+
+        self.enabled: bool = enabled
+        self.threshold: float = threshold
+        self.explain_rate: float = explain_rate
+        self.max_queries: int = max_queries
+
+        self._queries: dict[str, QueryStats] = {}
+        self._explain: asyncio.Task[None] | None = None
+
+        self.untracked: int = 0
+        self.explained: int = 0
+
+    def record(self, query: str, args: tuple[Any, ...], *, duration: float, rows: int | None) -> None:
+        if not self.enabled or _unprofiled.get():
+            return
+
+        route = current_route.get()
+        caller: str = route[2] if route else 'other'
+
+        key: str = _WHITESPACE.sub(' ', query).strip()
+        stats: QueryStats | None = self._queries.get(key)
+
+        if stats is None:
+            if len(self._queries) >= self.max_queries:
+                self.untracked += 1
+                return
+
+            stats = self._queries[key] = QueryStats()
+
+        stats.timings.record(duration)
+        stats.rows += rows or 0
+        stats.callers[caller] = stats.callers.get(caller, 0) + 1
+
+        if duration < self.threshold:
+            return
+
+        stats.slow += 1
+        LOGGER.warning('Slow query from "%s" took %.1fms (rows=%s): %s', caller, duration * 1000, rows, key[:500])
+
+        # Only one plan is captured at a time, so a burst of slow queries does not add a burst of EXPLAINs...
+        if (
+            self.explain_rate > 0
+            and (self._explain is None or self._explain.done())
+            and key.upper().startswith('SELECT')
+            and random.random() < self.explain_rate
+        ):
+            self._explain = asyncio.create_task(self._capture(query, args, stats))
+
+    async def _capture(self, query: str, args: tuple[Any, ...], stats: QueryStats) -> None:
+        _unprofiled.set(True)
+
+        try:
+            async with self.database.acquire() as connection:
+                transaction = connection.transaction()
+                await transaction.start()
+
+                # Nothing should have been written, but the transaction is never committed either way...
+                try:
+                    rows = await connection.fetch(f'EXPLAIN (ANALYZE, BUFFERS) {query}', *args)
+                finally:
+                    await transaction.rollback()
+        except Exception as e:
+            LOGGER.debug('Failed to capture the plan of a slow query: %s', e)
+            return
+
+        stats.plan = '\n'.join(r[0] for r in rows)
+        stats.plan_captured = datetime.datetime.now(datetime.timezone.utc)
+        self.explained += 1
+
+    def top(self, *, limit: int = 10, by: str = 'total') -> list[dict[str, Any]]:
+        """Return the ``limit`` statements with the highest ``total`` time or ``p99`` time."""
+        if by not in ('total', 'p99'):
+            raise ValueError(f'Unknown query sort: "{by}".')
+
+        def key(item: tuple[str, QueryStats]) -> float:
+            timings: WaitTimings = item[1].timings
+            return timings.total if by == 'total' else timings.percentiles()['p99']
+
+        ordered: list[tuple[str, QueryStats]] = sorted(self._queries.items(), key=key, reverse=True)
+        return [stats.as_dict(query) for query, stats in ordered[:limit]]
+
+    def reset(self) -> None:
+        self._queries.clear()
+        self.untracked = 0
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'threshold_ms': self.threshold * 1000,
+            'explain_rate': self.explain_rate,
+            'tracked': len(self._queries),
+            'untracked': self.untracked,
+            'explained': self.explained,
+        }
+
+
+class _ProfiledCursor:
+    """Wraps an iterated cursor, timing only its fetches and not the caller's work between rows.
+
+    The statement is recorded once iteration ends, however it ends.
+    """
+
+    __slots__ = ('_args', '_factory', '_profiler', '_query')
+
+    def __init__(self, factory: Any, profiler: QueryProfiler, query: str, args: tuple[Any, ...]) -> None:
+        self._factory = factory
+        self._profiler: QueryProfiler = profiler
+        self._query: str = query
+        self._args: tuple[Any, ...] = args
+
+    def __await__(self) -> Any:
+        return self._factory.__await__()
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        iterator = self._factory.__aiter__()
+        duration: float = 0.0
+        rows: int = 0
+
+        try:
+            while True:
+                start: float = time.perf_counter()
+                try:
+                    row = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    duration += time.perf_counter() - start
+
+                rows += 1
+                yield row
+        finally:
+            self._profiler.record(self._query, self._args, duration=duration, rows=rows)
+
+
+class ProfiledConnection(asyncpg.Connection):  # type: ignore
+    """An `asyncpg.Connection` which reports every query to its `QueryProfiler`.
+
+    Used as the ``connection_class`` of the Database pools. The profiler is attached by the pool ``init`` hook.
+    """
+
+    profiler: QueryProfiler | None = None
+
+    def _profiling(self, query: str) -> bool:
+        return self.profiler is not None and not _unprofiled.get() and not _TRANSACTION.match(query)
+
+    async def _profiled(self, method: Any, query: str, args: tuple[Any, ...], kwargs: dict[str, Any]) -> Any:
+        if not self._profiling(query):
+            return await method(query, *args, **kwargs)
+
+        assert self.profiler
+        start: float = time.perf_counter()
+        result = await method(query, *args, **kwargs)
+
+        self.profiler.record(query, args, duration=time.perf_counter() - start, rows=_rows(result))
+        return result
+
+    async def reset(self, *, timeout: float | None = None) -> None:
+        token = _unprofiled.set(True)
+        try:
+            await super().reset(timeout=timeout)
+        finally:
+            _unprofiled.reset(token)
+
+    async def execute(self, query: str, *args: Any, **kwargs: Any) -> str:
+        return await self._profiled(super().execute, query, args, kwargs)
+
+    async def fetch(self, query: str, *args: Any, **kwargs: Any) -> list[Any]:
+        return await self._profiled(super().fetch, query, args, kwargs)
+
+    async def fetchrow(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        return await self._profiled(super().fetchrow, query, args, kwargs)
+
+    async def fetchval(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        return await self._profiled(super().fetchval, query, args, kwargs)
+
+    def cursor(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        factory = super().cursor(query, *args, **kwargs)
+
+        if not self._profiling(query):
+            return factory
+
+        assert self.profiler
+        return _ProfiledCursor(factory, self.profiler, query, args)
+
+    async def copy_records_to_table(self, table_name: str, *, records: Any, **kwargs: Any) -> str:
+        columns: str = ', '.join(kwargs.get('columns') or ())
+        query: str = f'COPY {table_name} ({columns})' if columns else f'COPY {table_name}'
+
+        copy = super().copy_records_to_table
+
+        async def run(_: str, **kwargs: Any) -> str:
+            return await copy(table_name, records=records, **kwargs)
+
+        return await self._profiled(run, query, (), kwargs)
@@ -0,0 +1,312 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import logging
+import time
+from typing import TYPE_CHECKING, Any, Literal, TypeAlias, TypeVar
+
+import asyncpg
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Callable
+
+__all__ = ('Replica', 'ReplicaSet', 'read', 'write')
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+Route: TypeAlias = tuple[Literal['read', 'write', 'primary'], int | None, str]
+KeyFunc: TypeAlias = 'Callable[[dict[str, Any]], int | None]'
+
+F = TypeVar('F', bound='Callable[..., Any]')
+
+# The route of the Database method currently running, the user it concerns and the method name, read by Database.acquire...
+current_route: contextvars.ContextVar[Route | None] = contextvars.ContextVar('current_route', default=None)
+
+# Errors which mean a replica can not currently be used...
+REPLICA_ERRORS: tuple[type[BaseException], ...] = (OSError, TimeoutError, asyncpg.InterfaceError, asyncpg.PostgresConnectionError)
+
+
+async def _routed_iterator(iterator: AsyncIterator[Any], route: Route) -> AsyncIterator[Any]:
+    # The connection is acquired on the first iteration, so only that needs to see the route...
+    token = current_route.set(route)
+    try:
+        first = await anext(iterator, _routed_iterator)
+    finally:
+        current_route.reset(token)
+
+    if first is _routed_iterator:
+        return
+
+    yield first
+    async for item in iterator:
+        yield item
+
+
+def read(key: KeyFunc | None = None) -> Callable[[F], F]:
+    """Mark a `core.Database` method as read only, so its queries may be sent to a replica.
+
+    ``key`` is called with the keyword arguments of the method and returns the ID of the user the read concerns. Reads
+    for a user with a recent `write` are sent to the primary instead.
+    """
+
+    def decorator(func: F) -> F:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def wrapper(*args: Any, **kwargs: Any) -> Any:
+                token = current_route.set(('read', key(kwargs) if key else None, func.__name__))
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    current_route.reset(token)
+
+        else:
+
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                return _routed_iterator(func(*args, **kwargs), ('read', key(kwargs) if key else None, func.__name__))
+
+        return wrapper  # type: ignore
+
+    return decorator
+
+
+def write(key: KeyFunc | None = None) -> Callable[[F], F]:
+    """Mark a `core.Database` method as writing, so its queries are sent to the primary.
+
+    Afterwards, reads for the user returned by ``key``, or the ``uid`` of the returned model, are sent to the primary
+    for `ReplicaSet.sticky` seconds, so the caller reads their own writes on this process. Stickiness is not shared
+    between worker processes, so a request handled by another worker may still read from a lagging replica.
+    """
+
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        async def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+            token = current_route.set(('write', None, func.__name__))
+            try:
+                result = await func(self, *args, **kwargs)
+            finally:
+                current_route.reset(token)
+
+            uid: int | None = key(kwargs) if key else getattr(result, 'uid', None)
+            if uid is not None:
+                self.replicas.written(uid)
+
+            return result
+
+        return wrapper  # type: ignore
+
+    return decorator
+
+
+class Replica:
+    """A connection pool to a single read replica."""
+
+    def __init__(self, dsn: str, *, index: int) -> None:
+        self.dsn: str = dsn
+        self.index: int = index
+
+        self.pool: asyncpg.Pool[asyncpg.Record] | None = None
+        self.healthy: bool = False
+        self.lag: float | None = None
+
+        self.reads: int = 0
+        self.failures: int = 0
+        self.last_error: str | None = None
+
+    def fail(self, error: BaseException) -> None:
+        if self.healthy or not self.failures:
+            LOGGER.warning('Replica %s is unavailable, reads will use other replicas or the primary: %s', self.index, error)
+
+        self.healthy = False
+        self.failures += 1
+        self.last_error = str(error)
+
+    def stats(self) -> dict[str, Any]:
+        size: int = self.pool.get_size() if self.pool else 0
+        idle: int = self.pool.get_idle_size() if self.pool else 0
+
+        return {
+            'healthy': self.healthy,
+            'lag_seconds': self.lag,
+            'size': size,
+            'in_use': size - idle,
+            'reads': self.reads,
+            'failures': self.failures,
+            'last_error': self.last_error,
+        }
+
+
+class ReplicaSet:
+    """Balances reads across healthy read replicas.
+
+    Each replica is checked every ``interval`` seconds, and is only used while it is reachable and its replay lag is at
+    most ``max_lag`` seconds. Reads on this process concerning a user who wrote through it in the last ``sticky``
+    seconds use the primary. Other worker processes do not know of the write, and may read it from a replica up to
+    ``max_lag`` seconds behind.
+
+    Parameters
+    ----------
+    dsns: list[str]
+        The DSN of each replica. With none, every read uses the primary.
+    pool_options: dict[str, Any]
+        Keyword arguments for `asyncpg.create_pool`, shared with the primary pool.
+    max_lag: float
+        The maximum amount of seconds a replica may lag behind the primary.
+    sticky: float
+        The amount of seconds reads for a user go to the primary after they write. Must be at least ``max_lag``.
+    interval: float
+        The amount of seconds between health checks.
+    """
+
+    def __init__(
+        self,
+        dsns: list[str],
+        *,
+        pool_options: dict[str, Any],
+        max_lag: float = 10.0,
+        sticky: float = 10.0,
+        interval: float = 5.0,
+    ) -> None:
+        # A replica may lag by up to max_lag seconds, so a shorter sticky period lets users miss their own writes...
+        if sticky < max_lag:
+            raise ValueError(f'Replica sticky period ({sticky}s) must be at least the maximum replica lag ({max_lag}s).')
+
+        self.replicas: list[Replica] = [Replica(dsn, index=i) for i, dsn in enumerate(dsns)]
+        self.pool_options: dict[str, Any] = pool_options
+        self.max_lag: float = max_lag
+        self.sticky: float = sticky
+        self.interval: float = interval
+
+        self._written: dict[int, float] = {}
+        self._next: int = 0
+        self._task: asyncio.Task[None] | None = None
+
+        self.primary_reads: int = 0
+        self.sticky_reads: int = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    async def start(self) -> None:
+        if not self.replicas:
+            return
+
+        await self.check()
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name='ReplicaSet')
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+            self._task = None
+
+        for replica in self.replicas:
+            if replica.pool is not None:
+                await replica.pool.close()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+    async def check(self) -> None:
+        await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+
+    async def _check(self, replica: Replica) -> None:
+        query: str = 'SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())::FLOAT8'
+
+        try:
+            if replica.pool is None:
+                replica.pool = await asyncpg.create_pool(dsn=replica.dsn, **self.pool_options)  # type: ignore
+
+            assert replica.pool
+            async with asyncio.timeout(self.interval):
+                lag: float | None = await replica.pool.fetchval(query)
+        except Exception as e:
+            replica.fail(e)
+            return
+
+        # No replay timestamp means nothing has been replayed yet, or this is not a standby...
+        replica.lag = lag
+
+        if lag is not None and lag > self.max_lag:
+            replica.fail(RuntimeError(f'replication lag of {lag:.1f} seconds is over {self.max_lag} seconds'))
+            return
+
+        if not replica.healthy:
+            LOGGER.info('Replica %s is available for reads.', replica.index)
+
+        replica.healthy = True
+
+    def written(self, uid: int) -> None:
+        """Send reads concerning ``uid`` to the primary for the next `sticky` seconds."""
+        if not self.replicas:
+            return
+
+        now: float = time.monotonic()
+        self._written[uid] = now + self.sticky
+
+        # Expired entries are dropped occasionally, so this does not grow with every user who ever wrote...
+        if len(self._written) > 1024:
+            self._written = {k: v for k, v in self._written.items() if v > now}
+
+    def choose(self, uid: int | None) -> Replica | None:
+        """Return the replica the next read concerning ``uid`` should use, ``None`` for the primary."""
+        if not self.replicas:
+            return None
+
+        if uid is not None and self._written.get(uid, 0.0) > time.monotonic():
+            self.sticky_reads += 1
+            return None
+
+        for _ in range(len(self.replicas)):
+            replica: Replica = self.replicas[self._next % len(self.replicas)]
+            self._next += 1
+
+            if replica.healthy and replica.pool is not None:
+                replica.reads += 1
+                return replica
+
+        self.primary_reads += 1
+        return None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'replicas': [replica.stats() for replica in self.replicas],
+            'primary_reads': self.primary_reads,
+            'sticky_reads': self.sticky_reads,
+            'sticky_users': len(self._written),
+        }
@@ -0,0 +1,159 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import asyncio
+import datetime
+import logging
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from core.events import EventBus
+    from core.tokens import TokenClaims
+
+    from .database import Database
+
+__all__ = ('TokenRevocations',)
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+class TokenRevocations:
+    """An in-memory copy of the ``token_revocations`` table, so signed tokens can be checked without the database.
+
+    Rather than listing every revoked token, each subject, a user's bearer tokens or an application's tokens, has a
+    ``not_before`` time. Signed tokens issued before it are revoked. Issuing a new token revokes every older one, so
+    the list holds at most one entry per user or application.
+
+    The list is loaded on `start`, and then reloaded every ``interval`` seconds. Revocations made by this process are
+    applied immediately, and shared with other processes over the event bus passed to `attach`.
+
+    Parameters
+    ----------
+    database: core.Database
+        The database to load revocations from.
+    interval: float
+        The amount of seconds between reloads.
+    """
+
+    # Used as not_before to revoke every token of a subject for good, E.g. a deleted application...
+    FOREVER: int = 2**63 - 1
+
+    def __init__(self, database: Database, *, interval: float = 60) -> None:
+        self.database = database
+        self.interval: float = interval
+
+        self._not_before: dict[tuple[str, int], int] = {}
+
+        self._events: EventBus | None = None
+        self._task: asyncio.Task[None] | None = None
+
+        self.rejected: int = 0
+        self.last_refresh: datetime.datetime | None = None
+
+    def __len__(self) -> int:
+        return len(self._not_before)
+
+    def attach(self, events: EventBus) -> None:
+        """Share revocations made on this process with other processes over ``events``."""
+        self._events = events
+        events.subscribe('tokens.revoked', self._remote_revoked)
+
+    async def start(self) -> None:
+        await self.refresh()
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name='TokenRevocations')
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+
+            try:
+                await self.refresh()
+            except Exception as e:
+                LOGGER.error('Failed to refresh token revocations: %s', e)
+
+    async def refresh(self) -> None:
+        """Reload every revocation from the database, replacing the list at once."""
+        rows: list[tuple[str, int, int]] = await self.database.fetch_token_revocations()
+        not_before: dict[tuple[str, int], int] = {(kind, subject): value for kind, subject, value in rows}
+
+        # Keep revocations which arrived from another process after the query ran...
+        for key, value in self._not_before.items():
+            if value > not_before.get(key, 0):
+                not_before[key] = value
+
+        self._not_before = not_before
+        self.last_refresh = datetime.datetime.now(datetime.timezone.utc)
+
+        LOGGER.debug('Loaded %s token revocations.', len(not_before))
+
+    def add(self, kind: str, subject: int, not_before: int) -> None:
+        key: tuple[str, int] = (kind, subject)
+
+        if not_before > self._not_before.get(key, 0):
+            self._not_before[key] = not_before
+
+    async def revoke(self, kind: str, subject: int, not_before: int) -> None:
+        """Revoke the tokens of a subject issued before ``not_before`` on this process, and every other process.
+
+        The caller is responsible for storing the revocation in the database.
+        """
+        self.add(kind, subject, not_before)
+
+        if self._events is not None:
+            await self._events.publish('tokens.revoked', {'kind': kind, 'subject': subject, 'not_before': not_before})
+
+    async def _remote_revoked(self, data: dict[str, Any]) -> None:
+        self.add(data['kind'], data['subject'], data['not_before'])
+
+    def check(self, claims: TokenClaims) -> bool:
+        """Return whether the token with ``claims`` has been revoked."""
+        key: tuple[str, int] = ('application', claims.tid) if claims.tid else ('user', claims.uid)
+
+        if claims.issued < self._not_before.get(key, 0):
+            self.rejected += 1
+            return True
+
+        return False
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'revocations': len(self._not_before),
+            'rejected': self.rejected,
+            'last_refresh': self.last_refresh.isoformat() if self.last_refresh else None,
+        }
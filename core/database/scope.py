@@ -0,0 +1,75 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import asyncpg
+    from asyncpg.pool import PoolConnectionProxy
+
+__all__ = ('ConnectionScope',)
+
+
+_current_scope: contextvars.ContextVar[ConnectionScope | None] = contextvars.ContextVar('current_scope', default=None)
+
+
+class ConnectionScope:
+    """A unit of work, such as one request, whose `core.Database` calls share a single primary connection.
+
+    Opened with `core.Database.scope`. The connection is acquired by the first call which needs the primary, and
+    released when the scope ends. Only the task which opened the scope uses it, so tasks it starts, like the batch
+    loaders, slow query EXPLAINs or a streaming response body, never share the connection concurrently and acquire
+    their own as usual.
+
+    The scope only bounds the connections of its own task's calls to one. Work running in other tasks on the request's
+    behalf acquires from the pool while the scope may hold its connection, so a request can use more than one connection
+    at once. A batch loader in particular serves several requests, and a request which stops waiting must not release a
+    connection the batch is still using, so token lookups which miss the `core.AuthCache` never borrow a scope's
+    connection.
+    """
+
+    __slots__ = ('connection', 'task')
+
+    def __init__(self) -> None:
+        self.connection: PoolConnectionProxy[asyncpg.Record] | None = None
+        self.task: asyncio.Task[object] | None = asyncio.current_task()
+
+    @classmethod
+    def current(cls) -> ConnectionScope | None:
+        """The scope opened by the running task, if any."""
+        scope: ConnectionScope | None = _current_scope.get()
+
+        if scope is None or scope.task is not asyncio.current_task():
+            return None
+
+        return scope
+
+    def enter(self) -> contextvars.Token[ConnectionScope | None]:
+        return _current_scope.set(self)
+
+    @staticmethod
+    def exit(token: contextvars.Token[ConnectionScope | None]) -> None:
+        _current_scope.reset(token)
@@ -0,0 +1,206 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import asyncio
+import datetime
+import logging
+from typing import TYPE_CHECKING, Any
+
+import core
+
+if TYPE_CHECKING:
+    from core.events import EventBus
+
+    from .database import Database
+
+__all__ = ('TokenFilter',)
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+class TokenFilter:
+    """A `core.BloomFilter` of every valid bearer and application token, so unknown tokens skip the database.
+
+    A token the filter has never seen can not exist, and is rejected without a query. The filter is built from the
+    database on `start`, and rebuilt every ``interval`` seconds to forget replaced and deleted tokens, or sooner once
+    more tokens were added than it was sized for.
+
+    Tokens issued by this process are added immediately, and shared with other processes over the event bus passed
+    to `attach`. A filter must never miss a real token, so it must only be enabled when every process issuing tokens
+    shares that bus. Until the first build, and while ``enabled`` is ``False``, every token may exist.
+
+    Parameters
+    ----------
+    database: core.Database
+        The database to load tokens from.
+    enabled: bool
+        Whether tokens are checked against the filter.
+    error_rate: float
+        The fraction of unknown tokens which are looked up anyway.
+    interval: float
+        The amount of seconds between rebuilds.
+    """
+
+    def __init__(
+        self, database: Database, *, enabled: bool = True, error_rate: float = 0.001, interval: float = 3600
+    ) -> None:
+        self.database = database
+
+        self.enabled: bool = enabled
+        self.error_rate: float = error_rate
+        self.interval: float = interval
+
+        self._filter: core.BloomFilter | None = None
+        # Digests added while a rebuild is loading, which the rebuilt filter would otherwise miss...
+        self._pending: list[bytes] | None = None
+
+        self._events: EventBus | None = None
+        self._task: asyncio.Task[None] | None = None
+        self._wake: asyncio.Event = asyncio.Event()
+
+        self.rejected: int = 0
+        self.passed: int = 0
+        self.false_positives: int = 0
+        self.rebuilds: int = 0
+        self.last_rebuild: datetime.datetime | None = None
+
+    def attach(self, events: EventBus) -> None:
+        """Share tokens issued on this process with other processes over ``events``."""
+        self._events = events
+        events.subscribe('tokens.issued', self._remote_issued)
+
+    async def start(self) -> None:
+        if not self.enabled:
+            return
+
+        await self.rebuild()
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name='TokenFilter')
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except TimeoutError:
+                pass
+
+            self._wake.clear()
+
+            try:
+                await self.rebuild()
+            except Exception as e:
+                LOGGER.error('Failed to rebuild the token filter: %s', e)
+
+    async def rebuild(self) -> None:
+        """Build a new filter from every valid token in the database, and replace the current one at once."""
+        self._pending = []
+
+        try:
+            digests: list[bytes] = await self.database.fetch_token_digests()
+
+            # Room to grow until the next rebuild, without the false positive rate climbing...
+            bloom = core.BloomFilter(max(1024, len(digests) * 2), error_rate=self.error_rate)
+            for digest in digests:
+                bloom.add(digest)
+
+            for digest in self._pending:
+                bloom.add(digest)
+        finally:
+            self._pending = None
+
+        self._filter = bloom
+        self.rebuilds += 1
+        self.last_rebuild = datetime.datetime.now(datetime.timezone.utc)
+
+        LOGGER.debug('Built the token filter from %s tokens.', len(digests))
+
+    def add(self, digest: bytes) -> None:
+        if self._pending is not None:
+            self._pending.append(digest)
+
+        if self._filter is None:
+            return
+
+        self._filter.add(digest)
+        if self._filter.saturated:
+            self._wake.set()
+
+    async def issue(self, token: str) -> None:
+        """Add a newly issued token on this process, and every other process."""
+        if not self.enabled:
+            return
+
+        digest: bytes = core.token_digest(token)
+        self.add(digest)
+
+        if self._events is not None:
+            await self._events.publish('tokens.issued', {'digest': digest.hex()})
+
+    async def _remote_issued(self, data: dict[str, Any]) -> None:
+        self.add(bytes.fromhex(data['digest']))
+
+    def might_exist(self, token: str) -> bool:
+        """Return ``False`` if ``token`` is certainly not a valid token, or ``True`` if it may be."""
+        if not self.enabled or self._filter is None:
+            return True
+
+        if core.token_digest(token) in self._filter:
+            self.passed += 1
+            return True
+
+        self.rejected += 1
+        return False
+
+    def false_positive(self) -> None:
+        """Record that a token the filter let through did not exist after all."""
+        if self.enabled and self._filter is not None:
+            self.false_positives += 1
+
+    def stats(self) -> dict[str, Any]:
+        unknown: int = self.rejected + self.false_positives
+
+        return {
+            'enabled': self.enabled,
+            'rejected': self.rejected,
+            'passed': self.passed,
+            'false_positives': self.false_positives,
+            'false_positive_rate': self.false_positives / unknown if unknown else 0.0,
+            'rebuilds': self.rebuilds,
+            'last_rebuild': self.last_rebuild.isoformat() if self.last_rebuild else None,
+            **({'filter': self._filter.stats()} if self._filter else {}),
+        }
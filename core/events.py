@@ -0,0 +1,273 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import secrets
+from typing import TYPE_CHECKING, Any, TypeAlias
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Coroutine
+
+    import asyncpg
+
+    from .database import Database
+
+__all__ = ('EventBus', 'PostgresEventBus')
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+EventHandler: TypeAlias = 'Callable[[Any], Coroutine[Any, Any, None]]'
+
+
+class EventBus:
+    """Carries events published by this process to every other process running the API.
+
+    Publishers always act on their own process first, the bus only notifies the others. Handlers registered with
+    `subscribe` are therefore only called for events published by another process.
+
+    This default backend has no other processes to notify, so publishing does nothing.
+    """
+
+    def __init__(self) -> None:
+        self.origin: str = secrets.token_hex(8)
+        self._handlers: dict[str, list[EventHandler]] = {}
+
+        self.published: int = 0
+        self.received: int = 0
+        self.failed: int = 0
+
+    def subscribe(self, topic: str, handler: EventHandler) -> None:
+        """Call ``handler`` with the data of every event published to ``topic`` by another process."""
+        self._handlers.setdefault(topic, []).append(handler)
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def publish(self, topic: str, data: Any) -> None:
+        """Publish JSON serialisable ``data`` to ``topic`` on every other process."""
+        self.published += 1
+
+    async def _dispatch(self, topic: str, data: Any) -> None:
+        self.received += 1
+
+        for handler in self._handlers.get(topic, []):
+            try:
+                await handler(data)
+            except Exception as e:
+                self.failed += 1
+                LOGGER.error('Event handler for "%s" failed: %s', topic, e, exc_info=e)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'backend': 'memory',
+            'origin': self.origin,
+            'topics': sorted(self._handlers),
+            'published': self.published,
+            'received': self.received,
+            'failed': self.failed,
+        }
+
+
+class PostgresEventBus(EventBus):
+    """An `EventBus` which sends events to other processes with PostgreSQL ``LISTEN``/``NOTIFY``.
+
+    A connection of its own, outside the `core.Database` pool, listens on ``channel`` and is reconnected if it is lost.
+    Events published while it is lost are not received.
+
+    ``NOTIFY`` payloads are limited to 8000 bytes, so events larger than ``spill_threshold`` bytes are written to the
+    ``event_payloads`` table and only their ID is sent. Spilled payloads are deleted after ``spill_retention`` seconds.
+
+    Parameters
+    ----------
+    database: core.Database
+        The database used to publish, and to open the listening connection.
+    channel: str
+        The ``NOTIFY`` channel shared by every process.
+    spill_threshold: int
+        The largest notification, in bytes, sent without spilling to the ``event_payloads`` table.
+    spill_retention: float
+        The amount of seconds spilled payloads are kept for.
+    reconnect_delay: float
+        The amount of seconds to wait before reconnecting a lost listening connection.
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        *,
+        channel: str = 'papi_events',
+        spill_threshold: int = 7500,
+        spill_retention: float = 300,
+        reconnect_delay: float = 1.0,
+    ) -> None:
+        super().__init__()
+
+        self.database = database
+        self.channel: str = channel
+        self.spill_threshold: int = spill_threshold
+        self.spill_retention: float = spill_retention
+        self.reconnect_delay: float = reconnect_delay
+
+        # Notifications are handled in the order they were received...
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        self._listener: asyncio.Task[None] | None = None
+        self._dispatcher: asyncio.Task[None] | None = None
+        self._connected: asyncio.Event = asyncio.Event()
+
+        self.spilled: int = 0
+        self.reconnects: int = 0
+
+    async def start(self) -> None:
+        if self._listener is not None:
+            return
+
+        self._dispatcher = asyncio.create_task(self._dispatch_notifications(), name='EventBus:dispatch')
+        self._listener = asyncio.create_task(self._listen(), name='EventBus:listen')
+
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout=10)
+        except TimeoutError:
+            LOGGER.warning('Started the event bus before it could listen on "%s".', self.channel)
+
+    async def close(self) -> None:
+        for task in (self._listener, self._dispatcher):
+            if task is None:
+                continue
+
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        self._listener = self._dispatcher = None
+
+    async def publish(self, topic: str, data: Any) -> None:
+        message: str = json.dumps({'origin': self.origin, 'topic': topic, 'data': data}, separators=(',', ':'))
+
+        if len(message.encode(encoding='UTF-8')) <= self.spill_threshold:
+            async with self.database.acquire() as connection:
+                await connection.execute('SELECT pg_notify($1, $2)', self.channel, message)
+        else:
+            async with self.database.acquire() as connection, connection.transaction():
+                id_: int = await connection.fetchval('INSERT INTO event_payloads (data) VALUES ($1) RETURNING id', message)
+
+                # Notifications are only sent on commit, so the payload is always visible to listeners...
+                reference: str = json.dumps({'origin': self.origin, 'topic': topic, 'ref': id_}, separators=(',', ':'))
+                await connection.execute('SELECT pg_notify($1, $2)', self.channel, reference)
+
+            self.spilled += 1
+
+        self.published += 1
+
+    async def _listen(self) -> None:
+        while True:
+            lost: asyncio.Event = asyncio.Event()
+
+            try:
+                connection = await self.database.connect()
+
+                try:
+                    connection.add_termination_listener(lambda _: lost.set())
+                    await connection.add_listener(self.channel, self._notified)
+
+                    self._connected.set()
+                    LOGGER.info('Listening for events on "%s" as "%s".', self.channel, self.origin)
+
+                    await self._listen_until(lost)
+                finally:
+                    if not connection.is_closed():
+                        connection.terminate()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                LOGGER.error('Event bus listener failed: %s', e)
+
+            self._connected.clear()
+            self.reconnects += 1
+            LOGGER.warning('Lost the event bus connection, reconnecting in %s seconds.', self.reconnect_delay)
+
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _listen_until(self, lost: asyncio.Event) -> None:
+        """Wait for the listening connection to be lost, deleting expired spilled payloads in the meantime."""
+        while not lost.is_set():
+            try:
+                await asyncio.wait_for(lost.wait(), timeout=self.spill_retention)
+            except TimeoutError:
+                await self._delete_expired()
+
+    async def _delete_expired(self) -> None:
+        query: str = 'DELETE FROM event_payloads WHERE created < now() - make_interval(secs => $1)'
+
+        try:
+            async with self.database.acquire() as connection:
+                await connection.execute(query, self.spill_retention)
+        except Exception as e:
+            LOGGER.warning('Failed to delete expired event payloads: %s', e)
+
+    def _notified(self, connection: asyncpg.Connection[asyncpg.Record], pid: int, channel: str, payload: str) -> None:
+        self._queue.put_nowait(payload)
+
+    async def _dispatch_notifications(self) -> None:
+        while True:
+            payload: str = await self._queue.get()
+
+            try:
+                message: dict[str, Any] = json.loads(payload)
+
+                if message['origin'] == self.origin:
+                    continue
+
+                if 'ref' in message:
+                    query: str = 'SELECT data FROM event_payloads WHERE id = $1'
+                    async with self.database.acquire() as connection:
+                        spilled: str | None = await connection.fetchval(query, message['ref'])
+
+                    if spilled is None:
+                        raise ValueError(f'spilled payload {message["ref"]} no longer exists')
+
+                    message = json.loads(spilled)
+
+                await self._dispatch(message['topic'], message['data'])
+            except Exception as e:
+                self.failed += 1
+                LOGGER.error('Failed to handle an event bus notification: %s', e)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **super().stats(),
+            'backend': 'postgres',
+            'channel': self.channel,
+            'listening': self._connected.is_set() and self._listener is not None and not self._listener.done(),
+            'queued': self._queue.qsize(),
+            'spilled': self.spilled,
+            'reconnects': self.reconnects,
+        }
@@ -0,0 +1,218 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import bisect
+import math
+import os
+from typing import TYPE_CHECKING, Any, TypeAlias
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+__all__ = ('Counter', 'Gauge', 'Histogram', 'MetricsRegistry', 'metrics')
+
+
+Labels: TypeAlias = tuple[str, ...]
+
+# Seconds, from half a millisecond up to ten seconds...
+DEFAULT_BUCKETS: tuple[float, ...] = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    TYPE: str
+
+    def __init__(self, name: str, description: str, *, labels: Labels = ()) -> None:
+        self.name: str = name
+        self.description: str = description
+        self.labels: Labels = labels
+
+    def _label_text(self, constant: str, values: Labels, extra: str = '') -> str:
+        pairs: list[str] = [f'{k}="{_escape(v)}"' for k, v in zip(self.labels, values)]
+
+        if constant:
+            pairs.insert(0, constant)
+        if extra:
+            pairs.append(extra)
+
+        return f'{{{",".join(pairs)}}}' if pairs else ''
+
+    def samples(self, constant: str) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self, constant: str) -> Iterator[str]:
+        yield f'# HELP {self.name} {self.description}'
+        yield f'# TYPE {self.name} {self.TYPE}'
+        yield from self.samples(constant)
+
+
+class Counter(_Metric):
+    """A value which only increases, for each combination of label values."""
+
+    TYPE = 'counter'
+
+    def __init__(self, name: str, description: str, *, labels: Labels = ()) -> None:
+        super().__init__(name, description, labels=labels)
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self, constant: str) -> Iterator[str]:
+        for labels, value in self._values.items():
+            yield f'{self.name}{self._label_text(constant, labels)} {_number(value)}'
+
+
+class Gauge(_Metric):
+    """A value which is read from ``callback`` when the metrics are rendered.
+
+    ``callback`` returns either a single value, or a mapping of label values to values.
+    """
+
+    TYPE = 'gauge'
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        *,
+        labels: Labels = (),
+        callback: Callable[[], float | dict[Labels, float]],
+    ) -> None:
+        super().__init__(name, description, labels=labels)
+        self.callback: Callable[[], float | dict[Labels, float]] = callback
+
+    def samples(self, constant: str) -> Iterator[str]:
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+
+        for labels, value in values.items():
+            yield f'{self.name}{self._label_text(constant, labels)} {_number(value)}'
+
+
+class Histogram(_Metric):
+    """Counts observed values into fixed ``buckets``, for each combination of label values.
+
+    Observing a value is a binary search and two additions, so it is cheap enough to call on every request.
+    """
+
+    TYPE = 'histogram'
+
+    def __init__(
+        self, name: str, description: str, *, labels: Labels = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> None:
+        super().__init__(name, description, labels=labels)
+        self.buckets: tuple[float, ...] = tuple(sorted(buckets))
+
+        # Label values -> [count in each bucket..., count above the last bucket, sum]...
+        self._series: dict[Labels, list[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series: list[float] | None = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 2)
+
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self, constant: str) -> Iterator[str]:
+        for labels, series in self._series.items():
+            cumulative: float = 0
+
+            for bound, count in zip((*self.buckets, math.inf), series):
+                cumulative += count
+                le: str = f'le="{_number(bound)}"'
+
+                yield f'{self.name}_bucket{self._label_text(constant, labels, le)} {_number(cumulative)}'
+
+            yield f'{self.name}_sum{self._label_text(constant, labels)} {_number(series[-1])}'
+            yield f'{self.name}_count{self._label_text(constant, labels)} {_number(cumulative)}'
+
+
+class MetricsRegistry:
+    """The metrics of this process, rendered in the Prometheus text format.
+
+    Metrics are only ever updated from the event loop thread, so recording takes no locks. Each worker process has its
+    own registry, and every sample is labelled with the ``pid`` of the process which answered the scrape.
+
+    Creating a metric which already exists returns the existing metric, so it can be created wherever it is recorded.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def __iter__(self) -> Iterator[_Metric]:
+        return iter(self._metrics.values())
+
+    def _get_or_create(self, cls: type[_Metric], name: str, **kwargs: Any) -> Any:
+        metric: _Metric | None = self._metrics.get(name)
+
+        if metric is None:
+            metric = self._metrics[name] = cls(name, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f'Metric "{name}" already exists as a {metric.TYPE}.')
+
+        return metric
+
+    def counter(self, name: str, description: str, *, labels: Labels = ()) -> Counter:
+        return self._get_or_create(Counter, name, description=description, labels=labels)
+
+    def histogram(
+        self, name: str, description: str, *, labels: Labels = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, description=description, labels=labels, buckets=buckets)
+
+    def gauge(
+        self,
+        name: str,
+        description: str,
+        *,
+        labels: Labels = (),
+        callback: Callable[[], float | dict[Labels, float]],
+    ) -> Gauge:
+        gauge: Gauge = self._get_or_create(Gauge, name, description=description, labels=labels, callback=callback)
+
+        # The latest callback wins, so a gauge follows whichever object registered it last...
+        gauge.callback = callback
+        return gauge
+
+    def render(self) -> str:
+        constant: str = f'pid="{os.getpid()}"'
+        lines: list[str] = [line for metric in self._metrics.values() for line in metric.render(constant)]
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics: MetricsRegistry = MetricsRegistry()
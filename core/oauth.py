@@ -0,0 +1,334 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from typing import Any
+
+import aiohttp
+
+__all__ = ('CircuitBreaker', 'GitHubOAuth', 'OAuthError', 'OAuthRejected', 'OAuthUnavailable')
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+class OAuthError(Exception):
+    """Base exception for failures authenticating with GitHub."""
+
+
+class OAuthRejected(OAuthError):
+    """GitHub rejected the request, E.g. the code was invalid or already used. Retrying will not help."""
+
+
+class OAuthUnavailable(OAuthError):
+    """GitHub could not be reached, timed out or failed, or the circuit breaker is open.
+
+    ``retry_after`` is the amount of seconds until another attempt is worthwhile.
+    """
+
+    def __init__(self, message: str, *, retry_after: float = 0.0) -> None:
+        super().__init__(message)
+        self.retry_after: float = retry_after
+
+
+class CircuitBreaker:
+    """Stops calling a failing upstream for a while, instead of every caller waiting on it to time out.
+
+    After ``threshold`` consecutive failures the breaker opens, and calls fail immediately for ``reset_after`` seconds.
+    Then a single trial call is allowed through. Its success closes the breaker again, and its failure re-opens it.
+    """
+
+    def __init__(self, *, threshold: int = 5, reset_after: float = 30.0) -> None:
+        self.threshold: int = threshold
+        self.reset_after: float = reset_after
+
+        self.failures: int = 0
+        self.opened_at: float | None = None
+        self.opened: int = 0
+
+        # When the trial call was let through, so a trial which never reports back does not hold the breaker open...
+        self._trial: float | None = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+
+        return 'half_open' if time.monotonic() - self.opened_at >= self.reset_after else 'open'
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+
+        return max(0.0, self.reset_after - (time.monotonic() - self.opened_at))
+
+    def allow(self) -> bool:
+        state: str = self.state
+
+        if state == 'closed':
+            return True
+        if state == 'open':
+            return False
+
+        now: float = time.monotonic()
+        if self._trial is not None and now - self._trial < self.reset_after:
+            return False
+
+        self._trial = now
+        return True
+
+    def success(self) -> None:
+        if self.opened_at is not None:
+            LOGGER.info('Circuit breaker closed, upstream recovered.')
+
+        self.failures = 0
+        self.opened_at = None
+        self._trial = None
+
+    def failure(self) -> None:
+        self.failures += 1
+
+        if self._trial is not None or (self.opened_at is None and self.failures >= self.threshold):
+            LOGGER.warning('Circuit breaker opened after %s failures, for %.0f seconds.', self.failures, self.reset_after)
+
+            self.opened_at = time.monotonic()
+            self.opened += 1
+
+        self._trial = None
+
+
+class GitHubOAuth:
+    """A client for the GitHub OAuth code exchange and user lookup, with its own connection pool.
+
+    Connections are kept alive between logins and DNS lookups are cached. Every attempt is bounded by ``timeout``
+    seconds. Transient failures are retried up to ``retries`` times with exponential backoff and full jitter, and
+    `CircuitBreaker` fails logins immediately while GitHub is down.
+
+    The code exchange is only retried when the connection could not be made or GitHub answered with ``429`` or ``5xx``,
+    since a code can only be exchanged once.
+
+    Parameters
+    ----------
+    client_id: str
+        The OAuth application client ID.
+    client_secret: str
+        The OAuth application client secret.
+    redirect: str
+        The redirect URI registered with the OAuth application.
+    token_url: str
+        The URL codes are exchanged for access tokens at. Point this, and ``api_url``, at a stub server for testing.
+    api_url: str
+        The base URL of the GitHub REST API.
+    timeout: float
+        The maximum amount of seconds a single attempt may take, including connecting.
+    connect_timeout: float
+        The maximum amount of seconds to wait for a connection.
+    retries: int
+        The amount of times a transient failure is retried.
+    backoff: float
+        The base amount of seconds to back off before a retry, doubled for every retry.
+    max_connections: int
+        The maximum amount of open connections.
+    keepalive_timeout: float
+        The amount of seconds an idle connection is kept open.
+    dns_ttl: int
+        The amount of seconds DNS lookups are cached.
+    breaker: CircuitBreaker | None
+        The circuit breaker. Defaults to one which opens after 5 failures, for 30 seconds.
+    """
+
+    RETRY_STATUSES: frozenset[int] = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        redirect: str,
+        *,
+        token_url: str = 'https://github.com/login/oauth/access_token',
+        api_url: str = 'https://api.github.com',
+        timeout: float = 10.0,
+        connect_timeout: float = 3.0,
+        retries: int = 2,
+        backoff: float = 0.25,
+        max_connections: int = 100,
+        keepalive_timeout: float = 30.0,
+        dns_ttl: int = 300,
+        breaker: CircuitBreaker | None = None,
+    ) -> None:
+        self.client_id: str = client_id
+        self.client_secret: str = client_secret
+        self.redirect: str = redirect
+
+        self.token_url: str = token_url
+        self.api_url: str = api_url.rstrip('/')
+
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.retries: int = retries
+        self.backoff: float = backoff
+        self.max_connections: int = max_connections
+        self.keepalive_timeout: float = keepalive_timeout
+        self.dns_ttl: int = dns_ttl
+        self.breaker: CircuitBreaker = breaker or CircuitBreaker()
+
+        self._session: aiohttp.ClientSession | None = None
+
+        self.requests: int = 0
+        self.retried: int = 0
+        self.failed: int = 0
+        self.rejected: int = 0
+        self.short_circuited: int = 0
+
+    @classmethod
+    def from_config(cls, data: dict[str, Any]) -> GitHubOAuth:
+        return cls(
+            data.get('github_id', ''),
+            data.get('github_secret', ''),
+            data.get('redirect', ''),
+            token_url=data.get('token_url', 'https://github.com/login/oauth/access_token'),
+            api_url=data.get('api_url', 'https://api.github.com'),
+            timeout=data.get('timeout', 10.0),
+            connect_timeout=data.get('connect_timeout', 3.0),
+            retries=data.get('retries', 2),
+            backoff=data.get('retry_backoff', 0.25),
+            max_connections=data.get('max_connections', 100),
+            keepalive_timeout=data.get('keepalive_timeout', 30.0),
+            dns_ttl=data.get('dns_ttl', 300),
+            breaker=CircuitBreaker(
+                threshold=data.get('breaker_threshold', 5), reset_after=data.get('breaker_reset', 30.0)
+            ),
+        )
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # Created lazily, as a ClientSession must be created inside the running event loop...
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                ttl_dns_cache=self.dns_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def authenticate(self, code: str) -> tuple[int, str]:
+        """Exchange an OAuth ``code`` and return the GitHub ID and name of the user it belongs to.
+
+        Raises `OAuthRejected` if the code is invalid, or `OAuthUnavailable` if GitHub can not be reached.
+        """
+        token: str = await self.exchange(code)
+        user: dict[str, Any] = await self.fetch_user(token)
+
+        return user['id'], user['name'] or user['login']
+
+    async def exchange(self, code: str) -> str:
+        data: dict[str, str] = {
+            'client_id': self.client_id,
+            'client_secret': self.client_secret,
+            'redirect_uri': self.redirect,
+            'grant_type': 'authorization_code',
+            'code': code,
+        }
+        headers: dict[str, str] = {'Accept': 'application/json'}
+
+        body: dict[str, Any] = await self._request('POST', self.token_url, idempotent=False, data=data, headers=headers)
+
+        try:
+            return body['access_token']
+        except KeyError:
+            self.rejected += 1
+            raise OAuthRejected(body.get('error_description') or body.get('error') or 'Bad code.') from None
+
+    async def fetch_user(self, token: str) -> dict[str, Any]:
+        headers: dict[str, str] = {'Authorization': f'Bearer {token}', 'Accept': 'application/vnd.github+json'}
+        return await self._request('GET', f'{self.api_url}/user', idempotent=True, headers=headers)
+
+    async def _request(self, method: str, url: str, *, idempotent: bool, **kwargs: Any) -> dict[str, Any]:
+        if not self.breaker.allow():
+            self.short_circuited += 1
+            raise OAuthUnavailable('GitHub is currently unavailable.', retry_after=self.breaker.retry_after())
+
+        attempt: int = 0
+        while True:
+            self.requests += 1
+
+            try:
+                async with self.session.request(method, url, **kwargs) as resp:
+                    if resp.status in self.RETRY_STATUSES:
+                        raise _RetryableStatus(resp.status)
+
+                    if resp.status >= 400:
+                        self.rejected += 1
+                        self.breaker.success()
+                        raise OAuthRejected(f'GitHub responded {resp.status} to {method} {url}.')
+
+                    body: dict[str, Any] = await resp.json(content_type=None)
+            except OAuthRejected:
+                raise
+            except (aiohttp.ClientError, TimeoutError, ValueError, _RetryableStatus) as e:
+                # Once a code exchange reached GitHub, the code may have been used and must not be sent again...
+                retryable: bool = idempotent or isinstance(e, (aiohttp.ClientConnectorError, _RetryableStatus))
+
+                if not retryable or attempt >= self.retries:
+                    self.failed += 1
+                    self.breaker.failure()
+
+                    LOGGER.warning('GitHub %s %s failed after %s attempts: %r', method, url, attempt + 1, e)
+                    retry_after: float = max(self.backoff, self.breaker.retry_after())
+                    raise OAuthUnavailable('GitHub could not be reached.', retry_after=retry_after) from e
+
+                attempt += 1
+                self.retried += 1
+
+                await asyncio.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+                continue
+
+            self.breaker.success()
+            return body
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'retried': self.retried,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'short_circuited': self.short_circuited,
+            'breaker': {'state': self.breaker.state, 'failures': self.breaker.failures, 'opened': self.breaker.opened},
+            'connections': len(self._session.connector._conns) if self._session and self._session.connector else 0,  # type: ignore
+        }
+
+
+class _RetryableStatus(Exception):
+    def __init__(self, status: int) -> None:
+        super().__init__(f'HTTP {status}')
+        self.status: int = status
@@ -0,0 +1,214 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import datetime
+import json
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    from starlette.datastructures import QueryParams
+
+    from .database.models import LogModel
+
+__all__ = ('LogCursor', 'LogQuery', 'ndjson')
+
+
+_EPOCH: datetime.datetime = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class LogCursor:
+    """An opaque position in a log listing, ordered by ``(accessed, id)``."""
+
+    __slots__ = ('accessed', 'id')
+
+    def __init__(self, accessed: datetime.datetime, id: int) -> None:
+        self.accessed: datetime.datetime = accessed
+        self.id: int = id
+
+    def __repr__(self) -> str:
+        return f'LogCursor(accessed={self.accessed.isoformat()}, id={self.id})'
+
+    def encode(self) -> str:
+        micros: int = (self.accessed - _EPOCH) // datetime.timedelta(microseconds=1)
+        raw: bytes = f'{micros}:{self.id}'.encode(encoding='UTF-8')
+
+        return base64.urlsafe_b64encode(raw).decode(encoding='UTF-8').rstrip('=')
+
+    @classmethod
+    def decode(cls, value: str) -> LogCursor:
+        padded: str = value + '=' * (-len(value) % 4)
+
+        try:
+            micros, id_ = base64.urlsafe_b64decode(padded).decode(encoding='UTF-8').split(':')
+            accessed = _EPOCH + datetime.timedelta(microseconds=int(micros))
+
+            return cls(accessed, int(id_))
+        except (binascii.Error, UnicodeDecodeError, ValueError, OverflowError):
+            raise ValueError(f'Invalid cursor: "{value}".') from None
+
+
+class LogQuery:
+    """Pagination, filtering and streaming options for a log listing, parsed from query parameters.
+
+    Parameters
+    ----------
+    limit: int | None
+        The maximum amount of logs to return. ``None`` returns every matching log.
+    before: LogCursor | None
+        Only return logs older than this cursor.
+    after: LogCursor | None
+        Only return logs newer than this cursor.
+    method: str | None
+        Only return logs with this HTTP method.
+    status: int | None
+        Only return logs with this response status code.
+    route: str | None
+        Only return logs whose route contains this string.
+    stream: bool
+        Whether the logs should be streamed as NDJSON instead of returned as a single page.
+    """
+
+    DEFAULT_LIMIT: int = 100
+    MAX_LIMIT: int = 1000
+
+    def __init__(
+        self,
+        *,
+        limit: int | None = DEFAULT_LIMIT,
+        before: LogCursor | None = None,
+        after: LogCursor | None = None,
+        method: str | None = None,
+        status: int | None = None,
+        route: str | None = None,
+        stream: bool = False,
+    ) -> None:
+        self.limit: int | None = limit
+        self.before: LogCursor | None = before
+        self.after: LogCursor | None = after
+        self.method: str | None = method
+        self.status: int | None = status
+        self.route: str | None = route
+        self.stream: bool = stream
+
+    @classmethod
+    def from_params(cls, params: QueryParams, *, stream: bool = False) -> LogQuery:
+        """Parse the query from request query parameters. Raises `ValueError` with a client facing message."""
+        stream = stream or params.get('stream', '').lower() in ('1', 'true')
+
+        limit: int | None = None if stream else cls.DEFAULT_LIMIT
+        if 'limit' in params:
+            try:
+                limit = int(params['limit'])
+            except ValueError:
+                raise ValueError('limit must be an integer.') from None
+
+            if limit < 1 or (not stream and limit > cls.MAX_LIMIT):
+                raise ValueError(f'limit must be between 1 and {cls.MAX_LIMIT}.')
+
+        before: LogCursor | None = LogCursor.decode(params['before']) if 'before' in params else None
+        after: LogCursor | None = LogCursor.decode(params['after']) if 'after' in params else None
+
+        if before and after:
+            raise ValueError('Only one of before or after may be provided.')
+
+        status: int | None = None
+        if 'status' in params:
+            try:
+                status = int(params['status'])
+            except ValueError:
+                raise ValueError('status must be an integer.') from None
+
+        method: str | None = params.get('method')
+        return cls(
+            limit=limit,
+            before=before,
+            after=after,
+            method=method.upper() if method else None,
+            status=status,
+            route=params.get('route') or None,
+            stream=stream,
+        )
+
+    def build(self, column: str, value: int) -> tuple[str, list[Any]]:
+        """Build the SQL query and arguments to fetch the logs matching this query, where ``column`` is ``value``.
+
+        Rows are ordered newest first, unless ``after`` is set, in which case they are ordered oldest first, so the
+        rows closest to the cursor are returned. Callers should reverse those to keep a newest first order.
+        """
+        args: list[Any] = [value]
+        clauses: list[str] = [f'{column} = $1']
+
+        def arg(value: Any) -> str:
+            args.append(value)
+            return f'${len(args)}'
+
+        if self.before:
+            clauses.append(f'(accessed, id) < ({arg(self.before.accessed)}, {arg(self.before.id)})')
+        elif self.after:
+            clauses.append(f'(accessed, id) > ({arg(self.after.accessed)}, {arg(self.after.id)})')
+
+        if self.method:
+            clauses.append(f'method = {arg(self.method)}')
+
+        if self.status is not None:
+            clauses.append(f'response_code = {arg(self.status)}')
+
+        if self.route:
+            clauses.append(f'strpos(route, {arg(self.route)}) > 0')
+
+        order: str = 'ASC' if self.after else 'DESC'
+        query: str = f'SELECT * FROM logs WHERE {" AND ".join(clauses)} ORDER BY accessed {order}, id {order}'
+
+        if self.limit is not None:
+            query += f' LIMIT {arg(self.limit)}'
+
+        return query, args
+
+    def page(self, logs: list[LogModel]) -> dict[str, Any]:
+        """Build the JSON response body for a page of logs, ordered newest first.
+
+        ``before`` is the cursor to request older logs with, and ``after`` is the cursor to request newer logs with.
+        An empty page returns the cursor it was requested with as both, so a client which paged past either end can
+        page back, or poll it for newer logs.
+        """
+        before: str | None = None
+        after: str | None = None
+
+        if logs:
+            before = LogCursor(logs[-1].timestamp, logs[-1].id).encode()
+            after = LogCursor(logs[0].timestamp, logs[0].id).encode()
+        elif cursor := self.before or self.after:
+            before = after = cursor.encode()
+
+        return {'logs': [log.as_dict() for log in logs], 'before': before, 'after': after, 'limit': self.limit}
+
+
+async def ndjson(logs: AsyncIterator[LogModel]) -> AsyncIterator[str]:
+    """Encode an async iterator of logs as newline delimited JSON, one log per line."""
+    async for log in logs:
+        yield json.dumps(log.as_dict(), separators=(',', ':'), ensure_ascii=False) + '\n'
@@ -0,0 +1,91 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import ipaddress
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from starlette.requests import HTTPConnection
+
+__all__ = ('TrustedProxies',)
+
+
+Network = ipaddress.IPv4Network | ipaddress.IPv6Network
+
+
+class TrustedProxies:
+    """Resolves the address of the client which made a request, through any trusted reverse proxies in front of us.
+
+    ``X-Forwarded-For`` is only read when the connection comes from a trusted proxy, as anyone else can send any value.
+    Each trusted proxy appends the address it received the request from, so the header is walked from the right and
+    the first address which is not a trusted proxy is the client. Everything left of it was sent by the client.
+
+    Parameters
+    ----------
+    networks: Iterable[str]
+        The addresses or CIDR ranges of the trusted proxies, such as ``"10.0.0.0/8"``.
+    """
+
+    def __init__(self, networks: Iterable[str] = ()) -> None:
+        self.networks: list[Network] = [ipaddress.ip_network(n, strict=False) for n in networks]
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> TrustedProxies:
+        return cls(config.get('trusted_proxies', []))
+
+    def trusted(self, ip: str) -> bool:
+        if not self.networks:
+            return False
+
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+
+        return any(address in network for network in self.networks)
+
+    def client_ip(self, conn: HTTPConnection) -> str | None:
+        """The address of the client, or of the connection's peer when it is not a trusted proxy."""
+        peer: str | None = getattr(conn.client, 'host', None)
+        if peer is None or not self.trusted(peer):
+            return peer
+
+        hops: list[str] = [h.strip() for h in conn.headers.get('X-Forwarded-For', '').split(',') if h.strip()]
+
+        for hop in reversed(hops):
+            if self.trusted(hop):
+                continue
+
+            try:
+                ipaddress.ip_address(hop)
+            except ValueError:
+                # Not appended by a proxy of ours, so nothing after this point can be relied on...
+                return peer
+
+            return hop
+
+        # Every hop is a trusted proxy, so the left-most is the closest we can get to the client...
+        return hops[0] if hops else peer
@@ -0,0 +1,315 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import asyncio
+import collections
+import logging
+import math
+import time
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from .events import EventBus
+
+__all__ = ('RateLimit', 'RateLimitResult', 'RateLimiter')
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+class RateLimit:
+    """Allows ``rate`` requests every ``per`` seconds, with bursts of up to ``burst`` requests."""
+
+    __slots__ = ('burst', 'per', 'rate', 'refill')
+
+    def __init__(self, rate: int, per: float, *, burst: int | None = None) -> None:
+        self.rate: int = rate
+        self.per: float = per
+        self.burst: int = burst or rate
+
+        # Tokens added back to the bucket each second...
+        self.refill: float = rate / per
+
+    def __repr__(self) -> str:
+        return f'RateLimit(rate={self.rate}, per={self.per}, burst={self.burst})'
+
+    @classmethod
+    def from_config(cls, data: dict[str, Any]) -> RateLimit | None:
+        """Create a limit from a config table. A ``rate`` of ``0`` means unlimited, and returns ``None``."""
+        rate: int = data.get('rate', 0)
+        if rate <= 0:
+            return None
+
+        return cls(rate, data.get('per', 60), burst=data.get('burst'))
+
+
+class RateLimitResult:
+    __slots__ = ('allowed', 'limit', 'remaining', 'reset', 'retry_after')
+
+    def __init__(self, *, allowed: bool, limit: int, remaining: int, reset: float, retry_after: float) -> None:
+        self.allowed: bool = allowed
+        self.limit: int = limit
+        self.remaining: int = remaining
+        self.reset: float = reset
+        self.retry_after: float = retry_after
+
+    def headers(self) -> dict[str, str]:
+        headers: dict[str, str] = {
+            'X-RateLimit-Limit': str(self.limit),
+            'X-RateLimit-Remaining': str(self.remaining),
+            'X-RateLimit-Reset': str(math.ceil(self.reset)),
+        }
+
+        if not self.allowed:
+            headers['Retry-After'] = str(math.ceil(self.retry_after))
+
+        return headers
+
+
+class _Bucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, tokens: float, updated: float) -> None:
+        self.tokens: float = tokens
+        self.updated: float = updated
+
+
+class RateLimiter:
+    """In-memory token bucket rate limiter, keyed by the caller and, optionally, the route.
+
+    Every request takes a token from the caller's bucket, with the limit of their most privileged scope. Requests to
+    a path starting with a configured route prefix also take a token from a separate bucket for that route.
+
+    At most ``max_buckets`` buckets are kept. The least recently used bucket is evicted to make room, which is the
+    same as it being full again, for any bucket idle long enough to have refilled.
+
+    When ``sync`` is enabled and an `EventBus` is attached, the tokens taken on this process are published to the other
+    processes every ``sync_interval`` seconds, and taken from their buckets as well.
+
+    Parameters
+    ----------
+    limits: dict[str, RateLimit | None]
+        Limits by scope name. ``default`` applies to unauthenticated callers, and ``authenticated`` to any token.
+        ``None`` means unlimited.
+    routes: dict[str, RateLimit | None]
+        Limits by route path prefix, in addition to the scope limit. The longest matching prefix applies.
+    max_buckets: int
+        The maximum amount of buckets kept in memory.
+    """
+
+    # Scopes which are given their own limits, from most to least privileged...
+    SCOPES: tuple[str, ...] = ('admin', 'member', 'verified')
+
+    def __init__(
+        self,
+        *,
+        limits: dict[str, RateLimit | None],
+        routes: dict[str, RateLimit | None] | None = None,
+        max_buckets: int = 100_000,
+        enabled: bool = True,
+        sync: bool = False,
+        sync_interval: float = 1.0,
+    ) -> None:
+        self.limits: dict[str, RateLimit | None] = limits
+        self.routes: list[tuple[str, RateLimit | None]] = sorted((routes or {}).items(), key=lambda r: -len(r[0]))
+        self.max_buckets: int = max_buckets
+        self.enabled: bool = enabled
+        self.sync: bool = sync
+        self.sync_interval: float = sync_interval
+
+        self._buckets: collections.OrderedDict[str, _Bucket] = collections.OrderedDict()
+        self._pending: dict[str, int] = {}
+        self._events: EventBus | None = None
+        self._task: asyncio.Task[None] | None = None
+
+        self.allowed: int = 0
+        self.limited: int = 0
+        self.evictions: int = 0
+        self.synced: int = 0
+
+    @classmethod
+    def from_config(cls, data: dict[str, Any]) -> RateLimiter:
+        limits: dict[str, RateLimit | None] = {k: RateLimit.from_config(v) for k, v in data.get('scopes', {}).items()}
+        routes: dict[str, RateLimit | None] = {k: RateLimit.from_config(v) for k, v in data.get('routes', {}).items()}
+
+        return cls(
+            limits=limits,
+            routes=routes,
+            max_buckets=data.get('max_buckets', 100_000),
+            enabled=data.get('enabled', False),
+            sync=data.get('sync', False),
+            sync_interval=data.get('sync_interval', 1.0),
+        )
+
+    def limit_for(self, scopes: Iterable[str], *, authenticated: bool) -> RateLimit | None:
+        """Return the limit for a caller with ``scopes``, ``None`` if they are unlimited."""
+        scopes = set(scopes)
+
+        for scope in self.SCOPES:
+            if scope in scopes and scope in self.limits:
+                return self.limits[scope]
+
+        if authenticated and 'authenticated' in self.limits:
+            return self.limits['authenticated']
+
+        return self.limits.get('default')
+
+    def route_for(self, path: str) -> tuple[str, RateLimit | None] | None:
+        for prefix, limit in self.routes:
+            if path.startswith(prefix):
+                return prefix, limit
+
+        return None
+
+    def hit(self, key: str, scopes: Iterable[str], path: str, *, authenticated: bool) -> RateLimitResult | None:
+        """Take a token for a request by ``key`` to ``path``. Returns ``None`` if the request is not limited at all.
+
+        Tokens are only taken if every bucket the request applies to has one available.
+        """
+        now: float = time.monotonic()
+        checks: list[tuple[str, RateLimit]] = []
+
+        limit: RateLimit | None = self.limit_for(scopes, authenticated=authenticated)
+        if limit:
+            checks.append((key, limit))
+
+        route: tuple[str, RateLimit | None] | None = self.route_for(path)
+        if route and route[1]:
+            checks.append((f'{key}:{route[0]}', route[1]))
+
+        if not checks:
+            return None
+
+        results: list[tuple[str, RateLimit, _Bucket, RateLimitResult]] = []
+        for bucket_key, bucket_limit in checks:
+            bucket: _Bucket = self._bucket(bucket_key, bucket_limit, now)
+            results.append((bucket_key, bucket_limit, bucket, self._check(bucket, bucket_limit)))
+
+        allowed: bool = all(result.allowed for *_, result in results)
+
+        if allowed:
+            for bucket_key, bucket_limit, bucket, result in results:
+                bucket.tokens -= 1
+                result.remaining = max(0, math.floor(bucket.tokens))
+                result.reset = (bucket_limit.burst - bucket.tokens) / bucket_limit.refill
+
+                if self.sync:
+                    self._pending[bucket_key] = self._pending.get(bucket_key, 0) + 1
+
+            self.allowed += 1
+        else:
+            self.limited += 1
+
+        # Report the most restrictive bucket...
+        return min((r for *_, r in results), key=lambda r: (r.allowed, r.remaining))
+
+    def _bucket(self, key: str, limit: RateLimit, now: float) -> _Bucket:
+        bucket: _Bucket | None = self._buckets.get(key)
+
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(limit.burst, now)
+
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._buckets.move_to_end(key)
+
+            bucket.tokens = min(limit.burst, bucket.tokens + (now - bucket.updated) * limit.refill)
+            bucket.updated = now
+
+        return bucket
+
+    def _check(self, bucket: _Bucket, limit: RateLimit) -> RateLimitResult:
+        allowed: bool = bucket.tokens >= 1
+
+        return RateLimitResult(
+            allowed=allowed,
+            limit=limit.burst,
+            remaining=max(0, math.floor(bucket.tokens)),
+            reset=(limit.burst - bucket.tokens) / limit.refill,
+            retry_after=0.0 if allowed else (1 - bucket.tokens) / limit.refill,
+        )
+
+    def attach(self, events: EventBus) -> None:
+        """Share the tokens taken on this process with other processes over ``events``, when sync is enabled."""
+        self._events = events
+
+        if self.sync:
+            events.subscribe('ratelimit.sync', self._remote_hits)
+
+    async def start(self) -> None:
+        if self.sync and self._events is not None and self._task is None:
+            self._task = asyncio.create_task(self._run_sync(), name='RateLimiter:sync')
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+        self._task = None
+
+    async def _run_sync(self) -> None:
+        assert self._events
+
+        while True:
+            await asyncio.sleep(self.sync_interval)
+
+            if not self._pending:
+                continue
+
+            pending, self._pending = self._pending, {}
+
+            try:
+                await self._events.publish('ratelimit.sync', pending)
+            except Exception as e:
+                LOGGER.warning('Failed to sync %s rate limit buckets: %s', len(pending), e)
+
+    async def _remote_hits(self, data: dict[str, int]) -> None:
+        # Buckets which have not been used on this process are skipped, as their limit is not known here...
+        for key, taken in data.items():
+            bucket: _Bucket | None = self._buckets.get(key)
+
+            if bucket is not None:
+                bucket.tokens -= taken
+                self.synced += taken
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'buckets': len(self._buckets),
+            'max_buckets': self.max_buckets,
+            'allowed': self.allowed,
+            'limited': self.limited,
+            'evictions': self.evictions,
+            'sync': self.sync,
+            'synced': self.synced,
+        }
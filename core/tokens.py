@@ -20,14 +20,28 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
+from __future__ import annotations
+
 import base64
+import binascii
+import datetime
+import hashlib
+import hmac
 import secrets
+import struct
+import time
+from typing import Any
 
-__all__ = ('EPOCH', 'generate_token', 'id_from_token')
+__all__ = ('EPOCH', 'TokenClaims', 'TokenFlags', 'TokenSigner', 'generate_token', 'id_from_token', 'token_digest')
 
 
 EPOCH: int = 1686613974737  # 2023-06-13 09:52:54.737703 * 1000 (Milliseconds) UTC
 
+SIGNED_PREFIX: str = 'PAPI2-'
+
+# uid, tid (0 for bearer tokens), flags, issued (milliseconds since EPOCH), nonce...
+_PAYLOAD: struct.Struct = struct.Struct('>QQBQ16s')
+
 
 def generate_token(user_id: int) -> str:
     prefix: str = base64.urlsafe_b64encode(str(user_id).encode(encoding='UTF-8')).decode(encoding='UTF-8')
@@ -39,6 +53,10 @@ def generate_token(user_id: int) -> str:
 
 
 def id_from_token(token: str) -> int | None:
+    if token.startswith(SIGNED_PREFIX):
+        claims: TokenClaims | None = TokenClaims.decode(token)
+        return claims.uid if claims else None
+
     try:
         encoded: str = token.removeprefix('PAPI-').split('.')[0]
     except IndexError:
@@ -50,3 +68,186 @@ def id_from_token(token: str) -> int | None:
         return None
 
     return id_
+
+
+def token_digest(token: str) -> bytes:
+    """The SHA-256 digest of a token, which identifies it without keeping the token itself."""
+    return hashlib.sha256(token.encode()).digest()
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+class TokenFlags:
+    APPLICATION = 1 << 0
+    ADMIN = 1 << 1
+    VERIFIED = 1 << 2
+    WEBSOCKETS = 1 << 3
+    MEMBER = 1 << 4
+
+
+class TokenClaims:
+    """The identity carried by a signed token: who it belongs to, what it may do, and when it was issued."""
+
+    __slots__ = ('flags', 'issued', 'key', 'tid', 'uid')
+
+    def __init__(self, *, uid: int, tid: int | None, flags: int, issued: int, key: str) -> None:
+        self.uid: int = uid
+        self.tid: int | None = tid
+        self.flags: int = flags
+        self.issued: int = issued
+        self.key: str = key
+
+    def __repr__(self) -> str:
+        return f'TokenClaims(uid={self.uid}, tid={self.tid}, flags={self.flags}, issued={self.issued})'
+
+    @classmethod
+    def decode(cls, token: str) -> TokenClaims | None:
+        """Read the claims of a signed token *without* verifying its signature."""
+        try:
+            key, payload, _ = token.removeprefix(SIGNED_PREFIX).split('.')
+            uid, tid, flags, issued, _ = _PAYLOAD.unpack(_b64decode(payload))
+        except (ValueError, binascii.Error, struct.error):
+            return None
+
+        return cls(uid=uid, tid=tid or None, flags=flags, issued=issued, key=key)
+
+    @property
+    def application(self) -> bool:
+        return bool(self.flags & TokenFlags.APPLICATION)
+
+    @property
+    def issued_at(self) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp((self.issued + EPOCH) / 1000, tz=datetime.timezone.utc)
+
+    def scopes(self) -> list[str]:
+        scopes: list[str] = []
+
+        if not self.application:
+            scopes.append('bearer')
+        else:
+            scopes.append('application')
+
+            if self.flags & TokenFlags.VERIFIED:
+                scopes.append('verified')
+            if self.flags & TokenFlags.WEBSOCKETS:
+                scopes.append('websockets')
+            if self.flags & TokenFlags.MEMBER:
+                scopes.append('member')
+
+        if self.flags & TokenFlags.ADMIN:
+            scopes.append('admin')
+
+        return scopes
+
+
+class TokenSigner:
+    """Issues and verifies tokens signed with HMAC-SHA256, which can be checked without a database lookup.
+
+    Signed tokens look like ``PAPI2-<key>.<payload>.<signature>``, where the payload holds `TokenClaims`. Tokens are
+    signed with the ``current`` key, and verified with whichever of ``keys`` they name. Keys are rotated by adding a
+    new key, making it current, and removing the old key once the tokens it signed are no longer needed.
+
+    Flags are fixed when a token is issued, so a token must be issued again for changes to the user or application
+    to apply to it.
+
+    Parameters
+    ----------
+    keys: dict[str, str]
+        Key IDs mapped to secrets of at least 32 characters. Key IDs must not contain ``.``.
+    current: str | None
+        The ID of the key new tokens are signed with. When ``None``, `enabled` is ``False``.
+    """
+
+    MIN_SECRET: int = 32
+
+    def __init__(self, keys: dict[str, str], *, current: str | None = None) -> None:
+        for key, secret in keys.items():
+            if not key or '.' in key:
+                raise ValueError(f'Token signing key ID "{key}" must not be empty or contain ".".')
+            if len(secret) < self.MIN_SECRET:
+                raise ValueError(f'Token signing key "{key}" must be at least {self.MIN_SECRET} characters long.')
+
+        if current is not None and current not in keys:
+            raise ValueError(f'Token signing key "{current}" is not one of the configured keys.')
+
+        self._keys: dict[str, bytes] = {k: v.encode() for k, v in keys.items()}
+        self.current: str | None = current
+
+        self.issued: int = 0
+        self.verified: int = 0
+        self.rejected: int = 0
+
+    @classmethod
+    def from_config(cls, data: dict[str, Any]) -> TokenSigner:
+        return cls(data.get('keys', {}), current=data.get('signing_key') or None)
+
+    @property
+    def enabled(self) -> bool:
+        """Whether new tokens are signed. Signed tokens are verified as long as their key is configured."""
+        return self.current is not None
+
+    @property
+    def keys(self) -> list[str]:
+        """The IDs of the keys tokens are verified with."""
+        return sorted(self._keys)
+
+    @staticmethod
+    def is_signed(token: str) -> bool:
+        return token.startswith(SIGNED_PREFIX)
+
+    def _signature(self, secret: bytes, message: str) -> bytes:
+        return hmac.new(secret, message.encode(), hashlib.sha256).digest()
+
+    def sign(self, *, uid: int, tid: int | None = None, flags: int = 0, issued: int | None = None) -> str:
+        if self.current is None:
+            raise RuntimeError('No token signing key is configured.')
+
+        if issued is None:
+            issued = int(time.time() * 1000) - EPOCH
+
+        if tid is not None:
+            flags |= TokenFlags.APPLICATION
+
+        payload: bytes = _PAYLOAD.pack(uid, tid or 0, flags, issued, secrets.token_bytes(16))
+        message: str = f'{SIGNED_PREFIX}{self.current}.{_b64encode(payload)}'
+
+        self.issued += 1
+        return f'{message}.{_b64encode(self._signature(self._keys[self.current], message))}'
+
+    def verify(self, token: str) -> TokenClaims | None:
+        """Return the claims of ``token`` if it is a signed token with a valid signature, otherwise ``None``."""
+        message, _, signature = token.rpartition('.')
+        claims: TokenClaims | None = TokenClaims.decode(token)
+
+        secret: bytes | None = self._keys.get(claims.key) if claims else None
+        if claims is None or secret is None:
+            self.rejected += 1
+            return None
+
+        try:
+            valid: bool = hmac.compare_digest(self._signature(secret, message), _b64decode(signature))
+        except (ValueError, binascii.Error):
+            valid = False
+
+        if not valid:
+            self.rejected += 1
+            return None
+
+        self.verified += 1
+        return claims
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'current': self.current,
+            'keys': self.keys,
+            'issued': self.issued,
+            'verified': self.verified,
+            'rejected': self.rejected,
+        }
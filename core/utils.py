@@ -22,15 +22,20 @@ SOFTWARE.
 """
 import asyncio
 import inspect
+import time
 from collections.abc import Callable, Coroutine, Iterator
 from typing import Any, Self, TypeAlias
 
 from starlette.applications import Starlette
+from starlette.authentication import has_required_scope
+from starlette.exceptions import HTTPException
 from starlette.requests import Request
 from starlette.responses import Response
 from starlette.routing import Route
 from starlette.types import Receive, Scope, Send
 
+from .metrics import Histogram, metrics
+
 __all__ = (
     'route',
     'View',
@@ -43,6 +48,10 @@ __all__ = (
 
 ResponseType: TypeAlias = Coroutine[Any, Any, Response]
 
+_PHASE_TIME: Histogram = metrics.histogram(
+    'papi_request_phase_seconds', 'Time spent in each phase of handling a request.', labels=('route', 'phase')
+)
+
 
 class _Route:
     def __init__(self, **kwargs: Any) -> None:
@@ -50,19 +59,51 @@ class _Route:
         self._coro: Callable[[Any, Request], ResponseType] = kwargs['coro']
         self._methods: list[str] = kwargs['methods']
         self._prefix: bool = kwargs['prefix']
+        self._scopes: tuple[str, ...] = tuple(kwargs['scopes'])
 
         self._view: View | None = None
+        self._name: str = self._coro.__name__
+
+    @property
+    def name(self) -> str:
+        """The name of this route, as ``ViewName.coroutine``. Set when the View is created."""
+        return self._name
+
+    @property
+    def scopes(self) -> tuple[str, ...]:
+        """The scopes a request needs for this route. Requests are only authenticated for routes which declare some."""
+        return self._scopes
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         request = Request(scope, receive, send)
+        start: float = time.perf_counter()
+
+        if self._scopes and not has_required_scope(request, self._scopes):
+            raise HTTPException(status_code=403)
 
         response = await self._coro(self._view, request)
+        handled: float = time.perf_counter()
+
+        # Responses such as JSONResponse encode their body when built, so that is part of the handler phase. Sending
+        # is where streaming responses do their work...
         await response(scope, receive, send)
+        sent: float = time.perf_counter()
 
         await request.app.database.add_log(request=request, response=response)
+        logged: float = time.perf_counter()
 
+        auth: float | None = getattr(request.state, 'auth_seconds', None)
+        if auth is not None:
+            _PHASE_TIME.observe(auth, self._name, 'auth')
 
-def route(path: str, /, *, methods: list[str] = ['GET'], prefix: bool = True) -> Callable[..., _Route]:
+        _PHASE_TIME.observe(handled - start, self._name, 'handler')
+        _PHASE_TIME.observe(sent - handled, self._name, 'send')
+        _PHASE_TIME.observe(logged - sent, self._name, 'log_write')
+
+
+def route(
+    path: str, /, *, methods: list[str] = ['GET'], prefix: bool = True, scopes: list[str] | None = None
+) -> Callable[..., _Route]:
     """Decorator which allows a coroutine to be turned into a `starlette.routing.Route` inside a `core.View`.
 
     Parameters
@@ -73,6 +114,9 @@ def route(path: str, /, *, methods: list[str] = ['GET'], prefix: bool = True) ->
         The allowed methods for this route. Defaults to ``['GET']``.
     prefix: bool
         Whether the route path should be prefixed with the View class name. Defaults to True.
+    scopes: list[str] | None
+        The scopes required to use this route, such as ``['bearer']``. Requests without them are rejected with ``403``.
+        Routes without scopes never authenticate the request. Defaults to None.
     """
 
     def decorator(coro: Callable[[Any, Request], ResponseType]) -> _Route:
@@ -83,7 +127,7 @@ def route(path: str, /, *, methods: list[str] = ['GET'], prefix: bool = True) ->
         if coro.__name__.lower() in disallowed:
             raise ValueError(f'Route callback function must not be named any: {", ".join(disallowed)}')
 
-        return _Route(path=path, coro=coro, methods=methods, prefix=prefix)
+        return _Route(path=path, coro=coro, methods=methods, prefix=prefix, scopes=scopes or ())
 
     return decorator
 
@@ -121,6 +165,7 @@ class View:
 
         for _, member in inspect.getmembers(self, predicate=lambda m: isinstance(m, _Route)):
             member._view = self
+            member._name = f'{name}.{member._coro.__name__}'
             path: str = member._path
 
             if member._prefix:
@@ -133,7 +178,7 @@ class View:
                 setattr(member, method, member._coro)
 
             self.__routes__.append(
-                Route(path=path, endpoint=member, methods=member._methods, name=f'{name}.{member._coro.__name__}')
+                Route(path=path, endpoint=member, methods=member._methods, name=member._name)
             )
 
         return self
@@ -221,6 +266,10 @@ class WebsocketCloseCodes:
     NORMAL: int = 1000
     ABNORMAL: int = 1006
 
+    # Application defined...
+    BANNED: int = 4003
+    SLOW_CONSUMER: int = 4008
+
 
 class WebsocketOPCodes:
 
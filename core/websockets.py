@@ -0,0 +1,362 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import secrets
+import sys
+from typing import TYPE_CHECKING, Any, TypeAlias
+
+from .utils import WebsocketCloseCodes
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from starlette.websockets import WebSocket
+
+__all__ = ('BroadcastResult', 'ConnectionRegistry', 'EncodedEvent', 'WebsocketConnection')
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+# Either a JSON serialisable dict, or an already encoded JSON text frame...
+Message: TypeAlias = dict[str, Any] | str
+
+
+def _dumps(data: Any) -> str:
+    # Matches the encoding used by `starlette.websockets.WebSocket.send_json`...
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+
+
+class EncodedEvent:
+    """A websocket event envelope which is JSON encoded once and shared by every recipient.
+
+    The per user ``user_id`` field is spliced onto the end of the encoded envelope by `frame`, instead of encoding
+    the whole event again for each recipient.
+
+    Parameters
+    ----------
+    envelope: dict[str, Any]
+        The event fields sent to every recipient. Must not contain ``user_id``.
+    payload: str | None
+        Optional already encoded JSON, added to the envelope as the ``payload`` field without being decoded.
+    """
+
+    __slots__ = ('_prefix',)
+
+    def __init__(self, envelope: dict[str, Any], *, payload: str | None = None) -> None:
+        if 'user_id' in envelope:
+            raise ValueError('EncodedEvent envelope must not contain "user_id".')
+
+        encoded: str = _dumps(envelope)[:-1]
+
+        if payload is not None:
+            encoded += f'{"," if envelope else ""}"payload":{payload}'
+
+        self._prefix: str = f'{encoded}{"," if encoded != "{" else ""}"user_id":'
+
+    def frame(self, user_id: int) -> str:
+        """Return the complete JSON text frame for ``user_id``."""
+        return f'{self._prefix}{user_id}}}'
+
+
+class BroadcastResult:
+    """Tracks the delivery of a single broadcast to every targeted websocket connection.
+
+    ``queued`` and ``dropped`` are final once the broadcast has been enqueued. ``delivered`` and ``failed`` are updated
+    by each connection's writer as the message is sent.
+    """
+
+    def __init__(self) -> None:
+        self.subscribers: int = 0
+        self.queued: int = 0
+        self.dropped: int = 0
+        self.delivered: int = 0
+        self.failed: int = 0
+
+        self._done: asyncio.Event = asyncio.Event()
+
+    def _check(self) -> None:
+        if self.delivered + self.failed >= self.queued:
+            self._done.set()
+
+    def _mark_delivered(self) -> None:
+        self.delivered += 1
+        self._check()
+
+    def _mark_failed(self) -> None:
+        self.failed += 1
+        self._check()
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait up to ``timeout`` seconds for every queued message to be sent. Returns whether they all were."""
+        self._check()
+
+        if timeout <= 0:
+            return self._done.is_set()
+
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout=timeout)
+        except TimeoutError:
+            return False
+
+        return True
+
+    def as_dict(self) -> dict[str, int]:
+        return {
+            'subscribers': self.subscribers,
+            'queued': self.queued,
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+            'failed': self.failed,
+        }
+
+
+class WebsocketConnection:
+    """A connected websocket with its own bounded outbound queue and writer task.
+
+    Sending only enqueues a message, so a slow client never delays delivery to any other client. A connection whose
+    queue overflows is closed with `WebsocketCloseCodes.SLOW_CONSUMER`.
+
+    Parameters
+    ----------
+    websocket: starlette.websockets.WebSocket
+        The accepted websocket.
+    uid: int
+        The ID of the user who owns this connection.
+    queue_size: int
+        The maximum amount of messages waiting to be sent before the connection is considered too slow.
+    """
+
+    __slots__ = ('_closer', '_queue', '_writer', 'closed', 'id', 'sent', 'subscriptions', 'uid', 'websocket')
+
+    def __init__(self, websocket: WebSocket, *, uid: int, queue_size: int = 256) -> None:
+        self.websocket: WebSocket = websocket
+        self.uid: int = uid
+        self.id: str = secrets.token_urlsafe(8)
+
+        # Maintained by ConnectionRegistry...
+        self.subscriptions: set[str] = set()
+
+        self._queue: asyncio.Queue[tuple[Message, BroadcastResult | None]] = asyncio.Queue(maxsize=queue_size)
+        self._writer: asyncio.Task[None] | None = None
+        self._closer: asyncio.Task[None] | None = None
+
+        self.closed: bool = False
+        self.sent: int = 0
+
+    def __repr__(self) -> str:
+        return f'WebsocketConnection(id={self.id}, uid={self.uid}, queued={self._queue.qsize()})'
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write(), name=f'WebsocketConnection:{self.id}')
+
+    def send(self, message: Message, result: BroadcastResult | None = None) -> bool:
+        """Queue a message to be sent to this websocket. Returns whether the message was queued.
+
+        If the queue is full, the connection is evicted as a slow consumer.
+        """
+        if self.closed:
+            return False
+
+        try:
+            self._queue.put_nowait((message, result))
+        except asyncio.QueueFull:
+            LOGGER.info('Evicting slow websocket consumer: uid=%s id=%s', self.uid, self.id)
+
+            self.evict(WebsocketCloseCodes.SLOW_CONSUMER)
+            return False
+
+        return True
+
+    def evict(self, code: int) -> None:
+        """Stop sending to this websocket and close it with ``code`` in the background."""
+        if self.closed:
+            return
+
+        self.stop()
+        self._closer = asyncio.create_task(self._close(code))
+
+    def stop(self) -> None:
+        """Stop the writer and fail any messages still waiting to be sent."""
+        self.closed = True
+
+        if self._writer is not None:
+            self._writer.cancel()
+
+        while not self._queue.empty():
+            _, result = self._queue.get_nowait()
+            if result is not None:
+                result._mark_failed()  # pyright: ignore [reportPrivateUsage]
+
+    async def _close(self, code: int) -> None:
+        try:
+            await self.websocket.close(code=code)
+        except Exception as e:
+            LOGGER.debug('Failed to close websocket for "%s": %s', self.uid, e)
+
+    async def _write(self) -> None:
+        while True:
+            message, result = await self._queue.get()
+
+            try:
+                if isinstance(message, str):
+                    await self.websocket.send_text(message)
+                else:
+                    await self.websocket.send_json(data=message)
+            except asyncio.CancelledError:
+                if result is not None:
+                    result._mark_failed()  # pyright: ignore [reportPrivateUsage]
+
+                raise
+            except Exception as e:
+                LOGGER.debug('Failed to send payload to a websocket for "%s": %s', self.uid, e)
+
+                if result is not None:
+                    result._mark_failed()  # pyright: ignore [reportPrivateUsage]
+
+                self.stop()
+                return
+
+            self.sent += 1
+            if result is not None:
+                result._mark_delivered()  # pyright: ignore [reportPrivateUsage]
+
+
+class ConnectionRegistry:
+    """Indexes the websocket connections of this process by ID, user and subscription.
+
+    Subscriptions belong to each connection, and every index is updated in constant time when a connection is added,
+    subscribes, unsubscribes or is removed.
+
+    Parameters
+    ----------
+    topics: Iterable[str]
+        The subscriptions connections are allowed to subscribe to.
+    """
+
+    def __init__(self, topics: Iterable[str]) -> None:
+        self._connections: dict[str, WebsocketConnection] = {}
+        self._users: dict[int, dict[str, WebsocketConnection]] = {}
+        self._topics: dict[str, set[WebsocketConnection]] = {topic: set() for topic in topics}
+
+    def __len__(self) -> int:
+        return len(self._connections)
+
+    def __iter__(self) -> Iterator[WebsocketConnection]:
+        return iter(self._connections.values())
+
+    @property
+    def topics(self) -> tuple[str, ...]:
+        return tuple(self._topics)
+
+    def get(self, id: str) -> WebsocketConnection | None:
+        return self._connections.get(id)
+
+    def for_user(self, uid: int) -> list[WebsocketConnection]:
+        return list(self._users.get(uid, {}).values())
+
+    def subscribers(self, topic: str) -> list[WebsocketConnection]:
+        """Return the connections subscribed to ``topic``, as a list which is safe to use while connections change."""
+        return list(self._topics.get(topic, ()))
+
+    def add(self, connection: WebsocketConnection) -> None:
+        self._connections[connection.id] = connection
+        self._users.setdefault(connection.uid, {})[connection.id] = connection
+
+    def remove(self, connection: WebsocketConnection) -> None:
+        """Remove a connection and all of its subscriptions. This is safe to call more than once."""
+        if self._connections.pop(connection.id, None) is None:
+            return
+
+        for topic in connection.subscriptions:
+            self._topics[topic].discard(connection)
+
+        connection.subscriptions.clear()
+
+        user: dict[str, WebsocketConnection] = self._users[connection.uid]
+        del user[connection.id]
+
+        if not user:
+            del self._users[connection.uid]
+
+    def subscribe(self, connection: WebsocketConnection, topics: Iterable[str]) -> list[str]:
+        """Subscribe a connection to ``topics``, ignoring unknown topics. Returns the newly added topics."""
+        added: list[str] = []
+
+        for topic in topics:
+            subscribers: set[WebsocketConnection] | None = self._topics.get(topic)
+
+            if subscribers is None or topic in connection.subscriptions:
+                continue
+
+            subscribers.add(connection)
+            connection.subscriptions.add(topic)
+            added.append(topic)
+
+        return added
+
+    def unsubscribe(self, connection: WebsocketConnection, topics: Iterable[str]) -> list[str]:
+        """Unsubscribe a connection from ``topics``. Returns the topics which were removed."""
+        removed: list[str] = []
+
+        for topic in topics:
+            if topic not in connection.subscriptions:
+                continue
+
+            self._topics[topic].discard(connection)
+            connection.subscriptions.discard(topic)
+            removed.append(topic)
+
+        return removed
+
+    def stats(self) -> dict[str, Any]:
+        """Live connection counts, and the approximate memory used by each index in bytes."""
+        topics: dict[str, dict[str, int]] = {}
+
+        for topic, subscribers in self._topics.items():
+            topics[topic] = {
+                'connections': len(subscribers),
+                'users': len({c.uid for c in subscribers}),
+                'index_bytes': sys.getsizeof(subscribers),
+            }
+
+        connection_bytes: int = sum(sys.getsizeof(c) + sys.getsizeof(c.subscriptions) for c in self._connections.values())
+
+        return {
+            'connections': len(self._connections),
+            'users': len(self._users),
+            'queued': sum(c.queued for c in self._connections.values()),
+            'connection_bytes': connection_bytes,
+            'index_bytes': sys.getsizeof(self._connections)
+            + sys.getsizeof(self._users)
+            + sum(sys.getsizeof(u) for u in self._users.values()),
+            'topics': topics,
+        }
@@ -20,25 +20,221 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
+from __future__ import annotations
+
 import asyncio
+import logging
+import multiprocessing
+import multiprocessing.connection
+import signal
+import socket
+import time
+from typing import TYPE_CHECKING, Any
 
-import aiohttp
 import uvicorn
 
 import api
 import core
 
+if TYPE_CHECKING:
+    from multiprocessing.process import BaseProcess
+    from types import FrameType
+
+
+LOGGER: logging.Logger = logging.getLogger('launcher')
+
+SERVER_CONFIG: dict[str, Any] = core.config['SERVER']
+HOST: str = '0.0.0.0'
+
+
+def setup_loop(loop: str) -> None:
+    """Install the event loop policy for ``loop``, one of "auto", "asyncio" or "uvloop"."""
+    if loop == 'asyncio':
+        return
+
+    try:
+        import uvloop
+    except ImportError:
+        if loop == 'uvloop':
+            raise
+
+        return
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+
+def bind_socket(port: int) -> socket.socket:
+    """Bind a listening socket which every worker binds to the same port, letting the kernel balance connections."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((HOST, port))
+
+    return sock
 
-async def main() -> None:
-    async with aiohttp.ClientSession() as session, core.Database() as database:
-        app: api.Server = api.Server(session=session, database=database)
+
+async def main(*, workers: int = 1) -> None:
+    async with core.Database(workers=workers) as database:
+        app: api.Server = api.Server(database=database)
 
         config = uvicorn.Config(
-            app, host="0.0.0.0", port=core.config['SERVER']['port'], ws_ping_interval=10, ws_ping_timeout=None
+            app,
+            host=HOST,
+            port=SERVER_CONFIG['port'],
+            ws_ping_interval=10,
+            ws_ping_timeout=None,
+            backlog=SERVER_CONFIG.get('backlog', 2048),
+            limit_concurrency=SERVER_CONFIG.get('limit_concurrency'),
+            http=SERVER_CONFIG.get('http', 'auto'),
         )
         server = uvicorn.Server(config)
-        await server.serve()
+
+        sockets: list[socket.socket] | None = [bind_socket(SERVER_CONFIG['port'])] if workers > 1 else None
+
+        await app.events.start()
+        await app.ratelimiter.start()
+
+        try:
+            await server.serve(sockets=sockets)
+        finally:
+            await app.ratelimiter.close()
+            await app.oauth.close()
+            await app.events.close()
+
+            # Flush any queued request logs before the Database pool is closed...
+            await database.logs.close()
+
+
+def run_worker(workers: int) -> None:
+    setup_loop(SERVER_CONFIG.get('loop', 'auto'))
+    asyncio.run(main(workers=workers))
+
+
+class Supervisor:
+    """Runs ``workers`` API processes, restarting any which exit until the supervisor is stopped.
+
+    Workers which exit within ``stable_after`` seconds of starting are restarted with an exponential backoff, from
+    ``restart_delay`` up to ``max_restart_delay`` seconds.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        *,
+        restart_delay: float = 1.0,
+        max_restart_delay: float = 30.0,
+        stable_after: float = 10.0,
+        shutdown_timeout: float = 30.0,
+    ) -> None:
+        self.workers: int = workers
+        self.restart_delay: float = restart_delay
+        self.max_restart_delay: float = max_restart_delay
+        self.stable_after: float = stable_after
+        self.shutdown_timeout: float = shutdown_timeout
+
+        self._context = multiprocessing.get_context('spawn')
+        self._processes: dict[int, BaseProcess] = {}
+        self._started: dict[int, float] = {}
+        self._delays: dict[int, float] = {}
+        self._restart_at: dict[int, float] = {}
+        self._stopping: bool = False
+
+    def run(self) -> None:
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGTERM, self._stop)
+
+        if core.config.get('EVENTS', {}).get('backend', 'memory') == 'memory':
+            LOGGER.warning(
+                'Running %s workers with the memory event bus. Websocket events will not be shared between workers, '
+                'and the token filter and authentication cache are disabled. Use the postgres event bus to share them.',
+                self.workers,
+            )
+
+        LOGGER.info('Starting %s API workers.', self.workers)
+        for index in range(self.workers):
+            self._spawn(index)
+
+        while not self._stopping:
+            sentinels: list[int] = [p.sentinel for p in self._processes.values()]
+            multiprocessing.connection.wait(sentinels, timeout=1.0)
+
+            if self._stopping:
+                break
+
+            self._reap()
+            self._restart_due()
+
+        self._shutdown()
+
+    def _stop(self, signum: int, frame: FrameType | None) -> None:
+        self._stopping = True
+
+    def _spawn(self, index: int) -> None:
+        process = self._context.Process(target=run_worker, args=(self.workers,), name=f'papi-worker-{index}')
+        process.start()
+
+        self._processes[index] = process
+        self._started[index] = time.monotonic()
+
+        LOGGER.info('Started API worker %s [%s].', index, process.pid)
+
+    def _reap(self) -> None:
+        now: float = time.monotonic()
+
+        for index, process in list(self._processes.items()):
+            if process.is_alive():
+                continue
+
+            del self._processes[index]
+            uptime: float = now - self._started.pop(index)
+
+            # Keep backing off while a worker crashes on startup, but start again from scratch once it has been stable...
+            if uptime < self.stable_after:
+                delay: float = min(self._delays.get(index, self.restart_delay / 2) * 2, self.max_restart_delay)
+            else:
+                delay = self.restart_delay
+
+            self._delays[index] = delay
+            self._restart_at[index] = now + delay
+
+            LOGGER.error(
+                'API worker %s [%s] exited with code %s after %.1f seconds, restarting in %.1f seconds.',
+                index,
+                process.pid,
+                process.exitcode,
+                uptime,
+                delay,
+            )
+
+    def _restart_due(self) -> None:
+        now: float = time.monotonic()
+
+        for index, when in list(self._restart_at.items()):
+            if when <= now:
+                del self._restart_at[index]
+                self._spawn(index)
+
+    def _shutdown(self) -> None:
+        LOGGER.info('Stopping %s API workers.', len(self._processes))
+
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+
+        deadline: float = time.monotonic() + self.shutdown_timeout
+        for process in self._processes.values():
+            process.join(timeout=max(0.0, deadline - time.monotonic()))
+
+            if process.is_alive():
+                LOGGER.warning('API worker [%s] did not stop in time, killing it.', process.pid)
+                process.kill()
+                process.join()
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    workers: int = SERVER_CONFIG.get('workers', 1)
+
+    if workers > 1:
+        Supervisor(workers).run()
+    else:
+        run_worker(workers)
@@ -0,0 +1,78 @@
+"""MIT License
+
+Copyright (c) 2023 PythonistaGuild
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import sys
+
+import asyncpg
+
+import core
+from core.database.migrator import MigrationError, Migrator
+
+LOGGER: logging.Logger = logging.getLogger('migrate')
+
+
+async def main(command: str) -> int:
+    migrator: Migrator = Migrator()
+    connection: asyncpg.Connection[asyncpg.Record] = await asyncpg.connect(dsn=core.config['DATABASE']['dsn'])
+
+    try:
+        if command == 'apply':
+            applied = await migrator.migrate(connection)
+            LOGGER.info('Applied %s migrations, database is current at migration %s.', len(applied), migrator.latest)
+
+            return 0
+
+        pending = await migrator.pending(connection)
+    except MigrationError as e:
+        LOGGER.error('%s', e)
+        return 2
+    finally:
+        await connection.close()
+
+    for migration in pending:
+        LOGGER.info('Pending migration: %s', migration.path.name)
+
+    if pending:
+        LOGGER.warning('%s of %s migrations are pending.', len(pending), len(migrator.migrations))
+        return 1
+
+    LOGGER.info('Database is current at migration %s.', migrator.latest)
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Apply or check database migrations without starting the API.')
+    parser.add_argument(
+        'command',
+        choices=('apply', 'check'),
+        nargs='?',
+        default='check',
+        help='"check" exits with 1 when migrations are pending (the default), "apply" applies them.',
+    )
+
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.command)))